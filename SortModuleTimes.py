@@ -1,4 +1,4 @@
-#!/usr/bin/env python2
+#!/usr/bin/env python
 # 
 # Brief:  parses and outputs timing information from art logs
 # Author: petrillo@fnal.gov
@@ -19,17 +19,120 @@
 #   updating from optparse to argparse
 # 1.5 (20140711, petrillo@fnal.gov)
 #   improved parsing relying on end-of-event markers; using python 2.7
+# 1.6 (20261016)
+#   parallel parsing of multiple input files (--jobs)
+# 1.7 (20261016)
+#   parallel parsing of a single uncompressed input file split in parts
+# 1.8 (20261016)
+#   faster parsing of the timing lines
+# 1.9 (20261016)
+#   columnar storage of the event timings (requires numpy)
+# 1.10 (20261016)
+#   percentiles of the timing distributions (--percentiles)
+# 1.11 (20261016)
+#   follow mode for logs still being written (--follow)
+# 1.12 (20261016)
+#   on-disk cache of the parsed timing information (--cache, --cachedir)
+# 1.13 (20261016)
+#   compression detected from file content; support for xz, zstd and lz4;
+#   optional decompression by external programs (--externaldecompressor)
+# 1.14 (20261016)
+#   uncompressed files are memory-mapped and scanned for timing lines
+# 1.15 (20261016)
+#   machine-readable output formats (--outputformat)
+# 1.16 (20261016)
+#   text tables are written one row at a time
+# 1.17 (20261016)
+#   transposed and paged event table layouts, written while parsing
+#   (--eventlayout, --pagesize)
+# 1.18 (20261016)
+#   time series analysis: warm-up, steady state and drift of each module
+#   (--timeseries)
+# 1.19 (20261016)
+#   share of the event time spent in each module, framework overhead and
+#   breakdown of the slowest events (--shares)
+# 1.20 (20261016)
+#   comparison with baseline logs, flagging timing regressions (--compare)
+# 1.21 (20261016)
+#   memory usage from MemoryCheck lines, parsed with the timing (--memory)
+# 1.22 (20261016)
+#   support for the SQLite databases from art TimeTracker service
+# 1.23 (20261016)
+#   compact duplicate detection when single entries are not needed
+# 1.24 (20261016)
+#   python3 support; parsing interface usable from other python code
+# 1.25 (20261016)
+#   event completion time not growing with the number of events
+# 1.26 (20261016)
+#   compact per-event entries (less memory when tracking the events)
+# 1.27 (20261016)
+#   event keys packed in an integer; module keys shared through a registry
+# 1.28 (20261017)
+#   numerically stable RMS; statistics filled from arrays (Stats.add_many())
+# 1.29 (20261017)
+#   selection of modules, runs, subruns and events (--module, --run, ...)
+#   applied while parsing
 #
 
+from __future__ import print_function, division
+
 import sys, os
 import math
+import re
+import itertools
+import time
+import array
+import mmap
+import hashlib
+try: import cPickle as pickle
+except ImportError: import pickle
+import csv
+import json
 import gzip
 try: import bz2
 except ImportError: pass
+try: import lzma
+except ImportError:
+	try: from backports import lzma
+	except ImportError: lzma = None
+# try
+try: import zstandard
+except ImportError: zstandard = None
+try: import lz4.frame
+except ImportError: pass
+try: import pyarrow, pyarrow.parquet
+except ImportError: pyarrow = None
+try: import sqlite3
+except ImportError: sqlite3 = None
+import subprocess
+import signal
+try: from shutil import which as find_executable
+except ImportError: from distutils.spawn import find_executable
 from collections import OrderedDict
+import multiprocessing
+try: import numpy
+except ImportError: numpy = None
 
+if sys.version_info[0] >= 3:
+	import io
+	basestring = str
+	intern = sys.intern
+	long = int
+	xrange = range
+	def ArrayToBytes(a): return a.tobytes()
+	def ArrayFromBytes(a, data): a.frombytes(data)
+	def DecodeLine(line): return line.decode('utf-8', 'replace')
+	def TextReader(File):
+		return io.TextIOWrapper(File, encoding='utf-8', errors='replace')
+else:
+	def ArrayToBytes(a): return a.tostring()
+	def ArrayFromBytes(a, data): a.fromstring(data)
+	def DecodeLine(line): return line
+	def TextReader(File): return File
+# if ... else
 
-Version = "%(prog)s 1.5"
+
+Version = "%(prog)s 1.29"
 __doc__ = "Prints statistics of the module timings based on the information from the Timing service."
 
 #
@@ -42,6 +145,109 @@ def signed_sqrt(value):
 # signed_sqrt()
 
 
+class LogHistogramSketchClass:
+	"""Streaming estimator of quantiles, based on logarithmic bins.
+	
+	The values are counted in bins whose edges grow geometrically, so that each
+	quantile is estimated with a relative error not larger than
+	relativeAccuracy. Values smaller than minValue (including zero and negative
+	values) are all counted in a special bin, represented by 0.
+	The memory is bounded: when more than maxBins bins are used, the lowest ones
+	are collapsed together, degrading the accuracy only of the lowest quantiles.
+	Sketches with the same accuracy can be merged.
+	"""
+	def __init__(self, relativeAccuracy = 0.01, maxBins = 2048, minValue = 1e-9):
+		self.relativeAccuracy = relativeAccuracy
+		self.gamma = (1. + relativeAccuracy) / (1. - relativeAccuracy)
+		self.logGamma = math.log(self.gamma)
+		self.maxBins = maxBins
+		self.minValue = minValue
+		self.clear()
+	# __init__()
+	
+	def clear(self):
+		self.bins = {}
+		self.zeroWeight = 0
+		self.totalWeight = 0
+	# clear()
+	
+	def binIndex(self, value):
+		return int(math.ceil(math.log(value) / self.logGamma))
+	
+	def binValue(self, index):
+		"""Returns the value representing the specified bin."""
+		return 2. * self.gamma**index / (1. + self.gamma)
+	
+	def add(self, value, weight = 1):
+		self.totalWeight += weight
+		if value < self.minValue:
+			self.zeroWeight += weight
+			return
+		index = self.binIndex(value)
+		try: self.bins[index] += weight
+		except KeyError:
+			self.bins[index] = weight
+			if len(self.bins) > self.maxBins: self.collapse()
+		# try
+	# add()
+	
+	def add_many(self, values, weights = None):
+		"""Adds many values at once (see add()); requires numpy."""
+		values = numpy.asarray(values, dtype=float).ravel()
+		if weights is None: weights = numpy.ones(len(values), dtype=int)
+		else:               weights = numpy.asarray(weights).ravel()
+		bZero = values < self.minValue
+		self.totalWeight += weights.sum().item()
+		self.zeroWeight += weights[bZero].sum().item()
+		indices, inverse = numpy.unique(
+		  numpy.ceil(numpy.log(values[~bZero]) / self.logGamma).astype(int),
+		  return_inverse=True
+		  )
+		binWeights = numpy.bincount(inverse.ravel(), weights=weights[~bZero]) \
+		  .astype(weights.dtype)
+		for index, weight in zip(indices.tolist(), binWeights.tolist()):
+			self.bins[index] = self.bins.get(index, 0) + weight
+		self.collapse()
+	# add_many()
+	
+	def collapse(self):
+		"""Merges the lowest bins, so that at most maxBins are used."""
+		indices = sorted(self.bins)
+		nExcess = len(indices) - self.maxBins
+		if nExcess <= 0: return
+		target = indices[nExcess]
+		for index in indices[:nExcess]: self.bins[target] += self.bins.pop(index)
+	# collapse()
+	
+	def merge(self, other):
+		"""Adds all the entries of the other sketch to this one."""
+		if other.gamma != self.gamma:
+			raise RuntimeError("Can't merge quantile sketches with different accuracy")
+		self.totalWeight += other.totalWeight
+		self.zeroWeight += other.zeroWeight
+		for index, weight in other.bins.items():
+			self.bins[index] = self.bins.get(index, 0) + weight
+		self.collapse()
+		return self
+	# merge()
+	
+	def quantile(self, q):
+		"""Returns the estimated q quantile (0 <= q <= 1), None if empty."""
+		if self.totalWeight <= 0: return None
+		rank = q * self.totalWeight
+		cumulative = self.zeroWeight
+		if cumulative >= rank and cumulative > 0: return 0.
+		index = None
+		for index in sorted(self.bins):
+			cumulative += self.bins[index]
+			if cumulative >= rank: break
+		# for
+		return 0. if index is None else self.binValue(index)
+	# quantile()
+	
+# class LogHistogramSketchClass
+
+
 class Stats:
 	"""Statistics collector.
 	
@@ -54,6 +260,8 @@ class Stats:
 	- min():     minimum value of x seen so far (None if no entries yet)
 	- max():     maximum value of x seen so far (None if no entries yet)
 	- sumsq():   weighted sum of x^2
+	- sumsqdev(): weighted sum of the squares of the deviations of x from
+	             the average
 	- average(): weighted average of x (0 if no entries yet)
 	- sqaverage(): weighted average of x^2 (0 if no entries yet)
 	- rms():     the Root Mean Square (including weights)
@@ -61,11 +269,27 @@ class Stats:
 	- stdev():   standard deviation (0 if less than two events)
 	- stdevp():  an alias for rms()
 	
+	- quantile(q): estimated q quantile (0 <= q <= 1) (None if not available)
+	
+	Two samples can be combined with merge(): the result is the same as if all
+	the entries of both samples had been add()ed to a single collector.
+	Many entries can be added at once from arrays by add_many().
+	
+	The variance is not computed from sumsq (the difference between average of
+	the squares and square of the average loses most of its precision when the
+	values are close to each other), but from the sum of the squared deviations,
+	which is updated with each new entry (Welford) and combined between samples
+	with the formula from Chan, Golub and LeVeque.
+	
 	The construction allows to specify bFloat = false, in which case the
 	accumulators are integral types (int) until a real type value or weight is
 	add()ed.
+	Quantiles are available only if a quantile sketch (like
+	LogHistogramSketchClass) is specified on construction; all the values are
+	added to it.
 	"""
-	def __init__(self, bFloat = True):
+	def __init__(self, bFloat = True, sketch = None):
+		self.sketch = sketch
 		self.clear(bFloat)
 	
 	def clear(self, bFloat = True):
@@ -80,6 +304,8 @@ class Stats:
 			self.e_sumsq = 0
 		self.e_min = None
 		self.e_max = None
+		self.e_sumsqdev = 0.
+		if self.sketch is not None: self.sketch.clear()
 	# clear()
 	
 	def add(self, value, weight=1):
@@ -88,40 +314,165 @@ class Stats:
 		The addition is treated as integer only if both value and weight are
 		integrals.
 		"""
+		w = self.e_w
+		if w != 0:
+			delta = value - self.e_sum / w
+			self.e_sumsqdev += delta * delta * weight * w / (w + weight)
+		# if
 		self.e_n += 1
-		self.e_w += weight
+		self.e_w = w + weight
 		self.e_sum += weight * value
-		self.e_sumsq += weight * value**2
+		self.e_sumsq += weight * value * value
 		if (self.e_min is None) or (value < self.e_min): self.e_min = value
 		if (self.e_max is None) or (value > self.e_max): self.e_max = value
+		if self.sketch is not None: self.sketch.add(value, weight)
 	# add()
 	
+	def add_many(self, values, weights = None):
+		"""Adds many items at once.
+		
+		The values, and the weights if specified, can be numpy arrays or any
+		sequence, including the ones supporting the buffer protocol (like
+		array.array). With numpy, the accumulators are updated by vectorized
+		reductions; the result is the same as add()ing the items one by one
+		(except for rounding).
+		"""
+		if numpy is None:
+			if weights is None: weights = itertools.repeat(1)
+			for value, weight in zip(values, weights): Stats.add(self, value, weight)
+			return self
+		# if no numpy
+		
+		values = numpy.asarray(values).ravel()
+		if len(values) == 0: return self
+		if weights is None:
+			w = len(values)
+			sum_ = values.sum().item()
+			sumsq = numpy.dot(values, values).item()
+			deviations = values - sum_ / w
+			sumsqdev = numpy.dot(deviations, deviations).item()
+		else:
+			weights = numpy.asarray(weights).ravel()
+			w = weights.sum().item()
+			sum_ = numpy.dot(weights, values).item()
+			sumsq = numpy.dot(weights, values * values).item()
+			if w != 0:
+				deviations = values - sum_ / w
+				sumsqdev = numpy.dot(weights, deviations * deviations).item()
+			else: sumsqdev = 0.
+		# if ... else
+		self.addSummary(len(values), w, sum_, sumsq,
+		  values.min().item(), values.max().item(), sumsqdev)
+		if self.sketch is not None: self.sketch.add_many(values, weights)
+		return self
+	# add_many()
+	
+	def addSummary(self, n, weights, sum_, sumsq, min_, max_, sumsqdev):
+		"""Adds a sample described by its accumulators (see the class).
+		
+		The sketch, if any, is not updated.
+		"""
+		if n == 0: return self
+		if (self.e_w != 0) and (weights != 0):
+			delta = sum_ / weights - self.e_sum / self.e_w
+			sumsqdev += delta * delta * self.e_w * weights / (self.e_w + weights)
+		# if
+		self.e_sumsqdev += sumsqdev
+		self.e_n += n
+		self.e_w += weights
+		self.e_sum += sum_
+		self.e_sumsq += sumsq
+		if (min_ is not None) and ((self.e_min is None) or (min_ < self.e_min)):
+			self.e_min = min_
+		if (max_ is not None) and ((self.e_max is None) or (max_ > self.e_max)):
+			self.e_max = max_
+		return self
+	# addSummary()
+	
+	def merge(self, other):
+		"""Adds all the entries of the other Stats sample to this one.
+		
+		After the merge, this object contains the same statistics as if all the
+		entries of other had been add()ed to it.
+		"""
+		self.addSummary(other.e_n, other.e_w, other.e_sum, other.e_sumsq,
+		  other.e_min, other.e_max, other.e_sumsqdev)
+		if self.sketch is not None:
+			# without information from other, quantiles are not available any more
+			if other.sketch is None: self.sketch = None
+			else:                    self.sketch.merge(other.sketch)
+		# if
+		return self
+	# merge()
+	
 	def n(self): return self.e_n
 	def weights(self): return self.e_w
 	def sum(self): return self.e_sum
 	def min(self): return self.e_min
 	def max(self): return self.e_max
 	def sumsq(self): return self.e_sumsq
+	def sumsqdev(self): return self.e_sumsqdev
 	def average(self):
-		if self.e_w != 0.: return float(self.e_sum)/self.e_w
+		if self.weights() != 0.: return float(self.sum())/self.weights()
 		else: return 0.
 	def sqaverage(self):
-		if self.e_w != 0.: return float(self.e_sumsq)/self.e_w
+		if self.weights() != 0.: return float(self.sumsq())/self.weights()
+		else: return 0.
+	def rms2(self):
+		if self.weights() != 0.: return self.sumsqdev() / self.weights()
 		else: return 0.
-	def rms2(self): return self.sqaverage() - self.average()**2
 	def rms(self): return signed_sqrt(self.rms2())
 	def stdev(self):
-		if self.e_n < 2: return 0.
-		else: return self.rms() * math.sqrt(float(self.e_n)/(self.e_n-1))
+		if self.n() < 2: return 0.
+		else: return self.rms() * math.sqrt(float(self.n())/(self.n()-1))
 	def stdevp(self): return self.rms()
+	def quantile(self, q):
+		if (self.sketch is None) or (self.n() == 0): return None
+		if q <= 0.: return self.min()
+		if q >= 1.: return self.max()
+		return min(max(self.sketch.quantile(q), self.min()), self.max())
+	# quantile()
 # class Stats
 
 
-class EventKeyClass(tuple):
-	"""Event identifier: run, subrun and event numbers."""
-	def run(self): return self[0]
-	def subRun(self): return self[1]
-	def event(self): return self[2]
+class EventKeyClass(long):
+	"""Event identifier: run, subrun and event numbers.
+	
+	The three numbers (32 bit each, as in art) are packed in a single integer,
+	which is quick to hash and to compare, and sorts as the (run, subrun, event)
+	tuple would.
+	The key can still be constructed from, unpacked into and indexed like that
+	tuple.
+	"""
+	__slots__ = ()
+	
+	def __new__(cls, eventID):
+		"""Constructor: from (run, subrun, event) or from a packed key."""
+		if isinstance(eventID, ( int, long )): return long.__new__(cls, eventID)
+		return cls.fromNumbers(*eventID)
+	# __new__()
+	
+	@classmethod
+	def fromNumbers(cls, run, subRun, event):
+		"""Returns the key of the specified event."""
+		if (run | subRun | event) >> 32:
+			raise ValueError("event ID (%d, %d, %d) out of range"
+			  % (run, subRun, event))
+		# if
+		return long.__new__(cls, (run << 64) | (subRun << 32) | event)
+	# fromNumbers()
+	
+	def run(self): return self >> 64
+	def subRun(self): return (self >> 32) & 0xFFFFFFFF
+	def event(self): return self & 0xFFFFFFFF
+	
+	def __iter__(self): return iter(( self.run(), self.subRun(), self.event() ))
+	def __len__(self): return 3
+	def __getitem__(self, index): return tuple(self)[index]
+	def __bool__(self): return True
+	__nonzero__ = __bool__
+	
+	def __repr__(self): return "(%d, %d, %d)" % tuple(self)
 	
 	def __str__(self):
 		return "run %d subRun %d event %d" \
@@ -131,7 +482,25 @@ class EventKeyClass(tuple):
 
 
 class ModuleKeyClass(tuple):
-	"""Module instance identifier: module label and instance name."""
+	"""Module instance identifier: module label and instance name.
+	
+	Module keys are interned: there is only one key object for each module,
+	kept in the registry, and label and name strings are interned too.
+	"""
+	__slots__ = ()
+	Registry = {} # ( label, name ) -> key
+	
+	def __new__(cls, moduleID):
+		"""Returns the key of the module with the specified (label, name)."""
+		if not isinstance(moduleID, tuple): moduleID = tuple(moduleID)
+		try: return cls.Registry[moduleID]
+		except KeyError: pass
+		label, name = moduleID
+		key = tuple.__new__(cls, ( intern(str(label)), intern(str(name)) ))
+		cls.Registry[key] = key
+		return key
+	# __new__()
+	
 	def name(self): return self[1]
 	def instance(self): return self[0]
 	
@@ -140,45 +509,62 @@ class ModuleKeyClass(tuple):
 
 
 class EntryDataClass(object):
-	"""A flexible data structure for per-event information.
+	"""A compact data structure for per-event information.
 	
 	The object is associated to a specific, unique event.
 	It can represent either the execution of the full event, or of a specific
 	module on that event.
-	The object gathers custom data; the standard data members:
-	- time (default: None): seconds elapsed by the event
-	- module (default: not defined): the module identification
+	The data members are:
+	- eventKey: the event identification
+	- module (default: None): the module identification
+	- seconds (default: None): seconds elapsed by the event (see time())
+	- memory (default: None): dictionary with vsize, vsizeDelta, rss, rssDelta:
+	  virtual and resident memory [MB] after the execution, and their increase;
+	  they are also available as data members (e.g. data.rss)
 	If time is None, we assume this event was never completed.
-	The presence of a module data member implies that this object descrivbes a
-	module execution rather than the whole event.
+	The presence of a module implies that this object describes a module
+	execution rather than the whole event.
+	The presence of memory information implies that this object describes
+	the memory usage rather than the timing.
+	
+	There may be millions of these objects, one per event and module: they have
+	no instance dictionary, just the fixed data members.
 	"""
-	def __init__(self, eventKey, **kargs):
-		self.data = kargs
-		self.data.setdefault('time', None)
+	__slots__ = ( 'eventKey', 'module', 'seconds', 'memory', )
+	
+	def __init__(self, eventKey, module = None, time = None, memory = None):
 		self.eventKey = eventKey
+		self.module = module
+		self.seconds = time
+		self.memory = memory
 	# __init__()
 	
 	def __getattr__(self, attrName):
-		# we expect this will be called only if no attrName already exists
-		try: return self.data[attrName]
-		except KeyError: raise AttributeError(attrName)
+		# called only for names which are not data members (or not set yet,
+		# on an object being unpickled)
+		if (attrName not in self.__slots__) and self.memory:
+			try: return self.memory[attrName]
+			except KeyError: pass
+		raise AttributeError(attrName)
 	# __getattr__()
 	
-	def time(self):
-		try: return self.data['time']
-		except KeyError: return None
-	# time()
+	def __getstate__(self):
+		return ( self.eventKey, self.module, self.seconds, self.memory )
 	
-	def isModule(self):
-		try: return bool(self.module)
-		except AttributeError: return False
-	# isEvent()
+	def __setstate__(self, state):
+		self.eventKey, self.module, self.seconds, self.memory = state
 	
-	def isEvent(self): return not self.isModule()
+	def time(self): return self.seconds
 	
-	def isMissing(self): return self.time() is None
+	def isModule(self): return self.module is not None
 	
-	def SetMissing(self): self.data['time'] = None
+	def isEvent(self): return self.module is None
+	
+	def isMissing(self): return self.seconds is None
+	
+	def isMemory(self): return self.memory is not None
+	
+	def SetMissing(self): self.seconds = None
 	
 	def __str__(self):
 		s = str(self.eventKey)
@@ -193,6 +579,103 @@ class EntryDataClass(object):
 # class EntryDataClass
 
 
+class EventKeySetClass:
+	"""Compact set of event keys.
+	
+	The event numbers of each run and subrun are stored in a bitmap covering
+	the range between the smallest and the largest event number, which takes
+	one bit per event when the numbers are dense (as they usually are).
+	If the numbers of a subrun are too sparse for a bitmap (judging from the
+	number of events in that subrun and the range they span), a plain set of the
+	numbers is used instead for that subrun. The bitmaps grow geometrically in
+	either direction, so that adding events in descending order is not slower
+	than in ascending order.
+	Only adding and checking keys are supported; the order of insertion is not
+	recorded.
+	"""
+	MinSparseBytes = 4096 # bitmaps smaller than this are always accepted
+	
+	def __init__(self):
+		# run and subRun bits -> [ first event, bitmap, number of events ] or set
+		self.subRuns = {}
+		self.n = 0
+	# __init__()
+	
+	def __len__(self): return self.n
+	
+	def __contains__(self, eventKey):
+		event = eventKey & 0xFFFFFFFF
+		try: events = self.subRuns[eventKey >> 32]
+		except KeyError: return False
+		if isinstance(events, set): return event in events
+		index = event - events[0]
+		if (index < 0) or (index >= 8 * len(events[1])): return False
+		return bool(events[1][index >> 3] & (1 << (index & 7)))
+	# __contains__()
+	
+	def __iter__(self):
+		for subRunBits, events in self.subRuns.items():
+			numbers = sorted(events) if isinstance(events, set) \
+			  else self.bitmapEvents(events[0], events[1])
+			for event in numbers: yield EventKeyClass((subRunBits << 32) | event)
+		# for
+	# __iter__()
+	
+	@staticmethod
+	def bitmapEvents(first, bitmap):
+		"""Iterates in order the event numbers set in a bitmap."""
+		return ( first + index for index in xrange(8 * len(bitmap))
+		  if bitmap[index >> 3] & (1 << (index & 7)) )
+	# bitmapEvents()
+	
+	def add(self, eventKey):
+		"""Adds an event key; returns whether the key was not present yet."""
+		subRunBits = eventKey >> 32
+		event = eventKey & 0xFFFFFFFF
+		try: events = self.subRuns[subRunBits]
+		except KeyError:
+			events = self.subRuns[subRunBits] = [ event, bytearray(1), 0 ]
+		if isinstance(events, set):
+			if event in events: return False
+			events.add(event)
+			self.n += 1
+			return True
+		# if sparse
+		
+		first, bitmap = events[0], events[1]
+		index = event - first
+		if (index < 0) or (index >= 8 * len(bitmap)):
+			# the bitmap needs to be extended (or abandoned); the density is judged
+			# from the bytes actually spanned by the events, not the allocated ones
+			usedFirst = len(bitmap) - len(bitmap.lstrip(b'\0'))
+			usedLast = len(bitmap.rstrip(b'\0')) - 1
+			nBytes = max(usedLast, index >> 3) - min(usedFirst, index >> 3) + 1
+			if nBytes > max(self.MinSparseBytes, 4 * (events[2] + 1)):
+				self.subRuns[subRunBits] = set(self.bitmapEvents(first, bitmap))
+				return self.add(eventKey)
+			# if too sparse
+			if index < 0:
+				# doubling the size, but without going below event number 0
+				nNewBytes = max((-index + 7) // 8, min(len(bitmap), first // 8))
+				events[1] = bitmap = bytearray(nNewBytes) + bitmap
+				events[0] = first = first - 8 * nNewBytes
+				index = event - first
+			else:
+				bitmap.extend(bytearray(max(index // 8 + 1 - len(bitmap), len(bitmap))))
+			# if ... else
+		# if extension
+		
+		mask = 1 << (index & 7)
+		if bitmap[index >> 3] & mask: return False
+		bitmap[index >> 3] |= mask
+		events[2] += 1
+		self.n += 1
+		return True
+	# add()
+	
+# class EventKeySetClass
+
+
 class TimeModuleStatsClass(Stats):
 	"""Collects statistics about execution time.
 	
@@ -215,15 +698,25 @@ class TimeModuleStatsClass(Stats):
 	adding a new event. If the completion is performed after the new event is
 	added, the previous event will be added after the new one, when complete()
 	is actually called.
+	
+	When the single entries are not needed, duplicate events can still be
+	detected by just recording their keys in a compact set (EventKeySetClass).
+	In this case, complete() records only the last of the event keys.
 	"""
-	def __init__(self, moduleKey, bTrackEntries = False):
+	def __init__(self, moduleKey, bTrackEntries = False, sketch = None,
+	  bCheckDuplicates = False):
 		"""Constructor: specifies the module we collect information about.
 		
 		If the flag bTrackEntries is true, all the added events are stored singly.
+		Otherwise, if bCheckDuplicates is true, only their keys are recorded, to
+		skip duplicate entries.
+		A quantile sketch can be specified (see Stats).
 		"""
-		Stats.__init__(self)
+		Stats.__init__(self, sketch=sketch)
 		self.key = moduleKey
 		self.entries = OrderedDict() if bTrackEntries else None
+		self.eventKeys = EventKeySetClass() \
+		  if bCheckDuplicates and not bTrackEntries else None
 	# __init__()
 	
 	def add(self, data):
@@ -237,6 +730,8 @@ class TimeModuleStatsClass(Stats):
 		if self.entries is not None:
 			if data.eventKey in self.entries: return False
 			self.entries[data.eventKey] = data
+		elif self.eventKeys is not None:
+			if not self.eventKeys.add(data.eventKey): return False
 		# if
 		if not data.isMissing(): Stats.add(self, data.time())
 		return True
@@ -250,28 +745,126 @@ class TimeModuleStatsClass(Stats):
 		Note that the events are added at the bottom of the list, in the relative
 		order in eventKeys.
 		
-		If we are not tracking the events, nothing happens ever.
+		If we are not tracking the events, nothing happens ever, unless we are
+		recording the event keys, in which case the last key is recorded.
 		"""
-		if self.entries is None: return 0
+		if self.entries is None:
+			if (self.eventKeys is None) or not eventKeys: return 0
+			return 1 if self.eventKeys.add(eventKeys[-1]) else 0
+		# if not tracking
 		if (len(self.entries) > 1): eventKeys = eventKeys[-1:]
 		res = 0
 		for eventKey in eventKeys:
+			if eventKey in self.entries: continue
 			if self.add(EntryDataClass(eventKey)): res += 1
 		return res
 	# complete()
 	
+	def completeFrom(self, eventStats):
+		"""Makes sure that the events known to eventStats are present.
+		
+		This is equivalent to complete(eventStats.getEvents()), but the list of
+		events is not copied: all the events are checked only while this object
+		has at most one entry, and after that only the last event is.
+		This way the cost of the completion does not grow with the number of
+		events.
+		"""
+		if (self.entries is None) or (len(self.entries) > 1):
+			eventKey = eventStats.lastEvent()
+			return 0 if eventKey is None else self.complete(( eventKey, ))
+		# if
+		return self.completeAll(eventStats.iterEvents())
+	# completeFrom()
+	
+	def merge(self, other):
+		"""Adds the information from another TimeModuleStatsClass.
+		
+		If other is tracking the entries and this object is tracking the entries
+		or recording the event keys, the entries from other are add()ed one by
+		one, in their order, and duplicate events are skipped as if they had been
+		add()ed to this object directly. Otherwise, only the statistics are
+		combined.
+		"""
+		if (other.entries is not None) \
+		  and ((self.entries is not None) or (self.eventKeys is not None)):
+			for entry in other.entries.values(): self.add(entry)
+		else: Stats.merge(self, other)
+		return self
+	# merge()
+	
+	def isTracking(self):
+		"""Returns whether the single entries are being tracked."""
+		return self.entries is not None
+	# isTracking()
+	
+	def hasEvent(self, eventKey):
+		"""Returns whether there is an entry for eventKey (if tracking)."""
+		return (self.entries is not None) and (eventKey in self.entries)
+	# hasEvent()
+	
+	def createEmpty(self, moduleKey):
+		"""Returns new, empty statistics for moduleKey, configured like these."""
+		sketch = self.sketch
+		if sketch is not None:
+			sketch = LogHistogramSketchClass(relativeAccuracy=sketch.relativeAccuracy,
+			  maxBins=sketch.maxBins, minValue=sketch.minValue)
+		# if
+		return TimeModuleStatsClass(moduleKey, bTrackEntries=self.isTracking(),
+		  sketch=sketch, bCheckDuplicates=(self.eventKeys is not None))
+	# createEmpty()
+	
+	def completeAll(self, eventKeys):
+		"""Makes sure that an entry for each of the keys in eventKeys is present.
+		
+		Unlike complete(), all the keys are checked.
+		"""
+		if self.entries is None: return 0
+		res = 0
+		for eventKey in eventKeys:
+			if self.add(EntryDataClass(eventKey)): res += 1
+		return res
+	# completeAll()
+	
 	def getEvents(self):
 		"""Returns the list of known event keys (if tracking the events)."""
-		return [] if self.entries is None else self.entries.keys()
+		return [] if self.entries is None else list(self.entries)
 	# getEvents()
 	
+	def iterEvents(self):
+		"""Iterates through the known event keys (if tracking the events)."""
+		return iter(()) if self.entries is None else iter(self.entries)
+	# iterEvents()
+	
+	def lastEvent(self):
+		"""Returns the last known event key (None if none, or not tracking)."""
+		return next(reversed(self.entries)) if self.entries else None
+	# lastEvent()
+	
 	def getEntries(self):
 		"""Returns a list of the event statistics (if tracking the events)."""
-		return [] if self.entries is None else self.entries.values()
+		return [] if self.entries is None else list(self.entries.values())
 	# getEntries()
 	
+	def timeOf(self, eventKey):
+		"""Returns the time of the specified event (None if not available)."""
+		try: return self.entries[eventKey].time()
+		except (KeyError, TypeError): return None
+	# timeOf()
+	
+	def getEntriesOf(self, eventKeys):
+		"""Returns a list with the entry of each of the specified events.
+		
+		The entries which are not available (or all of them, if not tracking the
+		events) are None.
+		"""
+		if self.entries is None: return [ None ] * len(eventKeys)
+		return list(map(self.entries.get, eventKeys))
+	# getEntriesOf()
+	
 	def nEntries(self):
 		"""Returns the number of recorded entries (throws if not tracking)."""
+		if self.entries is None and self.eventKeys is not None:
+			return len(self.eventKeys)
 		return len(self.entries)
 	# nEntries()
 	
@@ -295,21 +888,30 @@ class TimeModuleStatsClass(Stats):
 		average time, a relative RMS in percent, the total time and the recorded
 		the number of events with timing information and the timing extrema.
 		
-		The format dictionary can contain format directives, for future use (no
-		format directive is currently supported).
+		The format dictionary can contain format directives; the ones supported
+		so far are:
+		- 'percentiles' (list of numbers): add the specified percentiles (e.g.
+		  50 for the median) of the timing (only available if quantiles are
+		  supported; see Stats)
 		"""
 		if isinstance(self.key, basestring): name = str(self.key)
 		else: name = str(self.key)
 		if (self.n() == 0) or (self.sum() == 0.):
 			return [ name, "n/a" ]
 		RMS = self.rms() if (self.n() != 0) else 0.
-		return [ 
+		output = [
 			name,
 			"%g\"" % self.average(),
 			"(RMS %4.1f%%)" % (RMS / self.average() * 100.),
 			"total %g\"" % self.sum(), "(%d events:" % self.n(),
 			"%g" % self.min(), "- %g)" % self.max(),
 			]
+		for percentile in (format_ or {}).get('percentiles', []):
+			value = self.quantile(percentile / 100.)
+			if value is None: output.append("p%g n/a" % percentile)
+			else:             output.append("p%g %g\"" % (percentile, value))
+		# for
+		return output
 	# FormatStatsAsList()
 	
 	def FormatTimesAsList(self, format_ = {}):
@@ -344,6 +946,219 @@ class TimeModuleStatsClass(Stats):
 # class TimeModuleStatsClass
 
 
+class EventIndexClass:
+	"""Table of the known event keys, each associated to a sequential index.
+	
+	The index of an event is assigned the first time the event is seen.
+	"""
+	def __init__(self):
+		self.keys = []
+		self.indices = {}
+	# __init__()
+	
+	def __len__(self): return len(self.keys)
+	def __getitem__(self, index): return self.keys[index]
+	
+	def index(self, eventKey):
+		"""Returns the index of eventKey, registering the key if new."""
+		try: return self.indices[eventKey]
+		except KeyError: pass
+		index = len(self.keys)
+		self.keys.append(eventKey)
+		self.indices[eventKey] = index
+		return index
+	# index()
+	
+# class EventIndexClass
+
+
+class ColumnarTimeModuleStatsClass(TimeModuleStatsClass):
+	"""Collects execution time statistics, storing timings in an array.
+	
+	This is an alternative to TimeModuleStatsClass tracking the entries.
+	Instead of an EntryDataClass object per event, the timings are stored in a
+	growable numpy array of float64, where each event has the position assigned
+	by an event index (EventIndexClass) shared by all the modules; missing
+	timings are stored as NaN.
+	The entries of all the events before the last completed one are considered
+	present (possibly with no time information).
+	The statistics are computed from the array only when requested.
+	
+	This class requires numpy.
+	"""
+	MinCapacity = 256
+	
+	def __init__(self, moduleKey, eventIndex):
+		"""Constructor: module key and the shared EventIndexClass."""
+		TimeModuleStatsClass.__init__(self, moduleKey, bTrackEntries=False)
+		self.eventIndex = eventIndex
+		self.times = numpy.full(self.MinCapacity, numpy.nan)
+		self.nCompleted = 0 # entries before this index are all present
+		self.bUpdated = True
+	# __init__()
+	
+	def reserve(self, n):
+		"""Makes sure the array of times can hold n entries."""
+		if n <= len(self.times): return
+		times = numpy.full(max(n, 2 * len(self.times)), numpy.nan)
+		times[:len(self.times)] = self.times
+		self.times = times
+	# reserve()
+	
+	def add(self, data):
+		"""Adds a time to the sample (see TimeModuleStatsClass.add())."""
+		index = self.eventIndex.index(data.eventKey)
+		if index < self.nCompleted: return False
+		self.reserve(index + 1)
+		self.nCompleted = index + 1
+		if not data.isMissing():
+			self.times[index] = data.time()
+			self.bUpdated = False
+		# if
+		return True
+	# add()
+	
+	def complete(self, eventKeys):
+		"""Makes sure all the events up to the last of eventKeys are present."""
+		if not eventKeys: return 0
+		index = self.eventIndex.index(eventKeys[-1])
+		if index < self.nCompleted: return 0
+		res = index + 1 - self.nCompleted
+		self.reserve(index + 1)
+		self.nCompleted = index + 1
+		return res
+	# complete()
+	
+	def completeAll(self, eventKeys):
+		return self.complete(eventKeys)
+	
+	def merge(self, other):
+		"""Adds all the entries from another TimeModuleStatsClass."""
+		for entry in other.getEntries(): self.add(entry)
+		return self
+	# merge()
+	
+	def isTracking(self): return True
+	
+	def hasEvent(self, eventKey):
+		index = self.eventIndex.indices.get(eventKey)
+		return (index is not None) and (index < self.nCompleted)
+	# hasEvent()
+	
+	def createEmpty(self, moduleKey):
+		"""Returns new, empty statistics for moduleKey, on the same event index."""
+		return ColumnarTimeModuleStatsClass(moduleKey, self.eventIndex)
+	# createEmpty()
+	
+	def timesArray(self):
+		"""Returns the array of times of the present entries (NaN if missing)."""
+		return self.times[:self.nCompleted]
+	# timesArray()
+	
+	def getEvents(self):
+		return self.eventIndex.keys[:self.nCompleted]
+	
+	def iterEvents(self):
+		return itertools.islice(self.eventIndex.keys, self.nCompleted)
+	
+	def lastEvent(self):
+		return self.eventIndex[self.nCompleted - 1] if self.nCompleted else None
+	
+	def getEntries(self):
+		entries = []
+		for eventKey, time in zip(self.getEvents(), self.timesArray()):
+			if numpy.isnan(time): entries.append(EntryDataClass(eventKey))
+			else: entries.append(EntryDataClass(eventKey, time=float(time)))
+		# for
+		return entries
+	# getEntries()
+	
+	def timeOf(self, eventKey):
+		index = self.eventIndex.indices.get(eventKey)
+		if (index is None) or (index >= self.nCompleted): return None
+		time = self.times[index]
+		return None if numpy.isnan(time) else float(time)
+	# timeOf()
+	
+	def nEntries(self): return self.nCompleted
+	
+	def updateStats(self):
+		"""Recomputes the statistics from the array of times, if needed."""
+		if self.bUpdated: return
+		times = self.timesArray()
+		times = times[~numpy.isnan(times)]
+		Stats.clear(self)
+		Stats.add_many(self, times)
+		self.bUpdated = True
+	# updateStats()
+	
+	def n(self):
+		self.updateStats()
+		return Stats.n(self)
+	def weights(self):
+		self.updateStats()
+		return Stats.weights(self)
+	def sum(self):
+		self.updateStats()
+		return Stats.sum(self)
+	def min(self):
+		self.updateStats()
+		return Stats.min(self)
+	def max(self):
+		self.updateStats()
+		return Stats.max(self)
+	def sumsq(self):
+		self.updateStats()
+		return Stats.sumsq(self)
+	def sumsqdev(self):
+		self.updateStats()
+		return Stats.sumsqdev(self)
+	def quantile(self, q):
+		"""Returns the q quantile (0 <= q <= 1), exact, or None if empty."""
+		times = self.timesArray()
+		times = times[~numpy.isnan(times)]
+		if len(times) == 0: return None
+		return float(numpy.percentile(times, q * 100.))
+	# quantile()
+	
+	def FormatTimesAsList(self, format_ = {}):
+		"""Prints the collected information into a list.
+		
+		See TimeModuleStatsClass.FormatTimesAsList().
+		"""
+		n = min(self.nEntries(), format_.get('max_events', self.nEntries()))
+		format_str = format_.get('format', '%g')
+		output = [ str(self.key), ]
+		for time in self.timesArray()[:n]:
+			if numpy.isnan(time): output.append("n/a")
+			else: output.append(format_str % time)
+		# for
+		return output
+	# FormatTimesAsList()
+	
+# class ColumnarTimeModuleStatsClass
+
+
+def CreateQuantileSketch(options):
+	"""Returns a new quantile sketch if options require percentiles, or None."""
+	if not getattr(options, 'Percentiles', None): return None
+	return LogHistogramSketchClass(relativeAccuracy=options.SketchAccuracy)
+# CreateQuantileSketch()
+
+
+def CreateEventStats(options):
+	"""Returns a new, empty per-event statistics object as options require."""
+	if getattr(options, 'Columnar', False):
+		return ColumnarTimeModuleStatsClass("=== events ===", EventIndexClass())
+	else:
+		return TimeModuleStatsClass("=== events ===",
+		  bTrackEntries=getattr(options, 'TrackEntries', options.CheckDuplicates),
+		  bCheckDuplicates=options.CheckDuplicates,
+		  sketch=CreateQuantileSketch(options)
+		  )
+# CreateEventStats()
+
+
 class JobStatsClass:
 	"""A class collecting timing information from different modules.
 	
@@ -351,22 +1166,48 @@ class JobStatsClass:
 	The supported interface includes access by key (dictionary-like) or by
 	position (list-like).
 	"""
-	def __init__(self, jobName = None):
+	def __init__(self, jobName = None, bMemory = False):
+		"""Constructor: memory statistics are collected only if bMemory is set."""
 		self.name = jobName
 		self.moduleList = []
 		self.moduleStats = {}
+		self.memory = MemoryStatsClass() if bMemory else None
 	# __init__()
 	
 	def MaxEvents(self):
 		if not self.moduleList: return 0
-		return max(map(Stats.n, self.moduleList))
+		return max(stats.n() for stats in self.moduleList)
 	# MaxEvents()
 	
 	def MinEvents(self):
 		if not self.moduleList: return 0
-		return min(map(Stats.n, self.moduleList))
+		return min(stats.n() for stats in self.moduleList)
 	# MinEvents()
 	
+	def merge(self, other, eventStats = None):
+		"""Adds the statistics from another JobStatsClass.
+		
+		Modules already known are merged, new modules are added at the end in the
+		order they have in other.
+		If eventStats (a TimeModuleStatsClass) is specified, the statistics of the
+		new modules are created like it (see TimeModuleStatsClass.createEmpty())
+		and the ones from other are merged into them; this is needed for the
+		columnar statistics, which are bound to the event index of their parsing.
+		Otherwise, the statistics from other are adopted as they are.
+		"""
+		for stats in other:
+			try: self[stats.key].merge(stats)
+			except KeyError:
+				if eventStats is not None:
+					self[stats.key] = eventStats.createEmpty(stats.key).merge(stats)
+				else: self[stats.key] = stats
+			# try ... except
+		# for
+		if (self.memory is not None) and (other.memory is not None):
+			self.memory.merge(other.memory)
+		return self
+	# merge()
+	
 	
 	# replicate some list/dictionary interface
 	def __iter__(self): return iter(self.moduleList)
@@ -403,6 +1244,89 @@ class JobStatsClass:
 # class JobStatsClass
 
 
+class MemoryUsageStatsClass:
+	"""Statistics of the memory usage of a module or of the events [MB].
+	
+	The statistics of the virtual (vsize) and resident (rss) memory after each
+	execution, and of their increase during the execution (vsizeDelta,
+	rssDelta) are collected.
+	"""
+	Quantities = ( 'vsize', 'vsizeDelta', 'rss', 'rssDelta' )
+	
+	def __init__(self, key):
+		self.key = key
+		self.stats = dict(( name, Stats() ) for name in self.Quantities)
+	# __init__()
+	
+	def __getattr__(self, attrName):
+		# 'stats' itself is missing only on a object being unpickled
+		if attrName == 'stats': raise AttributeError(attrName)
+		try: return self.stats[attrName]
+		except KeyError: raise AttributeError(attrName)
+	# __getattr__()
+	
+	def add(self, data):
+		"""Adds the memory information from an EntryDataClass."""
+		for name in self.Quantities: self.stats[name].add(data.memory[name])
+	
+	def merge(self, other):
+		for name in self.Quantities: self.stats[name].merge(other.stats[name])
+		return self
+	# merge()
+	
+	def n(self): return self.rss.n()
+	
+	def FormatAsList(self):
+		"""Prints the total memory increase and the peak memory into a list."""
+		if self.n() == 0: return [ "memory n/a" ]
+		return [
+		  "RSS %+g MB" % self.rssDelta.sum(), "(peak %g MB)" % self.rss.max(),
+		  "VSIZE %+g MB" % self.vsizeDelta.sum(), "(peak %g MB)" % self.vsize.max(),
+		  ]
+	# FormatAsList()
+	
+# class MemoryUsageStatsClass
+
+
+class MemoryStatsClass:
+	"""Memory usage statistics of all the modules and of the events.
+	
+	The statistics (MemoryUsageStatsClass) of each module are kept in the order
+	the modules are first seen.
+	"""
+	def __init__(self):
+		self.modules = OrderedDict()
+		self.event = MemoryUsageStatsClass("=== events ===")
+	# __init__()
+	
+	def add(self, data):
+		"""Adds the memory information from an EntryDataClass."""
+		if not data.isModule(): self.event.add(data)
+		else:
+			try: stats = self.modules[data.module]
+			except KeyError:
+				stats = self.modules[data.module] = MemoryUsageStatsClass(data.module)
+			stats.add(data)
+		# if ... else
+	# add()
+	
+	def merge(self, other):
+		"""Adds all the statistics from another MemoryStatsClass."""
+		for key, stats in other.modules.items():
+			try: self.modules[key].merge(stats)
+			except KeyError: self.modules[key] = stats
+		# for
+		self.event.merge(other.event)
+		return self
+	# merge()
+	
+	def get(self, key):
+		"""Returns the statistics of the specified module (None if n/a)."""
+		return self.modules.get(key)
+	
+# class MemoryStatsClass
+
+
 #
 # format parsing
 #
@@ -435,7 +1359,7 @@ def ParseTimeModuleLine(line):
 		EventKey = EventKeyClass((int(Tokens[2]), int(Tokens[4]), int(Tokens[6])))
 		ModuleKey = ModuleKeyClass((Tokens[7], Tokens[8]))
 		time=float(Tokens[9])
-	except Exception, e:
+	except Exception as e:
 		raise FormatError(
 		  "TimeModule format not recognized: '%s' (%s)" % (line, str(e)),
 		  type="Module", event=EventKey, module=ModuleKey
@@ -457,6 +1381,49 @@ def ParseTimeModuleLine(line):
 # ParseTimeModuleLine()
 
 
+def ParseMemoryCheckLine(line):
+	"""Parses a line to extract memory usage information.
+	
+	The line must be known to contain memory usage information.
+	The function returns a EntryDataClass including the memory information, or
+	raises a FormatError if the line has no valid format. The event key is
+	not available from the line, and it is left None.
+	
+	Format (from the MemoryCheck service; type and label of the module, and
+	virtual and resident memory in MB with their increase):
+	
+	MemoryCheck: module GENIEGen:generator VSIZE 1027.43 0.5 RSS 612.6 0.25
+	MemoryCheck: event : VSIZE 1027.93 0.5 RSS 612.85 0.25
+	"""
+	Tokens = line.split()
+	
+	ModuleKey = None
+	try:
+		if Tokens[0] != 'MemoryCheck:':
+			raise RuntimeError("unexpected line header '%s'" % Tokens[0])
+		if Tokens[1] == 'module':
+			type_, label = Tokens[2].rsplit(':', 1)
+			ModuleKey = ModuleKeyClass((label, type_))
+			Tokens = Tokens[3:]
+		elif Tokens[1] in ( 'event', 'event:' ):
+			Tokens = Tokens[3:] if Tokens[2] == ':' else Tokens[2:]
+		else:
+			raise RuntimeError("unexpected entry type '%s'" % Tokens[1])
+		if (len(Tokens) != 6) or (Tokens[0] != 'VSIZE') or (Tokens[3] != 'RSS'):
+			raise RuntimeError("unexpected memory information")
+		MemoryData = dict(vsize=float(Tokens[1]), vsizeDelta=float(Tokens[2]),
+		  rss=float(Tokens[4]), rssDelta=float(Tokens[5]))
+	except Exception as e:
+		raise FormatError(
+		  "MemoryCheck format not recognized: '%s' (%s)" % (line, str(e)),
+		  type="Memory", module=ModuleKey
+		  )
+	# try ... except
+	
+	return EntryDataClass(None, module=ModuleKey, memory=MemoryData)
+# ParseMemoryCheckLine()
+
+
 def ParseTimeEventLine(line):
 	"""Parses a line to extract event timing information.
 	
@@ -475,7 +1442,7 @@ def ParseTimeEventLine(line):
 	try:
 		EventKey = EventKeyClass((int(Tokens[2]), int(Tokens[4]), int(Tokens[6])))
 		time = float(Tokens[7])
-	except Exception, e:
+	except Exception as e:
 		raise FormatError(
 		  "TimeEvent format not recognized: '%s' (%s)" % (line, str(e)),
 		  type="Event", event=EventKey
@@ -496,118 +1463,2040 @@ def ParseTimeEventLine(line):
 # ParseTimeEventLine()
 
 
-def OPEN(Path, mode = 'r'):
-	"""Open a file (possibly a compressed one).
+def ParseNumberRanges(spec):
+	"""Parses a comma-separated list of numbers and ranges (e.g. "1,4-6,10-").
 	
-	Support for modes other than 'r' (read-only) are questionable.
+	Returns a list of (first, last) pairs; last is None for open ranges.
 	"""
-	if Path.endswith('.bz2'): return bz2.BZ2File(Path, mode)
-	if Path.endswith('.gz'): return gzip.GzipFile(Path, mode)
-	return open(Path, mode)
-# OPEN()
+	Ranges = []
+	for item in spec.split(','):
+		first, sep, last = item.partition('-')
+		first = int(first)
+		if not sep: last = first
+		elif not last.strip(): last = None
+		else:
+			last = int(last)
+			if last < first: raise ValueError("invalid range '%s'" % item)
+		# if ... else
+		Ranges.append(( first, last ))
+	# for
+	return Ranges
+# ParseNumberRanges()
 
 
-def ParseInputFile(InputFilePath, AllStats, EventStats, options):
-	"""Parses a log file.
+class TimingSelectorClass:
+	"""Selection of the timing entries by module, run, subrun and event.
 	
-	The art log file at InputFilePath is parsed.
-	The per-module statistics are added to the existing in AllStats (an instance
-	of JobStatsClass), creating new ones as needed. Similarly, per-event
-	statistics are added to EventStats (a TimeModuleStatsClass instance).
+	The selection criteria are:
+	- modules: labels, or names as printed (e.g. 'SimWire[daq]'), of the modules
+	  to be kept
+	- moduleRegex: regular expression searched in the printed module names
+	- runs, subRuns, events: the run, subrun and event numbers to be kept, as
+	  lists of (first, last) ranges (see ParseNumberRanges())
+	- nSkipEvents: number of events to be skipped at the beginning of the log
+	A criterion set to None does not restrict the selection. Modules are kept
+	if they match either modules or moduleRegex; the event timing is kept for
+	all the selected events. Memory usage entries follow the same selection.
 	
-	options class can contain the following members:
-	- Permissive (default: false): do not bail out when a format error is found;
-	  the entry is typically skipped. This often happens because the output line
-	  of the timing information is interrupted by some other output.
-	- MaxEvents (default: all events): collect statistics for at most MaxEvents
-	  events (always the first ones)
-	- CheckDuplicates (default: false): enables the single-event tracking, that
-	  allows to check for duplicates
+	The decisions are cached for each module and for the last event, so that
+	the line parser (TimingLineParserClass) can discard an entry with a couple
+	of lookups, before any object is created for it.
+	The keys of the skipped events are remembered, so that also their late
+	entries are skipped; a new selector is needed for each log.
+	"""
+	def __init__(self, modules = None, moduleRegex = None, runs = None,
+	  subRuns = None, events = None, nSkipEvents = 0):
+		self.modules = None if modules is None else set(modules)
+		self.moduleRegex = None if moduleRegex is None else re.compile(moduleRegex)
+		self.runs = runs
+		self.subRuns = subRuns
+		self.events = events
+		self.nSkipEvents = nSkipEvents
+		self.moduleDecisions = {}
+		self.skippedEvents = set()
+		self.lastEventKey = None
+		self.bLastEventSelected = False
+	# __init__()
 	
-	It returns the number of errors encountered.
+	@staticmethod
+	def inRanges(value, ranges):
+		if ranges is None: return True
+		for first, last in ranges:
+			if (value >= first) and ((last is None) or (value <= last)): return True
+		return False
+	# inRanges()
+	
+	def selectEvent(self, eventKey):
+		"""Returns whether the event is selected (skipping it, if due)."""
+		if eventKey == self.lastEventKey: return self.bLastEventSelected
+		self.lastEventKey = eventKey
+		if eventKey in self.skippedEvents: bSelected = False
+		elif len(self.skippedEvents) < self.nSkipEvents:
+			self.skippedEvents.add(eventKey)
+			bSelected = False
+		else:
+			bSelected = self.inRanges(eventKey.run(), self.runs) \
+			  and self.inRanges(eventKey.subRun(), self.subRuns) \
+			  and self.inRanges(eventKey.event(), self.events)
+		# if ... else
+		self.bLastEventSelected = bSelected
+		return bSelected
+	# selectEvent()
+	
+	def selectModule(self, moduleKey):
+		"""Returns whether the module is selected."""
+		try: return self.moduleDecisions[moduleKey]
+		except KeyError: pass
+		if (self.modules is None) and (self.moduleRegex is None): bSelected = True
+		else:
+			name = str(moduleKey)
+			bSelected = ((self.modules is not None)
+			  and ((moduleKey.instance() in self.modules) or (name in self.modules))
+			  ) or ((self.moduleRegex is not None)
+			  and (self.moduleRegex.search(name) is not None))
+		# if ... else
+		self.moduleDecisions[moduleKey] = bSelected
+		return bSelected
+	# selectModule()
+	
+	def select(self, TimeData):
+		"""Returns whether the entry (EntryDataClass) is selected."""
+		if (TimeData.eventKey is not None) \
+		  and not self.selectEvent(TimeData.eventKey):
+			return False
+		return (TimeData.module is None) or self.selectModule(TimeData.module)
+	# select()
+	
+# class TimingSelectorClass
+
+
+def CreateTimingSelector(options):
+	"""Returns a new TimingSelectorClass if options select entries, or None.
+	
+	The options are SelectedModules, ModuleRegex, Runs, SubRuns, EventRange
+	and SkipEvents (see ParseInputFile()).
 	"""
-	def CompleteEvent(CurrentEvent, EventStats, AllStats):
-		"""Make sure that CurrentEvent is known to all stats."""
-		EventStats.complete(( CurrentEvent, ))
-		for ModuleStats in AllStats:
-			ModuleStats.complete(EventStats.getEvents())
-	# CompleteEvent()
+	criteria = dict(
+	  modules=getattr(options, 'SelectedModules', None),
+	  moduleRegex=getattr(options, 'ModuleRegex', None),
+	  runs=getattr(options, 'Runs', None),
+	  subRuns=getattr(options, 'SubRuns', None),
+	  events=getattr(options, 'EventRange', None),
+	  )
+	nSkipEvents = getattr(options, 'SkipEvents', 0)
+	if all(value is None for value in criteria.values()) and (nSkipEvents <= 0):
+		return None
+	return TimingSelectorClass(nSkipEvents=nSkipEvents, **criteria)
+# CreateTimingSelector()
+
+
+class TimingLineParserClass:
+	"""Fast parser of timing lines.
 	
+	Each line is parsed with a single match of a precompiled regular expression.
+	Module keys are looked up directly in the ModuleKeyClass registry;
+	consecutive lines from the same event share the same EventKeyClass object.
+	Lines that do not match the expected format exactly are handed to the
+	complete parsers (ParseTimeModuleLine() and ParseTimeEventLine()), which are
+	more tolerant and take care of describing the format errors.
+	If a selector (TimingSelectorClass) is specified, the entries it does not
+	select are discarded as soon as the line is split, and the parsing methods
+	return None for them.
+	"""
+	ModuleLinePattern = re.compile(
+	  r'TimeModule> run: (\d+) subRun: (\d+) event: (\d+) ([^ ]+) ([^ ]+) ([^ ]+)$'
+	  )
+	EventLinePattern = re.compile(
+	  r'TimeEvent> run: (\d+) subRun: (\d+) event: (\d+) ([^ ]+)$'
+	  )
+	MemoryLinePattern = re.compile(
+	  r'MemoryCheck: (?:module ([^ ]+):([^ :]+)|event :) VSIZE ([^ ]+) ([^ ]+)'
+	  r' RSS ([^ ]+) ([^ ]+)$'
+	  )
 	
-	LogFile = OPEN(InputFilePath, 'r')
+	def __init__(self, selector = None):
+		self.moduleKeys = ModuleKeyClass.Registry
+		self.lastEventID = None
+		self.lastEventKey = None
+		self.selector = selector
+	# __init__()
 	
-	nErrors = 0
+	def ModuleKey(self, label, type_):
+		"""Returns the shared key object for the specified module."""
+		try: return self.moduleKeys[(label, type_)]
+		except KeyError: return ModuleKeyClass(( label, type_ ))
+	# ModuleKey()
+	
+	def EventKey(self, run, subRun, event):
+		"""Returns the event key from the strings of its numbers."""
+		if (run, subRun, event) != self.lastEventID:
+			self.lastEventKey \
+			  = EventKeyClass.fromNumbers(int(run), int(subRun), int(event))
+			self.lastEventID = (run, subRun, event)
+		# if
+		return self.lastEventKey
+	# EventKey()
+	
+	def selected(self, TimeData):
+		"""Returns TimeData (EntryDataClass) if selected, None otherwise."""
+		if (self.selector is None) or self.selector.select(TimeData):
+			return TimeData
+		return None
+	# selected()
+	
+	def parsed(self, TimeData):
+		"""Like selected(), for entries from the complete parsers.
+		
+		The event of the entry becomes the last parsed one, as with EventKey().
+		"""
+		self.lastEventKey = TimeData.eventKey
+		self.lastEventID = None
+		return self.selected(TimeData)
+	# parsed()
+	
+	def parseModuleTime(self, line):
+		"""Returns module key and time from a module timing line."""
+		try:
+			run, subRun, event, label, type_, time \
+			  = self.ModuleLinePattern.match(line).groups()
+			time = float(time)
+			if (self.selector is not None) \
+			  and not self.selector.selectEvent(self.EventKey(run, subRun, event)):
+				return None
+		except (AttributeError, ValueError): # no match, or bad time or event
+			TimeData = self.parsed(ParseTimeModuleLine(line))
+			if TimeData is None: return None
+			return self.ModuleKey(*TimeData.module), TimeData.time()
+		# try ... except
+		moduleKey = self.ModuleKey(label, type_)
+		if (self.selector is not None) and not self.selector.selectModule(moduleKey):
+			return None
+		return moduleKey, time
+	# parseModuleTime()
+	
+	def parseEventTime(self, line):
+		"""Returns the time from an event timing line."""
+		try:
+			match = self.EventLinePattern.match(line)
+			time = float(match.group(4))
+			if (self.selector is not None) \
+			  and not self.selector.selectEvent(self.EventKey(*match.group(1, 2, 3))):
+				return None
+			return time
+		except (AttributeError, ValueError): # no match, or bad time or event
+			TimeData = self.parsed(ParseTimeEventLine(line))
+			return None if TimeData is None else TimeData.time()
+	# parseEventTime()
+	
+	def parseModuleLine(self, line):
+		"""Like ParseTimeModuleLine(), returns a EntryDataClass."""
+		try:
+			run, subRun, event, label, type_, time \
+			  = self.ModuleLinePattern.match(line).groups()
+			time = float(time)
+			eventKey = self.EventKey(run, subRun, event)
+		except (AttributeError, ValueError): # no match, or bad time or event
+			return self.parsed(ParseTimeModuleLine(line))
+		moduleKey = self.ModuleKey(label, type_)
+		if (self.selector is not None) and not (
+		  self.selector.selectEvent(eventKey) and self.selector.selectModule(moduleKey)
+		  ):
+			return None
+		# if
+		return EntryDataClass(eventKey, module=moduleKey, time=time)
+	# parseModuleLine()
+	
+	def parseEventLine(self, line):
+		"""Like ParseTimeEventLine(), returns a EntryDataClass."""
+		try:
+			run, subRun, event, time = self.EventLinePattern.match(line).groups()
+			time = float(time)
+			eventKey = self.EventKey(run, subRun, event)
+		except (AttributeError, ValueError): # no match, or bad time or event
+			return self.parsed(ParseTimeEventLine(line))
+		if (self.selector is not None) and not self.selector.selectEvent(eventKey):
+			return None
+		return EntryDataClass(eventKey, time=time)
+	# parseEventLine()
+	
+	def parseMemoryLine(self, line):
+		"""Like ParseMemoryCheckLine(), returns a EntryDataClass.
+		
+		The entry is assigned to the event of the last parsed timing line (None
+		if there is none yet), which the selector uses to select it; without a
+		selector, parseModuleTime() does not keep track of the event.
+		"""
+		try:
+			type_, label, vsize, vsizeDelta, rss, rssDelta \
+			  = self.MemoryLinePattern.match(line).groups()
+			data = dict(vsize=float(vsize), vsizeDelta=float(vsizeDelta),
+			  rss=float(rss), rssDelta=float(rssDelta))
+		except (AttributeError, ValueError): # no match, or bad value
+			MemoryData = ParseMemoryCheckLine(line)
+			MemoryData.eventKey = self.lastEventKey
+			if MemoryData.isModule():
+				MemoryData.module = self.ModuleKey(*MemoryData.module)
+			return self.selected(MemoryData)
+		# try ... except
+		return self.selected(EntryDataClass(self.lastEventKey, memory=data,
+		  module=None if label is None else self.ModuleKey(label, type_)))
+	# parseMemoryLine()
+	
+# class TimingLineParserClass
+
+
+# compression formats: magic bytes at the beginning of the file, and the
+# external decompression commands, in order of preference
+CompressionFormats = OrderedDict([
+	( 'gzip',  { 'magic': b'\x1f\x8b',
+	             'commands': [ [ 'pigz', '-dc' ], [ 'gzip', '-dc' ] ], }),
+	( 'bzip2', { 'magic': b'BZh',
+	             'commands': [ [ 'pbzip2', '-dc' ], [ 'bzip2', '-dc' ] ], }),
+	( 'xz',    { 'magic': b'\xfd7zXZ\x00',
+	             'commands': [ [ 'xz', '-dc', '-T0' ] ], }),
+	( 'zstd',  { 'magic': b'\x28\xb5\x2f\xfd',
+	             'commands': [ [ 'zstd', '-dc', '-T0' ] ], }),
+	( 'lz4',   { 'magic': b'\x04\x22\x4d\x18',
+	             'commands': [ [ 'lz4', '-dc' ] ], }),
+	])
+
+
+def DetectCompression(Path):
+	"""Returns the compression format of the file (None if not compressed)."""
+	with open(Path, 'rb') as File:
+		Header = File.read(max(len(spec['magic'])
+		  for spec in CompressionFormats.values()))
+	for Format, spec in CompressionFormats.items():
+		if Header.startswith(spec['magic']): return Format
+	return None
+# DetectCompression()
+
+
+class DecompressionPipeClass:
+	"""Reads the output of an external decompression program.
+	
+	The object behaves as a read-only text file. On close(), an error is raised
+	if the program has failed. If the file is closed before the end of the
+	output, the program is terminated, and its being killed by that or by the
+	broken pipe is not considered a failure.
+	"""
+	def __init__(self, Command, Path):
+		self.command = Command + [ Path, ]
+		self.process = subprocess.Popen(self.command,
+		  stdin=open(os.devnull, 'rb'), stdout=subprocess.PIPE, bufsize=-1)
+		self.file = TextReader(self.process.stdout)
+	# __init__()
+	
+	def __iter__(self): return iter(self.file)
+	def read(self, *args): return self.file.read(*args)
+	def readline(self, *args): return self.file.readline(*args)
+	
+	def close(self):
+		if self.process is None: return
+		bRunning = self.process.poll() is None # still producing output?
+		if bRunning: self.process.terminate()
+		self.file.close()
+		res = self.process.wait()
+		self.process = None
+		if bRunning and (res in ( -signal.SIGPIPE, -signal.SIGTERM )): return
+		if res != 0:
+			raise IOError("'%s' exited with code %d" % (" ".join(self.command), res))
+	# close()
+	
+	def __enter__(self): return self
+	def __exit__(self, exc_type, exc_value, traceback): self.close()
+	
+# class DecompressionPipeClass
+
+
+def OpenExternalDecompressor(Path, Format):
+	"""Returns the output pipe of an external decompressor, None if none found."""
+	for Command in CompressionFormats[Format]['commands']:
+		if find_executable(Command[0]): return DecompressionPipeClass(Command, Path)
+	return None
+# OpenExternalDecompressor()
+
+
+def OPEN(Path, mode = 'r', bExternal = False):
+	"""Open a file (possibly a compressed one).
+	
+	When reading, the compression format is detected from the content of the
+	file; gzip, bzip2, xz, zstd and lz4 formats are supported.
+	If bExternal is true, or if the python module for the format is not
+	available, the file is decompressed by an external program through a pipe
+	(which runs concurrently to the reading process).
+	When reading, the file yields text (decoded as UTF-8 in python 3).
+	Support for modes other than 'r' (read-only) are questionable; in that case,
+	the file name suffix determines the compression.
+	"""
+	if not mode.startswith('r'):
+		if Path.endswith('.bz2'): return bz2.BZ2File(Path, mode)
+		if Path.endswith('.gz'): return gzip.GzipFile(Path, mode)
+		return open(Path, mode)
+	# if not reading
+	
+	Format = DetectCompression(Path)
+	if Format is None: return TextReader(open(Path, 'rb'))
+	
+	if bExternal:
+		File = OpenExternalDecompressor(Path, Format)
+		if File is not None: return File
+	# if
+	if Format == 'gzip': return TextReader(gzip.GzipFile(Path, 'rb'))
+	if Format == 'bzip2' and 'bz2' in globals():
+		return TextReader(bz2.BZ2File(Path, 'rb'))
+	if Format == 'xz' and lzma is not None:
+		return TextReader(lzma.LZMAFile(Path, 'rb'))
+	if Format == 'zstd' and zstandard is not None \
+	  and hasattr(zstandard, 'open'):
+		return TextReader(zstandard.open(Path, 'rb'))
+	if Format == 'lz4' and 'lz4' in globals():
+		return TextReader(lz4.frame.open(Path, 'rb'))
+	
+	File = OpenExternalDecompressor(Path, Format)
+	if File is None:
+		raise IOError("No support for %s decompression of '%s'" % (Format, Path))
+	return File
+# OPEN()
+
+
+def SelectTimingLines(Lines, FirstLineNo = 0, bMemory = False):
+	"""Selects the timing lines from a sequence of log lines.
+	
+	This is a generator: for each line with timing information, it yields a
+	tuple (iLine, line, bModule), where iLine is the index of the line (starting
+	from FirstLineNo), line is its stripped content and bModule tells whether it
+	is a module timing line (as opposed to an event one).
+	If bMemory is set, also the memory usage lines ("MemoryCheck: ") are
+	selected, with bModule set to None.
+	Lines identical to the previous one are skipped.
+	"""
 	LastLine = None
-	CurrentEvent = None
-	for iLine, line in enumerate(LogFile):
+	for iLine, line in enumerate(Lines, FirstLineNo):
 		
 		line = line.strip()
 		if line == LastLine: continue # duplicate line
 		LastLine = line
 		
-		if line.startswith("TimeModule> "):
-			
+		if line.startswith("TimeModule> "):  yield iLine, line, True
+		elif line.startswith("TimeEvent> "): yield iLine, line, False
+		elif bMemory and line.startswith("MemoryCheck: "): yield iLine, line, None
+	# for line in log file
+# SelectTimingLines()
+
+
+# marker of the timing lines, as found by ScanTimingLines()
+TimingLineMarkerPattern = re.compile(br'Time(?:Module|Event)> ')
+# marker of the timing and memory usage lines
+TimingAndMemoryLineMarkerPattern \
+  = re.compile(br'Time(?:Module|Event)> |MemoryCheck: ')
+
+def ScanTimingLines(Buffer, Start = 0, End = None, FirstLineNo = 0,
+  bMemory = False):
+	"""Selects the timing lines from a buffer with the content of a log.
+	
+	This is a faster alternative to SelectTimingLines(), and it yields the same
+	tuples. The buffer (for example, a memory-mapped file) is searched for the
+	timing line markers, and only the lines with the markers are extracted
+	(and decoded, in python 3).
+	The scan covers the range from Start (which must be the beginning of a line)
+	to End (by default, the end of the buffer).
+	The line indices start from FirstLineNo at Start.
+	Memory usage lines are also selected if bMemory is set (see
+	SelectTimingLines()).
+	"""
+	if End is None: End = len(Buffer)
+	iLine = FirstLineNo
+	LineNoPos = Start  # position of the line with index iLine
+	LastLine = None
+	LastLineEnd = None # position of the end of line of the last timing line
+	MarkerPattern \
+	  = TimingAndMemoryLineMarkerPattern if bMemory else TimingLineMarkerPattern
+	for match in MarkerPattern.finditer(Buffer, Start, End):
+		MarkerStart = match.start()
+		LineStart = Buffer.rfind(b'\n', Start, MarkerStart) + 1
+		if LineStart == 0: LineStart = Start
+		if Buffer[LineStart:MarkerStart].strip(): continue # not at line start
+		LineEnd = Buffer.find(b'\n', match.end(), End)
+		if LineEnd < 0: LineEnd = End
+		line = Buffer[LineStart:LineEnd].strip()
+		
+		iLine += Buffer[LineNoPos:LineStart].count(b'\n')
+		LineNoPos = LineStart
+		
+		# duplicate of the line just before?
+		bDuplicate = (LineStart == LastLineEnd + 1) and (line == LastLine) \
+		  if LastLineEnd is not None else False
+		LastLine = line
+		LastLineEnd = LineEnd
+		if bDuplicate: continue
+		
+		# the marker must be still complete after stripping, as in
+		# SelectTimingLines() (a bare "TimeModule> " line is not a timing line)
+		if line.startswith(b"TimeModule> "):  yield iLine, DecodeLine(line), True
+		elif line.startswith(b"TimeEvent> "): yield iLine, DecodeLine(line), False
+		elif line.startswith(b"MemoryCheck: "): yield iLine, DecodeLine(line), None
+	# for
+# ScanTimingLines()
+
+
+def CountLines(Buffer, Start, End, BlockSize = 1048576):
+	"""Returns the number of new line characters in the range of the buffer."""
+	n = 0
+	for BlockStart in xrange(Start, End, BlockSize):
+		n += Buffer[BlockStart:min(BlockStart + BlockSize, End)].count(b'\n')
+	return n
+# CountLines()
+
+
+def ReadTimingLines(InputFilePath, bExternal = False, bMemory = False):
+	"""Yields the timing lines from a log file, like SelectTimingLines().
+	
+	Uncompressed files are memory-mapped and scanned with ScanTimingLines(),
+	the others are read with OPEN() (with the bExternal option).
+	Memory usage lines are also yielded if bMemory is set.
+	"""
+	if (DetectCompression(InputFilePath) is None) \
+	  and (os.path.getsize(InputFilePath) > 0):
+		with open(InputFilePath, 'rb') as LogFile:
+			Buffer = mmap.mmap(LogFile.fileno(), 0, access=mmap.ACCESS_READ)
+		try:
+			for TimingLine in ScanTimingLines(Buffer, bMemory=bMemory):
+				yield TimingLine
+		finally:
+			Buffer.close()
+	else:
+		LogFile = OPEN(InputFilePath, 'r', bExternal=bExternal)
+		try:
+			for TimingLine in SelectTimingLines(LogFile, bMemory=bMemory):
+				yield TimingLine
+		finally:
+			LogFile.close()
+	# if ... else
+# ReadTimingLines()
+
+
+def ParseSelectedLines(TimingLines, LineParser = None):
+	"""Parses timing lines, as yielded by SelectTimingLines().
+	
+	This is a generator: for each timing line it yields a tuple
+	(iLine, TimeData), where iLine is the index of the line and TimeData is
+	either the EntryDataClass from the parsing of the line, or the FormatError
+	from the failure of that parsing. Memory usage lines are also parsed into
+	EntryDataClass.
+	LineParser is the TimingLineParserClass to be used (a new one by default);
+	the entries not selected by its selector are skipped.
+	"""
+	if LineParser is None: LineParser = TimingLineParserClass()
+	for iLine, line, bModule in TimingLines:
+		try:
+			if bModule:           TimeData = LineParser.parseModuleLine(line)
+			elif bModule is None: TimeData = LineParser.parseMemoryLine(line)
+			else:                 TimeData = LineParser.parseEventLine(line)
+		except FormatError as e:
+			TimeData = e
+		if TimeData is None: continue # not selected
+		yield iLine, TimeData
+	# for
+# ParseSelectedLines()
+
+
+def ParseSelectedValues(TimingLines, LineParser = None):
+	"""Parses only the timing values from timing lines.
+	
+	This is a lighter version of ParseSelectedLines() that does not create any
+	per-event object. It yields tuples (iLine, ModuleKey, Time), where ModuleKey
+	is None for event timing lines, and Time is either the time or the
+	FormatError from the failure of the parsing of the line.
+	Memory usage lines are yielded with ModuleKey None and their EntryDataClass
+	instead of the time. Entries not selected by the selector of LineParser
+	are skipped.
+	"""
+	if LineParser is None: LineParser = TimingLineParserClass()
+	for iLine, line, bModule in TimingLines:
+		ModuleKey = None
+		try:
+			if bModule:
+				Value = LineParser.parseModuleTime(line)
+				if Value is None: continue # not selected
+				ModuleKey, Time = Value
+			elif bModule is None: Time = LineParser.parseMemoryLine(line)
+			else:                 Time = LineParser.parseEventTime(line)
+		except FormatError as e:
+			Time = e
+		if Time is None: continue # not selected
+		yield iLine, ModuleKey, Time
+	# for
+# ParseSelectedValues()
+
+
+def ParseTimingLines(Lines, FirstLineNo = 0, LineParser = None,
+  bMemory = False):
+	"""Extracts the timing information from a sequence of log lines.
+	
+	This is a generator: for each line with timing information, it yields a
+	tuple (iLine, TimeData), where iLine is the index of the line (starting from
+	FirstLineNo) and TimeData is either the EntryDataClass from the parsing of
+	the line, or the FormatError from the failure of that parsing.
+	Lines identical to the previous one are skipped.
+	LineParser is the TimingLineParserClass to be used (a new one by default).
+	Memory usage lines are also parsed if bMemory is set.
+	"""
+	return ParseSelectedLines \
+	  (SelectTimingLines(Lines, FirstLineNo, bMemory=bMemory), LineParser)
+# ParseTimingLines()
+
+
+def ParseTimingValues(Lines, FirstLineNo = 0, LineParser = None,
+  bMemory = False):
+	"""Extracts only the timing values from a sequence of log lines.
+	
+	This is a lighter version of ParseTimingLines() that does not create any
+	per-event object. It yields tuples (iLine, ModuleKey, Time), where ModuleKey
+	is None for event timing lines, and Time is either the time or the
+	FormatError from the failure of the parsing of the line.
+	Memory usage lines are also parsed if bMemory is set.
+	"""
+	return ParseSelectedValues \
+	  (SelectTimingLines(Lines, FirstLineNo, bMemory=bMemory), LineParser)
+# ParseTimingValues()
+
+
+class NoMoreInput(Exception):
+	"""Raised when the parsing stops because enough events were collected.
+	
+	It carries the number of errors encountered until then (nErrors).
+	"""
+	def __init__(self, nErrors = 0):
+		Exception.__init__(self, "no more input needed")
+		self.nErrors = nErrors
+	# __init__()
+# class NoMoreInput
+
+
+class TimingStatsCollectorClass:
+	"""Collects the timing information from a log into statistics objects.
+	
+	The information from each timing line is passed to process(), in log order.
+	The per-module statistics are added to AllStats (a JobStatsClass), creating
+	new ones as needed; the per-event statistics are added to EventStats
+	(a TimeModuleStatsClass). Memory usage information is added to the memory
+	statistics of AllStats.
+	After the last line, finish() must be called to complete the last event.
+	The options are the same as in ParseInputFile(). When options.MaxEvents
+	events have been collected, NoMoreInput is raised.
+	If an event sink is specified (e.g. EventTablePagerClass), each timing entry
+	accepted by the statistics (i.e. not a duplicate) is also passed to its add()
+	method, and the key of each completed event to its completeEvent().
+	"""
+	def __init__(self, AllStats, EventStats, options, InputFilePath = None,
+	  EventSink = None):
+		self.AllStats = AllStats
+		self.EventStats = EventStats
+		self.options = options
+		self.InputFilePath = InputFilePath
+		self.EventSink = EventSink
+		self.CurrentEvent = None
+		self.nErrors = 0
+	# __init__()
+	
+	def needsEvents(self):
+		"""Returns whether process() is required instead of processValue().
+		
+		The single events are needed to check for duplicates, to fill an event
+		sink and to track the entries (as for the event table, the time series
+		analysis and the event shares).
+		"""
+		return self.options.CheckDuplicates or (self.EventSink is not None) \
+		  or self.EventStats.isTracking()
+	# needsEvents()
+	
+	def CreateModuleStats(self, ModuleKey):
+		"""Creates and registers statistics for a new module."""
+		if isinstance(self.EventStats, ColumnarTimeModuleStatsClass):
+			ModuleStats = ColumnarTimeModuleStatsClass \
+			  (ModuleKey, self.EventStats.eventIndex)
+		else:
+			ModuleStats = TimeModuleStatsClass(ModuleKey,
+			  bTrackEntries=getattr(self.options, 'TrackEntries',
+			    self.options.CheckDuplicates),
+			  bCheckDuplicates=self.options.CheckDuplicates,
+			  sketch=CreateQuantileSketch(self.options)
+			  )
+		# if ... else
+		self.AllStats[ModuleKey] = ModuleStats
+		return ModuleStats
+	# CreateModuleStats()
+	
+	def CompleteEvent(self, CurrentEvent):
+		"""Make sure that CurrentEvent is known to all stats."""
+		self.EventStats.complete(( CurrentEvent, ))
+		if self.EventStats.isTracking():
+			for ModuleStats in self.AllStats:
+				ModuleStats.completeFrom(self.EventStats)
+		else:
+			EventKeys = ( CurrentEvent, )
+			for ModuleStats in self.AllStats: ModuleStats.complete(EventKeys)
+		# if ... else
+		if self.EventSink is not None: self.EventSink.completeEvent(CurrentEvent)
+	# CompleteEvent()
+	
+	def processError(self, iLine, e):
+		"""Reports a format error; raises it unless in permissive mode."""
+		self.nErrors += 1
+		msg = "Format error on '%s'@%d" % (self.InputFilePath, iLine + 1)
+		try: msg += " (%s)" % str(e.data['type'])
+		except KeyError: pass
+		try: msg += ", for event " + str(e.data['event'])
+		except KeyError: pass
+		try: msg += ", module " + str(e.data['module'])
+		except KeyError: pass
+		print(msg, file=sys.stderr)
+		if not self.options.Permissive: raise e
+	# processError()
+	
+	def process(self, iLine, TimeData):
+		"""Adds the information from the timing line at iLine.
+		
+		TimeData is what ParseTimingLines() yields for that line.
+		"""
+		if isinstance(TimeData, FormatError):
+			self.processError(iLine, TimeData)
+			return
+		# if error
+		
+		if TimeData.isMemory():
+			self.processMemory(TimeData)
+			return
+		# if memory
+		
+		# the previous event is completed before adding to the new one, so that
+		# the entries of each module follow the order of the events
+		if (self.CurrentEvent != TimeData.eventKey):
+			if self.CurrentEvent: self.CompleteEvent(self.CurrentEvent)
+			self.CurrentEvent = TimeData.eventKey
+		# if
+		
+		if TimeData.isModule():
 			try:
-				TimeData = ParseTimeModuleLine(line)
-			except FormatError, e:
-				nErrors += 1
-				msg = "Format error on '%s'@%d" % (InputFilePath, iLine + 1)
-				try: msg += " (%s)" % str(e.data['type'])
-				except KeyError: pass
-				try: msg += ", for event " + str(e.data['event'])
-				except KeyError: pass
-				try: msg += ", module " + str(e.data['module'])
-				except KeyError: pass
-				print >>sys.stderr, msg
-				if not options.Permissive: raise
-				else:                      continue
-			# try ... except
+				ModuleStats = self.AllStats[TimeData.module]
+			except KeyError:
+				ModuleStats = self.CreateModuleStats(TimeData.module)
+				ModuleStats.completeFrom(self.EventStats)
 			
+			bAdded = ModuleStats.add(TimeData)
+		else:
+			bAdded = self.EventStats.add(TimeData)
+		# if ... else
+		
+		# the sink gets only the entries which were not rejected as duplicate
+		if bAdded and (self.EventSink is not None): self.EventSink.add(TimeData)
+		
+		if not TimeData.isModule():
+			if (self.options.MaxEvents >= 0) \
+			  and (self.EventStats.n() >= self.options.MaxEvents):
+				if self.CurrentEvent: self.CompleteEvent(self.CurrentEvent)
+				raise NoMoreInput(self.nErrors)
+		# if event
+	# process()
+	
+	def processValue(self, iLine, ModuleKey, Time):
+		"""Adds a timing value as yielded by ParseTimingValues().
+		
+		This is a faster alternative to process() which does not keep track of
+		the events, and it can be used only when the statistics are not tracking
+		the entries (i.e. when not checking for duplicates) and there is no event
+		sink.
+		"""
+		if isinstance(Time, FormatError):
+			self.processError(iLine, Time)
+		elif ModuleKey is not None:
 			try:
-				ModuleStats = AllStats[TimeData.module]
+				ModuleStats = self.AllStats[ModuleKey]
 			except KeyError:
-				ModuleStats = TimeModuleStatsClass \
-				  (TimeData.module, bTrackEntries=options.CheckDuplicates)
-				AllStats[TimeData.module] = ModuleStats
-			#
-			
-			ModuleStats.add(TimeData)
-		elif line.startswith("TimeEvent> "):
+				ModuleStats = self.CreateModuleStats(ModuleKey)
+			Stats.add(ModuleStats, Time)
+		elif isinstance(Time, EntryDataClass):
+			self.processMemory(Time)
+		else:
+			Stats.add(self.EventStats, Time)
+			if (self.options.MaxEvents >= 0) \
+			  and (self.EventStats.n() >= self.options.MaxEvents):
+				raise NoMoreInput(self.nErrors)
+		# if ... else
+	# processValue()
+	
+	def processMemory(self, MemoryData):
+		"""Adds memory usage information (an EntryDataClass)."""
+		if self.AllStats.memory is not None: self.AllStats.memory.add(MemoryData)
+	
+	def finish(self):
+		"""Completes the last event; returns the number of errors."""
+		if self.CurrentEvent: self.CompleteEvent(self.CurrentEvent)
+		return self.nErrors
+	# finish()
+	
+# class TimingStatsCollectorClass
+
+
+class TimingRecordsClass:
+	"""Compact, ordered storage of the timing information parsed from a log.
+	
+	The records are added with append() in the form yielded by
+	ParseTimingLines(), and they can be replayed in either that form
+	(iterTimingLines()) or the form of ParseTimingValues() (iterTimingValues()).
+	Internally, each field is stored in a typed array.
+	"""
+	EventRecord = -1
+	ErrorRecord = -2
+	
+	def __init__(self):
+		self.modules = []      # list of module keys
+		self.moduleIndices = {}
+		self.lines = array.array('l')
+		self.moduleIndex = array.array('i') # or EventRecord, ErrorRecord
+		self.runs = array.array('l')
+		self.subRuns = array.array('l')
+		self.events = array.array('l')
+		self.times = array.array('d')
+		self.errors = []       # FormatError objects
+	# __init__()
+	
+	def __len__(self): return len(self.lines)
+	
+	def append(self, iLine, TimeData):
+		"""Adds a record as yielded by ParseTimingLines()."""
+		if isinstance(TimeData, FormatError):
+			moduleIndex = self.ErrorRecord
+			run, subRun, event = len(self.errors), 0, 0
+			time = 0.
+			self.errors.append(TimeData)
+		else:
+			if TimeData.isModule():
+				try: moduleIndex = self.moduleIndices[TimeData.module]
+				except KeyError:
+					moduleIndex = len(self.modules)
+					self.modules.append(TimeData.module)
+					self.moduleIndices[TimeData.module] = moduleIndex
+				# try
+			else: moduleIndex = self.EventRecord
+			eventKey = TimeData.eventKey
+			run, subRun, event = eventKey.run(), eventKey.subRun(), eventKey.event()
+			time = TimeData.time()
+		# if ... else
+		self.lines.append(iLine)
+		self.moduleIndex.append(moduleIndex)
+		self.runs.append(run)
+		self.subRuns.append(subRun)
+		self.events.append(event)
+		self.times.append(time)
+	# append()
+	
+	def iterTimingLines(self, Selector = None):
+		"""Yields the records like ParseTimingLines().
+		
+		Only the entries chosen by Selector (TimingSelectorClass) are yielded,
+		if specified; errors are always yielded.
+		"""
+		lastEventID = None
+		for iLine, moduleIndex, run, subRun, event, time in zip(self.lines,
+		  self.moduleIndex, self.runs, self.subRuns, self.events, self.times
+		  ):
+			if moduleIndex == self.ErrorRecord:
+				yield iLine, self.errors[run]
+				continue
+			# if error
+			if (run, subRun, event) != lastEventID:
+				lastEventID = (run, subRun, event)
+				eventKey = EventKeyClass.fromNumbers(run, subRun, event)
+			# if
+			if moduleIndex == self.EventRecord:
+				TimeData = EntryDataClass(eventKey, time=time)
+			else:
+				TimeData \
+				  = EntryDataClass(eventKey, module=self.modules[moduleIndex], time=time)
+			# if ... else
+			if (Selector is None) or Selector.select(TimeData): yield iLine, TimeData
+		# for
+	# iterTimingLines()
+	
+	def iterTimingValues(self, Selector = None):
+		"""Yields the records like ParseTimingValues().
+		
+		Only the entries chosen by Selector (TimingSelectorClass) are yielded,
+		if specified; errors are always yielded.
+		"""
+		if Selector is not None:
+			for iLine, TimeData in self.iterTimingLines(Selector):
+				if isinstance(TimeData, FormatError): yield iLine, None, TimeData
+				else:
+					yield iLine, TimeData.module, TimeData.time()
+			# for
+			return
+		# if selection
+		for iLine, moduleIndex, time, run \
+		  in zip(self.lines, self.moduleIndex, self.times, self.runs):
+			if moduleIndex == self.EventRecord:   yield iLine, None, time
+			elif moduleIndex == self.ErrorRecord: yield iLine, None, self.errors[run]
+			else: yield iLine, self.modules[moduleIndex], time
+		# for
+	# iterTimingValues()
+	
+	def toData(self):
+		"""Returns a representation of the records with only standard types."""
+		def ErrorData(data):
+			return dict(( key,
+			  tuple(value) if isinstance(value, ( tuple, EventKeyClass )) else value
+			  ) for key, value in data.items())
+		# ErrorData()
+		return {
+		  'modules': [ tuple(key) for key in self.modules ],
+		  'errors': [ ( str(e), ErrorData(e.data) ) for e in self.errors ],
+		  'arrays': dict(( name, ( a.typecode, ArrayToBytes(a) ) )
+		    for name, a in self.arrays()),
+		  }
+	# toData()
+	
+	@staticmethod
+	def fromData(data):
+		"""Returns a new TimingRecordsClass from the output of toData()."""
+		records = TimingRecordsClass()
+		for key in data['modules']:
+			records.moduleIndices[key] = len(records.modules)
+			records.modules.append(ModuleKeyClass(key))
+		# for
+		for msg, kargs in data['errors']:
+			if kargs.get('event') is not None:
+				kargs['event'] = EventKeyClass(kargs['event'])
+			if kargs.get('module') is not None:
+				kargs['module'] = ModuleKeyClass(kargs['module'])
+			records.errors.append(FormatError(msg, **kargs))
+		# for
+		for name, a in records.arrays():
+			typecode, content = data['arrays'][name]
+			if typecode != a.typecode:
+				raise RuntimeError("Wrong type '%s' for stored records %s (expected '%s')"
+				  % (typecode, name, a.typecode))
+			ArrayFromBytes(a, content)
+		# for
+		return records
+	# fromData()
+	
+	def arrays(self):
+		return [
+		  ( 'lines', self.lines ), ( 'moduleIndex', self.moduleIndex ),
+		  ( 'runs', self.runs ), ( 'subRuns', self.subRuns ),
+		  ( 'events', self.events ), ( 'times', self.times ),
+		  ]
+	# arrays()
+	
+# class TimingRecordsClass
+
+
+class ParseCacheClass:
+	"""On-disk cache of the timing information parsed from log files.
+	
+	The information from each log file is stored as TimingRecordsClass in a
+	binary file in the cache directory. The cache entry is valid only as long
+	as the path, size and modification time of the log file, the version of
+	the parser (Version) and the major version of python match the ones
+	recorded in the entry.
+	"""
+	Version = 1 # must be increased on any change of the parsing output
+	Magic = b"SortModuleTimes parsing cache\n"
+	
+	def __init__(self, CacheDir):
+		self.cacheDir = CacheDir
+	
+	@staticmethod
+	def fingerprint(InputFilePath):
+		InputFileStat = os.stat(InputFilePath)
+		return ( os.path.abspath(InputFilePath), InputFileStat.st_size,
+		  InputFileStat.st_mtime, ParseCacheClass.Version, sys.version_info[0], )
+	# fingerprint()
+	
+	def cachePath(self, InputFilePath):
+		Path = os.path.abspath(InputFilePath)
+		if not isinstance(Path, bytes): Path = Path.encode('utf-8')
+		return os.path.join(self.cacheDir, hashlib.sha1(Path).hexdigest() + ".cache")
+	# cachePath()
+	
+	def load(self, InputFilePath):
+		"""Returns the cached TimingRecordsClass for the file, None if n/a."""
+		try:
+			with open(self.cachePath(InputFilePath), 'rb') as CacheFile:
+				if CacheFile.read(len(self.Magic)) != self.Magic: return None
+				if pickle.load(CacheFile) != self.fingerprint(InputFilePath):
+					return None
+				return TimingRecordsClass.fromData(pickle.load(CacheFile))
+			# with
+		except (IOError, EOFError, ValueError, KeyError, RuntimeError,
+		  pickle.UnpicklingError):
+			return None
+	# load()
+	
+	def save(self, InputFilePath, records):
+		"""Stores the records from the specified file in the cache."""
+		if not os.path.isdir(self.cacheDir): os.makedirs(self.cacheDir)
+		CachePath = self.cachePath(InputFilePath)
+		TempPath = "%s.%d.tmp" % (CachePath, os.getpid())
+		with open(TempPath, 'wb') as CacheFile:
+			CacheFile.write(self.Magic)
+			pickle.dump(self.fingerprint(InputFilePath), CacheFile, 2)
+			pickle.dump(records.toData(), CacheFile, 2)
+		# with
+		os.rename(TempPath, CachePath)
+	# save()
+	
+# class ParseCacheClass
+
+
+def LoadTimingRecords(InputFilePath, Cache, bExternal = False):
+	"""Returns the TimingRecordsClass for a log file, parsing it if needed.
+	
+	If the cache (ParseCacheClass) has no valid entry for the file, the file is
+	parsed and the result is stored in the cache.
+	The file is read by ReadTimingLines(), with the bExternal option.
+	"""
+	records = Cache.load(InputFilePath)
+	if records is not None: return records
+	
+	records = TimingRecordsClass()
+	for iLine, TimeData \
+	  in ParseSelectedLines(ReadTimingLines(InputFilePath, bExternal=bExternal)):
+		records.append(iLine, TimeData)
+	try: Cache.save(InputFilePath, records)
+	except (IOError, OSError) as e:
+		print("Can't cache '%s': %s" % (InputFilePath, e), file=sys.stderr)
+	return records
+# LoadTimingRecords()
+
+
+#
+# TimeTracker databases
+#
+SQLiteMagic = b"SQLite format 3\x00"
+
+def IsTimeTrackerDatabase(Path):
+	"""Returns whether the file at Path is a SQLite database."""
+	with open(Path, 'rb') as File:
+		return File.read(len(SQLiteMagic)) == SQLiteMagic
+# IsTimeTrackerDatabase()
+
+
+def OpenTimeTrackerDatabase(Path):
+	"""Returns a connection to the SQLite database at Path."""
+	if sqlite3 is None:
+		raise IOError("No support for SQLite databases (reading '%s')" % Path)
+	return sqlite3.connect(Path)
+# OpenTimeTrackerDatabase()
+
+
+def IterateTimeTrackerEntries(Connection, LineParser = None):
+	"""Yields the timing entries from a TimeTracker database, in log order.
+	
+	The database is expected to have the tables written by art TimeTracker
+	service:
+	- TimeEvent (Run, SubRun, Event, Time)
+	- TimeModule (Run, SubRun, Event, Path, ModuleLabel, ModuleType, Time)
+	This is a generator yielding tuples (iRow, TimeData), like
+	ParseTimingLines(): the entries of the modules are yielded in the order of
+	the table, each event entry following the ones of its modules (events with
+	no module entry come last). The row ID takes the place of the line number.
+	LineParser is the TimingLineParserClass used to share the keys.
+	Only the event times are kept in memory, the module rows are streamed.
+	"""
+	if LineParser is None: LineParser = TimingLineParserClass()
+	EventTimes = OrderedDict()
+	for run, subRun, event, time, iRow in Connection.execute(
+	  "SELECT Run, SubRun, Event, Time, rowid FROM TimeEvent ORDER BY rowid"):
+		EventTimes.setdefault(( run, subRun, event ), ( time, iRow ))
+	# for
+	
+	def EventEntry(eventID):
+		time, iRow = EventTimes.pop(eventID)
+		return iRow, EntryDataClass(LineParser.EventKey(*eventID), time=time)
+	# EventEntry()
+	
+	LastEventID = None
+	for run, subRun, event, label, type_, time, iRow in Connection.execute(
+	  "SELECT Run, SubRun, Event, ModuleLabel, ModuleType, Time, rowid"
+	  " FROM TimeModule ORDER BY rowid"):
+		eventID = ( run, subRun, event )
+		if (eventID != LastEventID) and (LastEventID in EventTimes):
+			yield EventEntry(LastEventID)
+		LastEventID = eventID
+		yield iRow, EntryDataClass(LineParser.EventKey(*eventID),
+		  module=LineParser.ModuleKey(str(label), str(type_)), time=time)
+	# for
+	while EventTimes: yield EventEntry(next(iter(EventTimes)))
+# IterateTimeTrackerEntries()
+
+
+def StatsFromSummary(n, sum_, sumsq, min_, max_, sumsqdev = None):
+	"""Returns a Stats object with the specified (unweighted) summary.
+	
+	If the sum of the squared deviations from the average is not specified,
+	it is computed from sumsq (which is less precise).
+	"""
+	stats = Stats()
+	if not n: return stats
+	if sumsqdev is None: sumsqdev = max(sumsq - sum_**2 / n, 0.)
+	return stats.addSummary \
+	  (n, float(n), float(sum_), float(sumsq), min_, max_, float(sumsqdev))
+# StatsFromSummary()
+
+
+def ParseTimeTrackerDatabase(InputFilePath, Collector, Selector = None):
+	"""Adds the content of a TimeTracker database to the Collector statistics.
+	
+	If the single entries are not needed (no event tracking, percentiles,
+	event limit nor Selector), only the summary of each module, aggregated by
+	the database, is read. This relies on Collector.needsEvents() being true
+	whenever the entries are tracked or checked for duplicates, which is always
+	the case for the event table, --timeseries and --shares; without those,
+	the summary yields the same statistics as the single entries would.
+	Otherwise, all the entries are read in log order (see
+	IterateTimeTrackerEntries()) and processed one by one, keeping only the ones
+	chosen by Selector (TimingSelectorClass), if specified.
+	The collector (TimingStatsCollectorClass) is not finish()ed.
+	"""
+	options = Collector.options
+	Connection = OpenTimeTrackerDatabase(InputFilePath)
+	try:
+		Entries = IterateTimeTrackerEntries(Connection)
+		if Selector is not None:
+			Entries = ( ( iRow, TimeData ) for iRow, TimeData in Entries
+			  if Selector.select(TimeData) )
+		# if
+		if Collector.needsEvents():
+			for iRow, TimeData in Entries:
+				Collector.process(iRow, TimeData)
+		elif (options.MaxEvents >= 0) or CreateQuantileSketch(options) \
+		  or (Selector is not None):
+			for iRow, TimeData in Entries:
+				Collector.processValue(iRow,
+				  TimeData.module if TimeData.isModule() else None, TimeData.time())
+			# for
+		else:
+			for label, type_, n, sum_, sumsq, min_, max_, sumsqdev \
+			  in Connection.execute(
+			  "SELECT ModuleLabel, ModuleType, COUNT(Time), SUM(Time),"
+			  " SUM(Time*Time), MIN(Time), MAX(Time),"
+			  " SUM((Time - Average) * (Time - Average))"
+			  " FROM TimeModule JOIN (SELECT ModuleLabel, ModuleType,"
+			  "   AVG(Time) AS Average FROM TimeModule"
+			  "   GROUP BY ModuleLabel, ModuleType)"
+			  " USING (ModuleLabel, ModuleType)"
+			  " GROUP BY ModuleLabel, ModuleType ORDER BY MIN(TimeModule.rowid)"
+			  ):
+				ModuleKey = ModuleKeyClass(( str(label), str(type_) ))
+				try:
+					ModuleStats = Collector.AllStats[ModuleKey]
+				except KeyError:
+					ModuleStats = Collector.CreateModuleStats(ModuleKey)
+				Stats.merge(ModuleStats,
+				  StatsFromSummary(n, sum_, sumsq, min_, max_, sumsqdev))
+			# for
+			Stats.merge(Collector.EventStats, StatsFromSummary(*Connection.execute(
+			  "SELECT COUNT(Time), SUM(Time), SUM(Time*Time), MIN(Time), MAX(Time),"
+			  " SUM((Time - Average) * (Time - Average))"
+			  " FROM TimeEvent, (SELECT AVG(Time) AS Average FROM TimeEvent)"
+			  ).fetchone()))
+		# if ... else
+	except sqlite3.DatabaseError as e:
+		raise IOError("Can't read timing from '%s': %s" % (InputFilePath, e))
+	finally:
+		Connection.close()
+# ParseTimeTrackerDatabase()
+
+
+def ParseInputFile(InputFilePath, AllStats, EventStats, options,
+  EventSink = None):
+	"""Parses a log file.
+	
+	The art log file at InputFilePath is parsed; it can also be a SQLite
+	database from the TimeTracker service (see ParseTimeTrackerDatabase()).
+	The per-module statistics are added to the existing in AllStats (an instance
+	of JobStatsClass), creating new ones as needed. Similarly, per-event
+	statistics are added to EventStats (a TimeModuleStatsClass instance).
+	
+	options class can contain the following members:
+	- Permissive (default: false): do not bail out when a format error is found;
+	  the entry is typically skipped. This often happens because the output line
+	  of the timing information is interrupted by some other output.
+	- MaxEvents (default: all events): collect statistics for at most MaxEvents
+	  events (always the first ones)
+	- CheckDuplicates (default: false): enables the check for duplicates
+	- TrackEntries (default: as CheckDuplicates): enables the single-event
+	  tracking; if disabled, duplicates are checked by recording only the
+	  event keys
+	- CacheDir (default: none): directory of the cache of the parsed files
+	  (see ParseCacheClass)
+	- ExternalDecompressor (default: false): decompress the input file with an
+	  external program (see OPEN())
+	- Memory (default: false): also parse the memory usage information, into
+	  the memory statistics of AllStats; the cache is not used in this case
+	- SelectedModules, ModuleRegex (default: all modules): only the modules
+	  with the label or name in the SelectedModules list, or with the name
+	  matching the ModuleRegex regular expression, are included
+	- Runs, SubRuns, EventRange (default: all): lists of (first, last) ranges
+	  of the run, subrun and event numbers to be included
+	  (see ParseNumberRanges())
+	- SkipEvents (default: 0): number of events to be skipped at the beginning
+	  of the log
+	The entries excluded by the selection options are discarded while parsing
+	(see TimingSelectorClass).
+	
+	The optional EventSink receives each event as it is completed (see
+	TimingStatsCollectorClass).
+	It returns the number of errors encountered.
+	"""
+	Collector = TimingStatsCollectorClass(AllStats, EventStats, options,
+	  InputFilePath, EventSink=EventSink)
+	bMemory = getattr(options, 'Memory', False)
+	Selector = CreateTimingSelector(options)
+	
+	if IsTimeTrackerDatabase(InputFilePath):
+		ParseTimeTrackerDatabase(InputFilePath, Collector, Selector=Selector)
+		return Collector.finish()
+	# if database
+	
+	if getattr(options, 'CacheDir', None) and not bMemory:
+		records = LoadTimingRecords(InputFilePath,
+		  ParseCacheClass(options.CacheDir),
+		  bExternal=getattr(options, 'ExternalDecompressor', False)
+		  )
+		if Collector.needsEvents():
+			for iLine, TimeData in records.iterTimingLines(Selector):
+				Collector.process(iLine, TimeData)
+		else:
+			for iLine, ModuleKey, Time in records.iterTimingValues(Selector):
+				Collector.processValue(iLine, ModuleKey, Time)
+		# if ... else
+		return Collector.finish()
+	# if cache
+	
+	TimingLines = ReadTimingLines(InputFilePath,
+	  bExternal=getattr(options, 'ExternalDecompressor', False), bMemory=bMemory)
+	LineParser = TimingLineParserClass(selector=Selector)
+	if Collector.needsEvents():
+		for iLine, TimeData in ParseSelectedLines(TimingLines, LineParser):
+			Collector.process(iLine, TimeData)
+	else:
+		for iLine, ModuleKey, Time in ParseSelectedValues(TimingLines, LineParser):
+			Collector.processValue(iLine, ModuleKey, Time)
+	# if ... else
+	
+	return Collector.finish()
+# ParseInputFile()
+
+
+def ParseInputFileWorker(args):
+	"""Parses a single log file into new statistics objects.
+	
+	The argument is a tuple (InputFilePath, options) as for ParseInputFile().
+	Returns a tuple with the per-module statistics (JobStatsClass), the per-event
+	statistics (TimeModuleStatsClass) and the number of errors.
+	This function is meant to be executed in a separate process.
+	"""
+	InputFilePath, options = args
+	AllStats = JobStatsClass(bMemory=getattr(options, 'Memory', False))
+	EventStats = CreateEventStats(options)
+	nErrors = ParseInputFile(InputFilePath, AllStats, EventStats, options)
+	return AllStats, EventStats, nErrors
+# ParseInputFileWorker()
+
+
+def MergeParsedStats(AllStats, EventStats, OtherAllStats, OtherEventStats):
+	"""Merges the statistics from another parsing into AllStats and EventStats.
+	
+	The statistics are merged in order, so that merging the results from the
+	files in the same order they would be parsed gives the same statistics as
+	parsing them all with ParseInputFile().
+	If only the event keys are recorded, duplicate events are skipped as long
+	as the other statistics track the entries (see TimeModuleStatsClass.merge()).
+	When tracking the entries, the entries of each module are added following
+	the order of the events new to EventStats, completing the missing ones, as
+	TimingStatsCollectorClass does while parsing; a module new to AllStats is
+	first completed with all the events known before. Only the new events are
+	visited for each of the other modules.
+	"""
+	if not EventStats.isTracking():
+		EventStats.merge(OtherEventStats)
+		AllStats.merge(OtherAllStats, eventStats=EventStats)
+		return
+	# if not tracking
+	
+	NewEvents = [ eventKey for eventKey in OtherEventStats.iterEvents()
+	  if not EventStats.hasEvent(eventKey) ]
+	nKnownEvents = EventStats.nEntries()
+	KnownEvents = None # filled only when needed
+	EventStats.merge(OtherEventStats)
+	
+	for ModuleStats in AllStats:
+		if ModuleStats.key not in OtherAllStats.moduleStats:
+			ModuleStats.completeAll(NewEvents)
+	# for
+	for OtherStats in OtherAllStats:
+		OtherEntries = OtherStats.getEntries()
+		try:
+			ModuleStats = AllStats[OtherStats.key]
+		except KeyError:
+			ModuleStats = EventStats.createEmpty(OtherStats.key)
+			AllStats[OtherStats.key] = ModuleStats
+			if KnownEvents is None:
+				KnownEvents \
+				  = list(itertools.islice(EventStats.iterEvents(), nKnownEvents))
+			# if
+			ModuleStats.completeAll(KnownEvents)
+		# try ... except
+		OtherEntries = dict(( entry.eventKey, entry ) for entry in OtherEntries)
+		for eventKey in NewEvents:
+			entry = OtherEntries.get(eventKey)
+			ModuleStats.add(EntryDataClass(eventKey) if entry is None else entry)
+		# for
+	# for
+	
+	if (AllStats.memory is not None) and (OtherAllStats.memory is not None):
+		AllStats.memory.merge(OtherAllStats.memory)
+# MergeParsedStats()
+
+
+def ParseInputFilesInParallel(InputFilePaths, AllStats, EventStats, options):
+	"""Parses the log files in InputFilePaths with a pool of options.Jobs
+	processes.
+	
+	Each file is parsed into its own statistics objects, that are then merged
+	into AllStats and EventStats in the order of InputFilePaths.
+	When checking for duplicates, the files are parsed tracking the entries,
+	since the duplicates across files can be skipped only entry by entry while
+	merging (see MergeParsedStats()).
+	Returns the total number of errors encountered.
+	"""
+	if options.CheckDuplicates and not getattr(options, 'TrackEntries', True):
+		options = ParsingOptions(**dict(vars(options), TrackEntries=True))
+	Pool = multiprocessing.Pool(options.Jobs)
+	try:
+		nErrors = 0
+		for FileStats, FileEventStats, nFileErrors in Pool.imap(
+		  ParseInputFileWorker,
+		  [ ( InputFilePath, options ) for InputFilePath in InputFilePaths ]
+		  ):
+			MergeParsedStats(AllStats, EventStats, FileStats, FileEventStats)
+			nErrors += nFileErrors
+		# for
+		Pool.close()
+	except:
+		Pool.terminate()
+		raise
+	finally:
+		Pool.join()
+	return nErrors
+# ParseInputFilesInParallel()
+
+
+def IsCompressedFile(Path):
+	"""Returns whether OPEN() would decompress the file at Path."""
+	return DetectCompression(Path) is not None
+# IsCompressedFile()
+
+
+def FindChunkBoundaries(InputFilePath, nChunks):
+	"""Splits an uncompressed file in up to nChunks byte ranges.
+	
+	Each range starts at the beginning of a line and ends just after a newline
+	(or at the end of the file). The list of (start, end) ranges is returned.
+	"""
+	Size = os.path.getsize(InputFilePath)
+	Boundaries = [ 0 ]
+	with open(InputFilePath, 'rb') as InputFile:
+		for iChunk in xrange(1, nChunks):
+			InputFile.seek(max(Size * iChunk // nChunks, Boundaries[-1]))
+			if InputFile.tell() > 0:
+				InputFile.seek(-1, os.SEEK_CUR)
+				InputFile.readline() # move to the beginning of the next line
+			Boundary = InputFile.tell()
+			if Boundary >= Size: break
+			if Boundary > Boundaries[-1]: Boundaries.append(Boundary)
+		# for
+	# with
+	Boundaries.append(Size)
+	return list(zip(Boundaries[:-1], Boundaries[1:]))
+# FindChunkBoundaries()
+
+
+def ParseChunkWorker(args):
+	"""Extracts the timing information from a byte range of a log file.
+	
+	The argument is a tuple
+	(InputFilePath, start, end, bValuesOnly, bMemory, Selector), with the range
+	starting at the beginning of a line; memory usage lines are parsed too if
+	bMemory is set, and only the entries chosen by Selector (if not None) are
+	kept.
+	Returns a tuple with: the number of lines in the range, the first and the
+	last line (stripped), the list of records from ParseTimingLines() (or
+	from ParseTimingValues() if bValuesOnly is true), with line numbers relative
+	to the start of the range, the number of leading records before the first
+	timing entry, and the key of the event of the last timing line (see
+	TimingLineParserClass.parseMemoryLine()). The memory usage entries among the
+	leading records have no event yet, and they are selected by module only.
+	This function is meant to be executed in a separate process.
+	"""
+	InputFilePath, start, end, bValuesOnly, bMemory, Selector = args
+	
+	with open(InputFilePath, 'rb') as InputFile:
+		Buffer = mmap.mmap(InputFile.fileno(), 0, access=mmap.ACCESS_READ)
+	try:
+		FirstLineEnd = Buffer.find(b'\n', start, end)
+		if FirstLineEnd < 0: FirstLineEnd = end
+		FirstLine = Buffer[start:FirstLineEnd].strip()
+		LastLineStart = Buffer.rfind(b'\n', start, end - 1) + 1
+		if LastLineStart == 0: LastLineStart = start # single line in the range
+		LastLine = Buffer[LastLineStart:end].strip()
+		nLines = CountLines(Buffer, start, end)
+		if not Buffer[end - 1:end] == b'\n': nLines += 1 # last line, unterminated
+		Parser = ParseSelectedValues if bValuesOnly else ParseSelectedLines
+		LineParser = TimingLineParserClass(selector=Selector)
+		Records = list(Parser(ScanTimingLines(Buffer, start, end, bMemory=bMemory),
+		  LineParser))
+	finally:
+		Buffer.close()
+	nLeadingRecords = 0 # memory usage entries (and errors) with no event yet
+	for Record in Records:
+		Data = Record[-1]
+		if isinstance(Data, EntryDataClass):
+			if not Data.isMemory() or (Data.eventKey is not None): break
+		elif not isinstance(Data, FormatError): break
+		nLeadingRecords += 1
+	# for
+	return nLines, FirstLine, LastLine, Records, nLeadingRecords, \
+	  LineParser.lastEventKey
+# ParseChunkWorker()
+
+
+def ParseInputFileInChunks(InputFilePath, AllStats, EventStats, options):
+	"""Parses an uncompressed log file splitting it among options.Jobs processes.
+	
+	The file is split in byte ranges on line boundaries, and the timing lines
+	of each range are parsed in parallel. The results are then collected in file
+	order, with the duplicate line suppression applied also across the ranges,
+	and the memory usage entries at the beginning of a range assigned to the
+	last event of the previous one (and selected by it), so that the statistics
+	are the same as from ParseInputFile().
+	Returns the number of errors encountered.
+	"""
+	Collector \
+	  = TimingStatsCollectorClass(AllStats, EventStats, options, InputFilePath)
+	
+	bValuesOnly = not Collector.needsEvents()
+	Process = Collector.processValue if bValuesOnly else Collector.process
+	Selector = CreateTimingSelector(options)
+	Chunks = FindChunkBoundaries(InputFilePath, options.Jobs)
+	Pool = multiprocessing.Pool(min(options.Jobs, len(Chunks)))
+	try:
+		LineOffset = 0
+		LastLine = None
+		LastEventKey = None
+		for nLines, FirstLine, ChunkLastLine, Records, nLeadingRecords, \
+		  ChunkLastEventKey in Pool.imap(
+		    ParseChunkWorker,
+		    [ ( InputFilePath, start, end, bValuesOnly,
+		        getattr(options, 'Memory', False), Selector )
+		      for start, end in Chunks ]
+		  ):
+			if nLeadingRecords and (LastEventKey is not None):
+				# memory usage before the first timing line of the chunk
+				Leading = Records[:nLeadingRecords]
+				for Record in Leading:
+					if isinstance(Record[-1], EntryDataClass):
+						Record[-1].eventKey = LastEventKey
+				# for
+				if (Selector is not None) and not Selector.selectEvent(LastEventKey):
+					Records = [ Record for Record in Leading
+					  if not isinstance(Record[-1], EntryDataClass)
+					  ] + Records[nLeadingRecords:]
+				# if
+			# if
+			for Record in Records:
+				# first line is a duplicate of the last one from the previous chunk
+				if (Record[0] == 0) and (FirstLine == LastLine): continue
+				Process(LineOffset + Record[0], *Record[1:])
+			# for
+			if nLines > 0: LastLine = ChunkLastLine
+			if ChunkLastEventKey is not None: LastEventKey = ChunkLastEventKey
+			LineOffset += nLines
+		# for
+		Pool.close()
+	except:
+		Pool.terminate()
+		raise
+	finally:
+		Pool.join()
+	
+	return Collector.finish()
+# ParseInputFileInChunks()
+
+
+def ParseInputFiles(InputFilePaths, AllStats, EventStats, options,
+  EventSink = None):
+	"""Parses all the log files, choosing the best strategy.
+	
+	The logs are parsed in parallel (options.Jobs) when possible: different
+	logs in different processes, or a single uncompressed one split in parts.
+	Otherwise, they are parsed one after the other (which is always the case
+	when there is an EventSink); a single log is not split when events are to
+	be skipped at its beginning. See ParseInputFile() for the arguments.
+	Returns the number of errors encountered.
+	"""
+	if (options.Jobs > 1) and (len(InputFilePaths) > 1) \
+	  and (options.MaxEvents < 0) and (EventSink is None):
+		return ParseInputFilesInParallel \
+		  (InputFilePaths, AllStats, EventStats, options)
+	elif (options.Jobs > 1) and (options.MaxEvents < 0) and (EventSink is None) \
+	  and (getattr(options, 'SkipEvents', 0) <= 0) \
+	  and not getattr(options, 'CacheDir', None) \
+	  and not IsCompressedFile(InputFilePaths[0]) \
+	  and not IsTimeTrackerDatabase(InputFilePaths[0]):
+		return ParseInputFileInChunks \
+		  (InputFilePaths[0], AllStats, EventStats, options)
+	else:
+		nErrors = 0
+		for InputFilePath in InputFilePaths:
 			try:
-				TimeData = ParseTimeEventLine(line)
-			except FormatError, e:
-				nErrors += 1
-				msg = "Format error on '%s'@%d" % (InputFilePath, iLine + 1)
-				try: msg += " (%s)" % str(e.data['type'])
-				except KeyError: pass
-				try: msg += ", for event " + str(e.data['event'])
-				except KeyError: pass
-				try: msg += ", module " + str(e.data['module'])
-				except KeyError: pass
-				print >>sys.stderr, msg
-				if not options.Permissive: raise
-				else:                      continue
-			# try ... except
-			
-			EventStats.add(TimeData)
-			if (options.MaxEvents >= 0) \
-			  and (EventStats.n() >= options.MaxEvents):
-				if CurrentEvent: CompleteEvent(CurrentEvent, EventStats, AllStats)
-				raise NoMoreInput
+				nErrors += ParseInputFile(InputFilePath, AllStats, EventStats, options,
+				  EventSink=EventSink)
+			except NoMoreInput as e:
+				raise NoMoreInput(nErrors + e.nErrors)
+		# for
+		return nErrors
+	# if ... else
+# ParseInputFiles()
+
+
+class LogFollowerClass:
+	"""Reads the lines being appended to a log file.
+	
+	Each call to readLines() returns the complete lines written since the
+	previous call; an incomplete last line is kept until it is completed.
+	If the file is replaced (e.g. by log rotation) the rest of the old file is
+	read, and then reading continues from the start of the new file; if the
+	file is truncated, reading restarts from its beginning.
+	"""
+	BlockSize = 1048576
+	
+	def __init__(self, Path):
+		self.path = Path
+		self.file = None
+		self.open()
+	# __init__()
+	
+	def open(self):
+		if self.file is not None: self.file.close()
+		self.file = open(self.path, 'rb')
+		self.buffer = b''
+	# open()
+	
+	def readData(self):
+		"""Returns all the data currently available from the open file."""
+		Blocks = []
+		while True:
+			Block = self.file.read(self.BlockSize)
+			if not Block: break
+			Blocks.append(Block)
+		# while
+		return b''.join(Blocks)
+	# readData()
+	
+	def splitLines(self, data, bFlush = False):
+		"""Returns the complete lines from the buffer and data."""
+		Lines = (self.buffer + data).split(b'\n')
+		self.buffer = b'' if bFlush else Lines.pop()
+		if bFlush and not Lines[-1]: Lines.pop()
+		return Lines
+	# splitLines()
+	
+	def isReplaced(self):
+		"""Returns whether the file at path is not the open one any more."""
+		try: PathStat = os.stat(self.path)
+		except OSError: return False # not there yet: keep reading the old one
+		FileStat = os.fstat(self.file.fileno())
+		return (PathStat.st_ino, PathStat.st_dev) \
+		  != (FileStat.st_ino, FileStat.st_dev)
+	# isReplaced()
+	
+	def readLines(self):
+		"""Returns the list of new complete lines (without line terminator)."""
+		if self.isReplaced():
+			Lines = self.splitLines(self.readData(), bFlush=True)
+			self.open()
 		else:
-			TimeData = None
-			continue
+			if os.fstat(self.file.fileno()).st_size < self.file.tell():
+				self.file.seek(0) # truncated
+				self.buffer = b''
+			# if
+			Lines = []
+		# if ... else
+		Lines.extend(self.splitLines(self.readData()))
+		return [ DecodeLine(line) for line in Lines ]
+	# readLines()
+	
+# class LogFollowerClass
+
+
+def FollowLogLines(Follower, Refresh, RefreshInterval, PollInterval = 0.5):
+	"""Yields the lines of a log file as they are written, forever.
+	
+	Follower is a LogFollowerClass. While waiting for new lines, Refresh() is
+	called each RefreshInterval seconds.
+	"""
+	NextRefresh = time.time() + RefreshInterval
+	while True:
+		Lines = Follower.readLines()
+		for line in Lines: yield line
+		
+		Now = time.time()
+		if Now >= NextRefresh:
+			Refresh()
+			NextRefresh = Now + RefreshInterval
+		# if
+		if not Lines: time.sleep(min(PollInterval, NextRefresh - Now))
+	# while
+# FollowLogLines()
+
+
+def FollowInputFile(InputFilePath, AllStats, EventStats, options, Refresh):
+	"""Parses a log file while it is being written.
+	
+	Parsing continues until interrupted by the user (or until options.MaxEvents
+	events are collected). Every options.RefreshInterval seconds, Refresh() is
+	called to present the statistics collected so far.
+	Returns the number of errors encountered.
+	"""
+	Collector \
+	  = TimingStatsCollectorClass(AllStats, EventStats, options, InputFilePath)
+	Lines = FollowLogLines(
+	  LogFollowerClass(InputFilePath), Refresh, options.RefreshInterval
+	  )
+	LineParser = TimingLineParserClass(selector=CreateTimingSelector(options))
+	bMemory = getattr(options, 'Memory', False)
+	try:
+		if Collector.needsEvents():
+			for iLine, TimeData in ParseTimingLines(Lines,
+			  LineParser=LineParser, bMemory=bMemory):
+				Collector.process(iLine, TimeData)
+		else:
+			for iLine, ModuleKey, Time in ParseTimingValues(Lines,
+			  LineParser=LineParser, bMemory=bMemory):
+				Collector.processValue(iLine, ModuleKey, Time)
+		# if ... else
+	except KeyboardInterrupt: pass
+	
+	return Collector.finish()
+# FollowInputFile()
+
+
+#
+# time series analysis
+#
+def EventTimesMatrix(StatsList, eventKeys):
+	"""Returns a numpy matrix with the time of each statistics in each event.
+	
+	The matrix has a row for each of the statistics in StatsList (tracking the
+	events), and a column for each of the event keys, in order; missing times
+	are NaN. The times from ColumnarTimeModuleStatsClass are copied directly,
+	assuming eventKeys are in the order of their event index; the entries of the
+	other statistics are looked up all at once (getEntriesOf()) and their times
+	converted into the row in a single step.
+	"""
+	times = numpy.full(( len(StatsList), len(eventKeys) ), numpy.nan)
+	for iRow, stats in enumerate(StatsList):
+		if isinstance(stats, ColumnarTimeModuleStatsClass):
+			row = stats.timesArray()[:len(eventKeys)]
+			times[iRow, :len(row)] = row
+		else:
+			# missing entries and times (None) become NaN
+			times[iRow] = [ None if entry is None else entry.seconds
+			  for entry in stats.getEntriesOf(eventKeys) ]
+		# if ... else
+	# for
+	return times
+# EventTimesMatrix()
+
+
+def RowMeans(sums, counts):
+	"""Returns the ratios sums/counts, NaN where counts is 0."""
+	with numpy.errstate(divide='ignore', invalid='ignore'):
+		return numpy.where(counts > 0, sums / counts, numpy.nan)
+# RowMeans()
+
+
+def AnalyseTimeSeries(times, nWarmup = 1, window = 100):
+	"""Analyses the time of each row of a matrix (see EventTimesMatrix()).
+	
+	The first nWarmup events (columns) are considered warm-up, the rest steady
+	state. Returns a dictionary of arrays, with one value per row:
+	- 'n': number of events with a time
+	- 'warmup': average time of the warm-up events
+	- 'steady', 'rms': average time and RMS of the steady state events
+	- 'excess': total time of the warm-up events in excess of the steady state
+	- 'slope': slope of the linear fit of the steady state times as function of
+	  the event index (time per event)
+	- 'drift': relative change of the time over the steady state events,
+	  according to the linear fit
+	- 'windowMin', 'windowMax': range of the average time in a window of window
+	  consecutive steady state events
+	Values which can't be computed (e.g. for lack of events) are NaN.
+	All the rows are processed together with numpy operations.
+	"""
+	nRows, nEvents = times.shape
+	nWarmup = min(max(nWarmup, 0), nEvents)
+	present = ~numpy.isnan(times)
+	values = numpy.where(present, times, 0.)
+	
+	nWarm = present[:, :nWarmup].sum(axis=1)
+	warmSum = values[:, :nWarmup].sum(axis=1)
+	
+	steady = values[:, nWarmup:]
+	steadyPresent = present[:, nWarmup:]
+	nSteady = steadyPresent.sum(axis=1)
+	steadySum = steady.sum(axis=1)
+	steadyMean = RowMeans(steadySum, nSteady)
+	# variance from the deviations from the mean (missing times do not count)
+	deviations = numpy.where(steadyPresent, steady - steadyMean[:, None], 0.)
+	steadyVar = RowMeans((deviations * deviations).sum(axis=1), nSteady)
+	
+	# linear fit, with the event index centered in the steady state range
+	x = numpy.arange(steady.shape[1], dtype=float) - (steady.shape[1] - 1) / 2.
+	Sx = numpy.dot(steadyPresent, x)
+	Sxx = numpy.dot(steadyPresent, x * x)
+	Sxy = numpy.dot(steady, x)
+	with numpy.errstate(divide='ignore', invalid='ignore'):
+		denom = nSteady * Sxx - Sx * Sx
+		slope = numpy.where(denom > 0.,
+		  (nSteady * Sxy - Sx * steadySum) / denom, numpy.nan)
+		drift = slope * max(steady.shape[1] - 1, 0) / steadyMean
+	# with
+	
+	# averages in a moving window, from the cumulative sums
+	window = min(max(window, 1), steady.shape[1])
+	if window > 0:
+		cumSum = numpy.zeros(( nRows, steady.shape[1] + 1 ))
+		numpy.cumsum(steady, axis=1, out=cumSum[:, 1:])
+		cumCount = numpy.zeros(( nRows, steady.shape[1] + 1 ), dtype=int)
+		numpy.cumsum(steadyPresent, axis=1, out=cumCount[:, 1:])
+		windowMeans = RowMeans(cumSum[:, window:] - cumSum[:, :-window],
+		  cumCount[:, window:] - cumCount[:, :-window])
+		bValid = ~numpy.isnan(windowMeans)
+		windowMin = numpy.where(bValid, windowMeans, numpy.inf).min(axis=1)
+		windowMax = numpy.where(bValid, windowMeans, -numpy.inf).max(axis=1)
+		bValid = bValid.any(axis=1)
+		windowMin[~bValid] = numpy.nan
+		windowMax[~bValid] = numpy.nan
+	else:
+		windowMin = numpy.full(nRows, numpy.nan)
+		windowMax = numpy.full(nRows, numpy.nan)
+	# if ... else
+	
+	return {
+		'n':         nWarm + nSteady,
+		'warmup':    RowMeans(warmSum, nWarm),
+		'steady':    steadyMean,
+		'rms':       numpy.sqrt(steadyVar),
+		'excess':    warmSum - nWarm * numpy.nan_to_num(steadyMean),
+		'slope':     slope,
+		'drift':     drift,
+		'windowMin': windowMin,
+		'windowMax': windowMax,
+		}
+# AnalyseTimeSeries()
+
+
+def IterateTimeSeriesAnalysis(AllStats, EventStats, nWarmup = 1, window = 100,
+  blockSize = 16):
+	"""Yields the time series analysis of each statistics.
+	
+	For each statistics in AllStats and for EventStats (last), a pair is yielded
+	with the statistics and a dictionary with the results of AnalyseTimeSeries()
+	for it (one value per key).
+	The times are extracted and analysed for blockSize statistics at a time, to
+	limit the memory usage.
+	"""
+	eventKeys = EventStats.getEvents()
+	StatsList = list(AllStats) + [ EventStats ]
+	for iFirst in xrange(0, len(StatsList), blockSize):
+		Block = StatsList[iFirst:iFirst + blockSize]
+		Results = AnalyseTimeSeries(
+		  EventTimesMatrix(Block, eventKeys), nWarmup=nWarmup, window=window
+		  )
+		for iStats, stats in enumerate(Block):
+			yield stats, \
+			  dict(( key, values[iStats] ) for key, values in Results.items())
+		# for
+	# for
+# IterateTimeSeriesAnalysis()
+
+
+#
+# event time attribution
+#
+def AnalyseEventShares(AllStats, EventStats, nTop = 5, blockSize = 16):
+	"""Attributes the time of each event to the modules.
+	
+	The time of the modules in each event is matched to the event time by the
+	event key (see EventTimesMatrix()), a block of blockSize modules at a time.
+	Only the events with an event time are considered for the shares.
+	Returns a dictionary with:
+	- 'n': number of events with time for each module (array)
+	- 'total': total time of each module (array)
+	- 'share': fraction of the total event time spent in each module (array)
+	- 'meanShare': average over the events of the fraction of event time spent
+	  in each module (array)
+	- 'dominant': number of events where each module is the slowest (array)
+	- 'eventTotal': total time of the events
+	- 'unaccountedTotal', 'unaccountedShare', 'unaccountedMean': total and
+	  fraction of event time not accounted for by the modules (framework
+	  overhead), and its average per event
+	- 'topEvents': list of the keys of the nTop slowest events, slowest first
+	- 'topEventTimes', 'topUnaccounted': time and unaccounted time of each of
+	  the slowest events (arrays)
+	- 'topTimes': matrix of the time of each module (row) in each of the
+	  slowest events (column); NaN if missing
+	"""
+	eventKeys = EventStats.getEvents()
+	nEvents = len(eventKeys)
+	ModuleStatsList = list(AllStats)
+	nModules = len(ModuleStatsList)
+	
+	eventTimes = EventTimesMatrix([ EventStats ], eventKeys)[0]
+	bValid = ~numpy.isnan(eventTimes) & (eventTimes > 0.)
+	validTimes = numpy.where(bValid, eventTimes, 1.)
+	topIndices = numpy.argsort(numpy.where(bValid, -eventTimes, numpy.inf),
+	  kind='mergesort')[:min(nTop, bValid.sum())]
+	
+	results = {
+		'n':         numpy.zeros(nModules, dtype=int),
+		'total':     numpy.zeros(nModules),
+		'share':     numpy.zeros(nModules),
+		'meanShare': numpy.zeros(nModules),
+		'dominant':  numpy.zeros(nModules, dtype=int),
+		'topTimes':  numpy.full(( nModules, len(topIndices) ), numpy.nan),
+		}
+	moduleSum = numpy.zeros(nEvents)
+	slowestTime = numpy.full(nEvents, -numpy.inf)
+	slowestModule = numpy.full(nEvents, -1, dtype=int)
+	for iFirst in xrange(0, nModules, blockSize):
+		Block = ModuleStatsList[iFirst:iFirst + blockSize]
+		iLast = iFirst + len(Block)
+		times = EventTimesMatrix(Block, eventKeys)
+		present = ~numpy.isnan(times)
+		values = numpy.where(present, times, 0.)
+		moduleSum += values.sum(axis=0)
 		
-		if (CurrentEvent != TimeData.eventKey):
-			if TimeData and CurrentEvent:
-				CompleteEvent(CurrentEvent, EventStats, AllStats)
-			CurrentEvent = TimeData.eventKey
+		results['n'][iFirst:iLast] = present.sum(axis=1)
+		results['total'][iFirst:iLast] = values.sum(axis=1)
+		results['share'][iFirst:iLast] = values[:, bValid].sum(axis=1)
+		results['meanShare'][iFirst:iLast] \
+		  = (values / validTimes)[:, bValid].sum(axis=1)
+		results['topTimes'][iFirst:iLast] = times[:, topIndices]
+		
+		if len(Block) > 0 and nEvents > 0:
+			blockSlowest = numpy.where(present, times, -numpy.inf)
+			iSlowest = blockSlowest.argmax(axis=0)
+			blockSlowest = blockSlowest[iSlowest, numpy.arange(nEvents)]
+			bSlower = blockSlowest > slowestTime
+			slowestTime[bSlower] = blockSlowest[bSlower]
+			slowestModule[bSlower] = iSlowest[bSlower] + iFirst
 		# if
-	# for line in log file
-	if CurrentEvent: CompleteEvent(CurrentEvent, EventStats, AllStats)
+	# for
 	
-	return nErrors
-# ParseInputFile()
+	eventTotal = eventTimes[bValid].sum()
+	nValid = bValid.sum()
+	unaccounted = eventTimes - moduleSum
+	with numpy.errstate(divide='ignore', invalid='ignore'):
+		results['share'] /= eventTotal
+		results['meanShare'] /= nValid
+		results['unaccountedShare'] = unaccounted[bValid].sum() / eventTotal
+		results['unaccountedMean'] = unaccounted[bValid].sum() / nValid
+	# with
+	results['dominant'] = numpy.bincount(
+	  slowestModule[bValid & (slowestModule >= 0)], minlength=nModules
+	  )[:nModules]
+	results['eventTotal'] = eventTotal
+	results['unaccountedTotal'] = unaccounted[bValid].sum()
+	results['topEvents'] = [ eventKeys[index] for index in topIndices ]
+	results['topEventTimes'] = eventTimes[topIndices]
+	results['topUnaccounted'] = unaccounted[topIndices]
+	return results
+# AnalyseEventShares()
+
+
+#
+# comparison of jobs
+#
+def RegularizedIncompleteBeta(x, a, b):
+	"""Returns the regularized incomplete beta function I_x(a, b).
+	
+	The continued fraction expansion is evaluated with the modified Lentz
+	method (see Numerical Recipes, section 6.4).
+	"""
+	if x <= 0.: return 0.
+	if x >= 1.: return 1.
+	if x > (a + 1.) / (a + b + 2.):
+		return 1. - RegularizedIncompleteBeta(1. - x, b, a)
+	
+	front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+	  + a * math.log(x) + b * math.log(1. - x)) / a
+	tiny = 1e-300
+	f, C, D = 1., 1., 0.
+	for i in xrange(400):
+		m = i // 2
+		if i == 0:        numerator = 1.
+		elif i % 2 == 0:  numerator = m * (b - m) * x / ((a + 2*m - 1) * (a + 2*m))
+		else: numerator = -(a + m) * (a + b + m) * x / ((a + 2*m) * (a + 2*m + 1))
+		D = 1. + numerator * D
+		if abs(D) < tiny: D = tiny
+		D = 1. / D
+		C = 1. + numerator / C
+		if abs(C) < tiny: C = tiny
+		f *= C * D
+		if abs(1. - C * D) < 1e-12: break
+	# for
+	return front * (f - 1.)
+# RegularizedIncompleteBeta()
+
+
+def WelchTest(stats1, stats2):
+	"""Returns the two-sided p-value of the Welch t test on the two averages.
+	
+	The test is computed from the number of entries, the average and the
+	standard deviation of the two statistics. If either has less than two
+	entries, or both have no spread, None is returned.
+	"""
+	n1, n2 = stats1.n(), stats2.n()
+	if (n1 < 2) or (n2 < 2): return None
+	var1 = stats1.stdev()**2 / n1
+	var2 = stats2.stdev()**2 / n2
+	if var1 + var2 <= 0.: return None
+	t = (stats2.average() - stats1.average()) / math.sqrt(var1 + var2)
+	dof = (var1 + var2)**2 / (var1**2 / (n1 - 1) + var2**2 / (n2 - 1))
+	return RegularizedIncompleteBeta(dof / (dof + t*t), dof / 2., 0.5)
+# WelchTest()
+
+
+class StatsComparisonClass:
+	"""Comparison of the timing of a module between baseline and a new job.
+	
+	Either of the statistics can be None if the module is not present in that
+	job. The relative differences are None when they can't be computed.
+	A module is flagged as a regression when its average time grew by more than
+	threshold (relative), with a p-value of the Welch test below
+	significance; it is flagged as an improvement in the opposite case.
+	"""
+	Quantiles = ( 0.5, 0.95 )
+	
+	def __init__(self, key, baseline, stats, threshold = 0.05,
+	  significance = 0.01):
+		self.key = key
+		self.baseline = baseline
+		self.stats = stats
+		self.pvalue = None
+		self.bRegression = False
+		self.bImprovement = False
+		if not self.isComplete(): return
+		self.pvalue = WelchTest(baseline, stats)
+		delta = self.relativeDelta(baseline.average(), stats.average())
+		if (delta is None) or (self.pvalue is None) \
+		  or (self.pvalue >= significance):
+			return
+		self.bRegression = delta > threshold
+		self.bImprovement = delta < -threshold
+	# __init__()
+	
+	def isComplete(self):
+		"""Returns whether the module has entries in both the jobs."""
+		return (self.baseline is not None) and (self.baseline.n() > 0) \
+		  and (self.stats is not None) and (self.stats.n() > 0)
+	# isComplete()
+	
+	@staticmethod
+	def relativeDelta(reference, value):
+		if (reference is None) or (value is None) or (reference == 0.):
+			return None
+		return float(value - reference) / reference
+	# relativeDelta()
+	
+	def values(self, stats):
+		"""Returns the average and the quantiles of the time in stats."""
+		if (stats is None) or (stats.n() == 0):
+			return [ None ] * (1 + len(self.Quantiles))
+		return [ stats.average() ] + list(map(stats.quantile, self.Quantiles))
+	# values()
+	
+	def deltas(self):
+		"""Returns the relative differences of average and quantiles."""
+		return list(map(self.relativeDelta,
+		  self.values(self.baseline), self.values(self.stats)))
+	# deltas()
+	
+	def flag(self):
+		if self.bRegression: return "REGRESSION"
+		if self.bImprovement: return "improvement"
+		return ""
+	# flag()
+	
+	def FormatAsList(self):
+		"""Prints the comparison into a list of strings."""
+		name = str(self.key)
+		if (self.baseline is None) or (self.baseline.n() == 0):
+			return [ name, "only in new job" ]
+		if (self.stats is None) or (self.stats.n() == 0):
+			return [ name, "only in baseline" ]
+		def FormatDelta(format_, delta):
+			return "n/a" if delta is None else format_ % (delta * 100.)
+		
+		deltas = self.deltas()
+		output = [
+			name,
+			"%g\" -> %g\"" % (self.baseline.average(), self.stats.average()),
+			FormatDelta("(%+.1f%%)", deltas[0]),
+			]
+		for q, delta in zip(self.Quantiles, deltas[1:]):
+			output.append("p%g " % (q * 100.) + FormatDelta("%+.1f%%", delta))
+		if self.pvalue is None: output.append("p-value n/a")
+		else:                   output.append("p-value %.2g" % self.pvalue)
+		output.append(self.flag())
+		return output
+	# FormatAsList()
+	
+# class StatsComparisonClass
+
+
+def CompareJobStats(BaselineAllStats, BaselineEventStats, AllStats, EventStats,
+  threshold = 0.05, significance = 0.01):
+	"""Returns a list of StatsComparisonClass, one per module plus the event.
+	
+	The modules are in the order of the baseline, with the ones only present
+	in the new job at the end; the event statistics come last.
+	"""
+	Comparisons = []
+	for stats in BaselineAllStats:
+		try: other = AllStats[stats.key]
+		except KeyError: other = None
+		Comparisons.append(StatsComparisonClass(stats.key, stats, other,
+		  threshold=threshold, significance=significance))
+	# for
+	for stats in AllStats:
+		try: BaselineAllStats[stats.key]
+		except KeyError: pass
+		else: continue
+		Comparisons.append(StatsComparisonClass(stats.key, None, stats,
+		  threshold=threshold, significance=significance))
+	# for
+	Comparisons.append(StatsComparisonClass(EventStats.key, BaselineEventStats,
+	  EventStats, threshold=threshold, significance=significance))
+	return Comparisons
+# CompareJobStats()
 
 
 #
@@ -635,7 +3524,8 @@ class MaxItemLengthsClass:
 				maxlength = None
 			#
 			itemlength = len(str(item))
-			if maxlength < itemlength: self.maxlength[iItem] = itemlength
+			if (maxlength is None) or (maxlength < itemlength):
+				self.maxlength[iItem] = itemlength
 		# for
 	# add()
 	
@@ -648,7 +3538,7 @@ class MaxItemLengthsClass:
 
 def CenterString(s, w, f = ' '):
 	"""Returns the string s centered in a width w, padded by f on both sides."""
-	leftFillerWidth = max(0, w - len(s)) / 2
+	leftFillerWidth = max(0, w - len(s)) // 2
 	return f * leftFillerWidth + s + f * (w - leftFillerWidth)
 # CenterString()
 
@@ -752,7 +3642,7 @@ class TabularAlignmentClass:
 		for iSpec, spec in enumerate(specs):
 			try:
 				formats.append(self.ParseFormatSpec(spec))
-			except TabularAlignmentClass.FormatNotSupported, e:
+			except TabularAlignmentClass.FormatNotSupported as e:
 				raise RuntimeError("Format specification %r (#%d) not supported."
 				  % (str(e), iSpec))
 		# for specifications
@@ -772,84 +3662,809 @@ class TabularAlignmentClass:
 		bestFormat = None
 		for lineMatcher, format_ in self.formats.items():
 			match_success = lineMatcher(iLine, self.tabledata)
-			if match_success <= success: continue
+			if match_success is None: continue
+			if (success is not None) and (match_success <= success): continue
 			bestFormat = format_
 			success = match_success
 		# for
 		return bestFormat
 	# SelectFormat()
 	
+	def FormatSelector(self):
+		"""Returns a function equivalent to SelectFormat(), for the current data.
+		
+		The row matchers which match all the rows (CatchAllLines) or select rows
+		by their index (LineNo) are evaluated in advance, and only the other ones
+		are evaluated for each row. The format choice is cached for each
+		combination of matching results (the "class" of the row).
+		"""
+		nLines = len(self.tabledata)
+		Constant = [] # ( position, score )
+		Indexed = {}  # line index -> list of ( position, score )
+		Dynamic = []  # ( position, matcher )
+		Formats = []
+		for position, ( lineMatcher, format_ ) in enumerate(self.formats.items()):
+			Formats.append(format_)
+			if isinstance(lineMatcher, TabularAlignmentClass.CatchAllLines):
+				Constant.append(( position, lineMatcher(None, self.tabledata) ))
+			elif isinstance(lineMatcher, TabularAlignmentClass.LineNo):
+				for iLine in set(lineno + nLines if lineno < 0 else lineno
+				  for lineno in lineMatcher.lineno):
+					Indexed.setdefault(iLine, []) \
+					  .append(( position, lineMatcher(iLine, self.tabledata) ))
+				# for
+			else: Dynamic.append(( position, lineMatcher ))
+		# for
+		
+		FormatCache = {}
+		def SelectFormat(iLine):
+			Scores = Constant + Indexed.get(iLine, []) \
+			  + [ ( position, lineMatcher(iLine, self.tabledata) )
+			    for position, lineMatcher in Dynamic ]
+			RowClass = tuple(sorted(Scores))
+			try: return FormatCache[RowClass]
+			except KeyError: pass
+			success = None
+			bestPosition = None
+			for position, match_success in Scores:
+				if match_success is None: continue
+				if (success is not None) and (match_success < success): continue
+				if (match_success == success) and (position > bestPosition): continue
+				bestPosition = position
+				success = match_success
+			# for
+			bestFormat = None if bestPosition is None else Formats[bestPosition]
+			FormatCache[RowClass] = bestFormat
+			return bestFormat
+		# SelectFormat()
+		return SelectFormat
+	# FormatSelector()
+	
+	
+	@staticmethod
+	def FormatRow(rowdata, RowFormats):
+		"""Returns the list of formatted items of a row."""
+		LineContent = []
+		LastSpec = None
+		for iItem, itemdata in enumerate(rowdata):
+			try:
+				Spec = RowFormats[iItem]
+				LastSpec = Spec
+			except IndexError: Spec = LastSpec
+			
+			Formatter = Spec['format']
+			if isinstance(Formatter, basestring):
+				ItemContent = Formatter % itemdata
+			elif callable(Formatter):
+				ItemContent = Formatter(itemdata)
+			else:
+				raise RuntimeError("Formatter %r (#%d) not supported."
+				% (Formatter, iItem))
+			# if ... else
+			LineContent.append(ItemContent)
+		# for items
+		return LineContent
+	# FormatRow()
+	
+	@staticmethod
+	def AlignRow(LineContent, RowFormats, ItemLengths):
+		"""Pads in place the formatted items of a row to the column widths."""
+		LastSpec = None
+		for iItem, item in enumerate(LineContent):
+			try:
+				Spec = RowFormats[iItem]
+				LastSpec = Spec
+			except IndexError: Spec = LastSpec
+			
+			fieldWidth = ItemLengths[iItem]
+			alignment = Spec.get('align', 'left')
+			if alignment == 'right':
+				alignedItem = RightString(item, fieldWidth)
+			elif alignment == 'justified':
+				alignedItem = JustifyString(item, fieldWidth)
+			elif alignment == 'center':
+				alignedItem = CenterString(item, fieldWidth)
+			else: # if alignment == 'left':
+				alignedItem = LeftString(item, fieldWidth)
+			if Spec.get('truncate', True): alignedItem = alignedItem[:fieldWidth]
+			
+			LineContent[iItem] = alignedItem
+		# for items
+		return LineContent
+	# AlignRow()
+	
+	
+	def ColumnWidths(self, SelectFormat = None):
+		"""Returns the width of each column (as MaxItemLengthsClass)."""
+		if SelectFormat is None: SelectFormat = self.FormatSelector()
+		ItemLengths = MaxItemLengthsClass()
+		for iRow, rowdata in enumerate(self.tabledata):
+			ItemLengths.add(self.FormatRow(rowdata, SelectFormat(iRow)))
+		return ItemLengths
+	# ColumnWidths()
+	
 	
 	def FormatTable(self):
-		# select the formats for all lines
-		AllFormats \
-		  = [ self.SelectFormat(iRow) for iRow in xrange(len(self.tabledata)) ]
+		SelectFormat = self.FormatSelector()
+		AllFormats = list(map(SelectFormat, xrange(len(self.tabledata))))
 		
 		# format all the items
 		ItemLengths = MaxItemLengthsClass()
 		TableContent = []
 		for iRow, rowdata in enumerate(self.tabledata):
-			RowFormats = AllFormats[iRow]
-			LineContent = []
-			LastSpec = None
-			for iItem, itemdata in enumerate(rowdata):
-				try:
-					Spec = RowFormats[iItem]
-					LastSpec = Spec
-				except IndexError: Spec = LastSpec
-				
-				Formatter = Spec['format']
-				if isinstance(Formatter, basestring):
-					ItemContent = Formatter % itemdata
-				elif callable(Formatter):
-					ItemContent = Formatter(itemdata)
-				else:
-					raise RuntimeError("Formatter %r (#%d) not supported."
-					% (Formatter, iItem))
-				# if ... else
-				LineContent.append(ItemContent)
-			# for items
+			LineContent = self.FormatRow(rowdata, AllFormats[iRow])
 			ItemLengths.add(LineContent)
 			TableContent.append(LineContent)
 		# for rows
 		
 		# pad the objects
 		for iRow, rowdata in enumerate(TableContent):
-			RowFormats = AllFormats[iRow]
-			Spec = AllFormats[iRow]
-			for iItem, item in enumerate(rowdata):
-				try:
-					Spec = RowFormats[iItem]
-					LastSpec = Spec
-				except IndexError: Spec = LastSpec
-				
-				fieldWidth = ItemLengths[iItem]
-				alignment = Spec.get('align', 'left')
-				if alignment == 'right':
-					alignedItem = RightString(item, fieldWidth)
-				elif alignment == 'justified':
-					alignedItem = JustifyString(item, fieldWidth)
-				elif alignment == 'center':
-					alignedItem = CenterString(item, fieldWidth)
-				else: # if alignment == 'left':
-					alignedItem = LeftString(item, fieldWidth)
-				if Spec.get('truncate', True): alignedItem = alignedItem[:fieldWidth]
-				
-				rowdata[iItem] = alignedItem
-			# for items
-		# for rows
+			self.AlignRow(rowdata, AllFormats[iRow], ItemLengths)
 		return TableContent
 	# FormatTable()
 	
 	def ToStrings(self, separator = " "):
 		return [ separator.join(RowContent) for RowContent in self.FormatTable() ]
 	
-	def Print(self, stream = sys.stdout):
-		print "\n".join(self.ToStrings())
+	def Write(self, stream = sys.stdout, separator = " "):
+		"""Writes the table into stream, one row at a time.
+		
+		A first pass over the data determines the width of the columns; in a
+		second pass, each row is formatted again, aligned and written. At no time
+		is more than one formatted row kept in memory.
+		"""
+		SelectFormat = self.FormatSelector()
+		ItemLengths = self.ColumnWidths(SelectFormat)
+		for iRow, rowdata in enumerate(self.tabledata):
+			RowFormats = SelectFormat(iRow)
+			stream.write(separator.join(self.AlignRow(
+			  self.FormatRow(rowdata, RowFormats), RowFormats, ItemLengths
+			  )))
+			stream.write("\n")
+		# for
+		if not self.tabledata: stream.write("\n")
+	# Write()
+	
+	def Print(self, stream = sys.stdout): self.Write(stream)
 	
 # class TabularAlignmentClass
 
 
+def FormatTimeSeriesAsList(stats, results):
+	"""Formats the time series analysis (AnalyseTimeSeries()) into a list."""
+	def FormatValue(format_, value):
+		return "n/a" if math.isnan(value) else format_ % value
+	
+	if results['n'] == 0: return [ str(stats.key), "n/a" ]
+	return [
+		str(stats.key),
+		"(%d events)" % results['n'],
+		FormatValue("warm-up %g\"", results['warmup']),
+		FormatValue("steady %g\"", results['steady']),
+		FormatValue("(RMS %4.1f%%)", results['rms'] / results['steady'] * 100.)
+		  if results['steady'] else "(RMS n/a)",
+		FormatValue("excess %g\"", results['excess']),
+		FormatValue("drift %+.1f%%", results['drift'] * 100.),
+		FormatValue("window %g\"", results['windowMin']),
+		FormatValue("- %g\"", results['windowMax']),
+		]
+# FormatTimeSeriesAsList()
+
+
+def FillEventSharesTable(OutputTable, AllStats, EventStats, nTopEvents = 5,
+  nTopModules = 5):
+	"""Adds to OutputTable the attribution of the event time to the modules.
+	
+	A row is added for each module, one for the time not accounted for by any
+	module, and then one for each of the nTopEvents slowest events, with the
+	share of its nTopModules slowest modules.
+	See AnalyseEventShares().
+	"""
+	results = AnalyseEventShares(AllStats, EventStats, nTop=nTopEvents)
+	for iModule, stats in enumerate(AllStats):
+		if results['n'][iModule] == 0:
+			OutputTable.AddRow(str(stats.key), "n/a")
+			continue
+		OutputTable.AddRow(str(stats.key),
+		  "share %5.1f%%" % (results['share'][iModule] * 100.),
+		  "(%5.1f%% per event)" % (results['meanShare'][iModule] * 100.),
+		  "total %g\"" % results['total'][iModule],
+		  "slowest in %d events" % results['dominant'][iModule],
+		  )
+	# for
+	if results['eventTotal'] > 0.:
+		OutputTable.AddRow("(unaccounted)",
+		  "share %5.1f%%" % (results['unaccountedShare'] * 100.),
+		  "(%g\" per event)" % results['unaccountedMean'],
+		  "total %g\"" % results['unaccountedTotal'],
+		  )
+	# if
+	
+	if len(results['topEvents']) == 0: return OutputTable
+	OutputTable.AddRow("")
+	ModuleNames = [ str(stats.key) for stats in AllStats ]
+	for iEvent, eventKey in enumerate(results['topEvents']):
+		eventTime = results['topEventTimes'][iEvent]
+		times = results['topTimes'][:, iEvent]
+		row = [ str(eventKey), "%g\"" % eventTime,
+		  "unaccounted %g\"" % results['topUnaccounted'][iEvent] ]
+		for iModule in numpy.argsort(-numpy.nan_to_num(times), kind='mergesort') \
+		  [:nTopModules]:
+			if numpy.isnan(times[iModule]): break
+			row.append("%s %.1f%%"
+			  % (ModuleNames[iModule], times[iModule] / eventTime * 100.))
+		# for
+		OutputTable.AddRow(*row)
+	# for
+	return OutputTable
+# FillEventSharesTable()
+
+
+def FillComparisonTable(Comparisons):
+	"""Returns a TabularAlignmentClass with the comparison of two jobs."""
+	OutputTable = TabularAlignmentClass()
+	OutputTable.AddData \
+	  ([ comparison.FormatAsList() for comparison in Comparisons ])
+	return OutputTable
+# FillComparisonTable()
+
+
+def FillOutputTable(AllStats, EventStats, options):
+	"""Returns a TabularAlignmentClass with the statistics to be presented."""
+	OutputTable = TabularAlignmentClass()
+	
+	# present results
+	if options.PresentMode == "ModTable":
+		# fill the module stat data into the table
+		StatsFormat = { 'percentiles': options.Percentiles, }
+		OutputTable.AddData \
+		  ([ stats.FormatStatsAsList(StatsFormat) for stats in AllStats ])
+		# then the event data
+		OutputTable.AddRow(*EventStats.FormatStatsAsList(StatsFormat))
+		# and the memory usage, next to the timing
+		if AllStats.memory is not None:
+			nColumns = 7 + len(options.Percentiles)
+			MemoryStats = [ AllStats.memory.get(stats.key) for stats in AllStats ] \
+			  + [ AllStats.memory.event ]
+			for iRow, stats in enumerate(MemoryStats):
+				row = tuple(OutputTable.tabledata[iRow])
+				OutputTable.tabledata[iRow] = row + ( "", ) * (nColumns - len(row)) \
+				  + tuple(stats.FormatAsList() if stats else [ "memory n/a" ])
+			# for
+		# if memory
+	elif options.PresentMode == "EventTable":
+		# set some table formatting options
+		OutputTable.SetRowFormats \
+		  (OutputTable.LineNo(0), [ None, { 'align': 'center' }])
+		# header row
+		OutputTable.AddRow("Module", *range(AllStats.MaxEvents()))
+		# fill the module stat data into the table
+		OutputTable.AddData([ stats.FormatTimesAsList() for stats in AllStats ])
+		# then the event data
+		OutputTable.AddRow(*EventStats.FormatTimesAsList())
+	elif options.PresentMode == "TimeSeries":
+		OutputTable.AddData([ FormatTimeSeriesAsList(stats, results)
+		  for stats, results in IterateTimeSeriesAnalysis(AllStats, EventStats,
+		    nWarmup=options.WarmupEvents, window=options.WindowEvents)
+		  ])
+	elif options.PresentMode == "EventShares":
+		FillEventSharesTable(OutputTable, AllStats, EventStats,
+		  nTopEvents=options.TopEvents, nTopModules=options.TopModules)
+	else:
+		raise RuntimeError("Presentation mode %r not known" % options.PresentMode)
+	
+	return OutputTable
+# FillOutputTable()
+
+
+class EventTablePagerClass:
+	"""Writes the time of each module in each event, a page at a time.
+	
+	This is an event sink for TimingStatsCollectorClass: the timing entries of
+	each event are kept only until the event is completed and its page, with
+	pageSize events, is written into the stream. Only the events of the current
+	page are stored, regardless of the total number of events.
+	Each page lists all the modules known at the time it is written.
+	The supported layouts are:
+	- 'transposed': one row per event (identified by its number in the job),
+	  one column per module, with the total event time in the last column
+	- 'paged': like the standard event table (one row per module, one column
+	  per event), with pageSize events in each block
+	Duplicate entries for the same module and event are ignored, and missing
+	ones are shown as "n/a". Entries of events already completed (e.g. when an
+	event shows up again later in the log) are ignored as well.
+	"""
+	def __init__(self, AllStats, EventStats, layout = 'transposed',
+	  pageSize = 50, stream = sys.stdout):
+		if layout not in ( 'transposed', 'paged' ):
+			raise RuntimeError("Event table layout %r not known" % layout)
+		self.AllStats = AllStats
+		self.EventStats = EventStats
+		self.layout = layout
+		self.pageSize = max(pageSize, 1)
+		self.stream = stream
+		self.openEvents = OrderedDict() # event key -> { module key: time }
+		self.page = [] # list of event entries in the current page
+		self.nEvents = 0 # number of events written so far
+		self.completedEvents = EventKeySetClass()
+	# __init__()
+	
+	def add(self, data):
+		"""Records the time from a timing entry (EntryDataClass)."""
+		if data.eventKey in self.completedEvents: return
+		try: times = self.openEvents[data.eventKey]
+		except KeyError: times = self.openEvents[data.eventKey] = {}
+		key = data.module if data.isModule() else None
+		if key not in times: times[key] = data.time()
+	# add()
+	
+	def completeEvent(self, eventKey):
+		"""Moves an event in the page, writing the page if full."""
+		if not self.completedEvents.add(eventKey): return # already completed
+		self.page.append(self.openEvents.pop(eventKey, {}))
+		if len(self.page) >= self.pageSize: self.flush()
+	# completeEvent()
+	
+	def flush(self):
+		"""Writes the current page (if not empty), and starts a new one."""
+		if not self.page: return
+		if self.nEvents > 0: self.stream.write("\n")
+		self.FillPageTable().Write(self.stream)
+		self.nEvents += len(self.page)
+		self.page = []
+	# flush()
+	
+	def finish(self):
+		"""Completes the events still open and writes the last page."""
+		for eventKey in list(self.openEvents): self.completeEvent(eventKey)
+		self.flush()
+	# finish()
+	
+	
+	@staticmethod
+	def FormatTime(time, format_str = '%g'):
+		return "n/a" if time is None else format_str % time
+	
+	def FillPageTable(self):
+		"""Returns a TabularAlignmentClass with the content of the current page."""
+		OutputTable = TabularAlignmentClass()
+		OutputTable.SetRowFormats \
+		  (OutputTable.LineNo(0), [ None, { 'align': 'center' }])
+		ModuleKeys = [ stats.key for stats in self.AllStats ]
+		Keys = ModuleKeys + [ None ]
+		if self.layout == 'transposed':
+			OutputTable.AddRow("Event",
+			  *([ str(key) for key in ModuleKeys ] + [ str(self.EventStats.key) ]))
+			for iEvent, times in enumerate(self.page):
+				OutputTable.AddRow(self.nEvents + iEvent,
+				  *[ self.FormatTime(times.get(key)) for key in Keys ])
+			# for
+		else: # if self.layout == 'paged':
+			OutputTable.AddRow("Module",
+			  *range(self.nEvents, self.nEvents + len(self.page)))
+			for key, name in zip(Keys, ModuleKeys + [ self.EventStats.key ]):
+				OutputTable.AddRow(str(name),
+				  *[ self.FormatTime(times.get(key)) for times in self.page ])
+			# for
+		# if ... else
+		return OutputTable
+	# FillPageTable()
+	
+# class EventTablePagerClass
+
+
+class CSVTableWriterClass:
+	"""Writes table rows in CSV format; missing values (None) are left empty."""
+	def __init__(self, stream, columns):
+		self.writer = csv.writer(stream, lineterminator='\n')
+		self.writer.writerow(columns)
+	# __init__()
+	def writeRow(self, row): self.writer.writerow(row)
+	def close(self): pass
+# class CSVTableWriterClass
+
+
+class JSONLinesTableWriterClass:
+	"""Writes each table row as a JSON object on its own line."""
+	def __init__(self, stream, columns):
+		self.stream = stream
+		self.columns = columns
+	# __init__()
+	def writeRow(self, row):
+		self.stream.write(json.dumps(OrderedDict(zip(self.columns, row))))
+		self.stream.write('\n')
+	# writeRow()
+	def close(self): pass
+# class JSONLinesTableWriterClass
+
+
+class ParquetTableWriterClass:
+	"""Writes table rows in a Parquet file, in batches (requires pyarrow).
+	
+	The schema is fixed from the column names, so that all the batches share it
+	even when a column has no value in some of them: module names are strings,
+	event numbers and counts are integers, flags are booleans and all the other
+	columns (times, memory, ...) are floating point numbers.
+	"""
+	BatchSize = 65536
+	StringColumns = ( 'module', )
+	IntegerColumns = ( 'run', 'subRun', 'event', 'n', 'baseline_n', 'dominant' )
+	BooleanColumns = ( 'regression', 'improvement' )
+	
+	def __init__(self, path, columns):
+		self.path = path
+		self.columns = columns
+		self.schema = pyarrow.schema([ ( str(column), self.columnType(column) )
+		  for column in columns ])
+		self.writer = None
+		self.batch = []
+	# __init__()
+	
+	@classmethod
+	def columnType(cls, column):
+		if column in cls.StringColumns:  return pyarrow.string()
+		if column in cls.IntegerColumns: return pyarrow.int64()
+		if column in cls.BooleanColumns: return pyarrow.bool_()
+		return pyarrow.float64()
+	# columnType()
+	
+	def writeRow(self, row):
+		self.batch.append(row)
+		if len(self.batch) >= self.BatchSize: self.flush()
+	# writeRow()
+	
+	def flush(self):
+		if not self.batch and self.writer is not None: return
+		columns = zip(*self.batch) if self.batch else [ [] ] * len(self.columns)
+		table = pyarrow.Table.from_arrays([
+		  pyarrow.array(list(column), type=field.type)
+		  for column, field in zip(columns, self.schema)
+		  ], schema=self.schema)
+		if self.writer is None:
+			self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+		self.writer.write_table(table)
+		self.batch = []
+	# flush()
+	
+	def close(self):
+		self.flush()
+		self.writer.close()
+	# close()
+	
+# class ParquetTableWriterClass
+
+
+class NPZTableWriterClass:
+	"""Writes table columns as arrays in a numpy .npz file (requires numpy).
+	
+	Missing values (None) are stored as NaN. The column names are stored in the
+	'columns' array, and each column is stored in an array with its index as
+	name ('column0', 'column1', ...).
+	"""
+	def __init__(self, path, columns):
+		self.path = path
+		self.columns = columns
+		self.data = [ [] for column in columns ]
+	# __init__()
+	
+	def writeRow(self, row):
+		for column, value in zip(self.data, row): column.append(value)
+	
+	def close(self):
+		arrays = { 'columns': numpy.array([ str(c) for c in self.columns ]) }
+		for iColumn, column in enumerate(self.data):
+			if any(isinstance(value, basestring) for value in column):
+				array = numpy.array([ '' if v is None else v for v in column ])
+			else:
+				array = numpy.array \
+				  ([ numpy.nan if v is None else v for v in column ], dtype=float)
+			arrays['column%d' % iColumn] = array
+		# for
+		numpy.savez(self.path, **arrays)
+	# close()
+	
+# class NPZTableWriterClass
+
+
+OutputTableWriters = {
+	'csv':     ( CSVTableWriterClass,       'stream' ),
+	'jsonl':   ( JSONLinesTableWriterClass, 'stream' ),
+	'parquet': ( ParquetTableWriterClass,   'path'   ),
+	'npz':     ( NPZTableWriterClass,       'path'   ),
+	}
+
+
+def IterateStatsSummaryRows(AllStats, EventStats, percentiles = []):
+	"""Yields the summary of each statistics as a list of values.
+	
+	The first row has the names of the columns: module, number of events,
+	average, RMS, total, minimum and maximum time, followed by the requested
+	percentiles and, if collected, by the total increase and the peak of
+	resident and virtual memory [MB]. The per-event statistics come last.
+	"""
+	MemoryColumns = [] if AllStats.memory is None \
+	  else [ 'rssIncrease', 'rssPeak', 'vsizeIncrease', 'vsizePeak' ]
+	yield [ 'module', 'n', 'average', 'rms', 'total', 'min', 'max' ] \
+	  + [ 'p%g' % percentile for percentile in percentiles ] + MemoryColumns
+	for stats in list(AllStats) + [ EventStats ]:
+		if stats.n() == 0:
+			row = [ str(stats.key), 0 ] + [ None ] * (5 + len(percentiles))
+		else:
+			row = [ str(stats.key), stats.n(), stats.average(), stats.rms(),
+			  stats.sum(), stats.min(), stats.max() ] \
+			  + [ stats.quantile(percentile / 100.) for percentile in percentiles ]
+		# if ... else
+		if MemoryColumns:
+			MemoryStats = AllStats.memory.event if stats is EventStats \
+			  else AllStats.memory.get(stats.key)
+			if (MemoryStats is None) or (MemoryStats.n() == 0):
+				row.extend([ None ] * len(MemoryColumns))
+			else:
+				row.extend([ MemoryStats.rssDelta.sum(), MemoryStats.rss.max(),
+				  MemoryStats.vsizeDelta.sum(), MemoryStats.vsize.max() ])
+			# if ... else
+		# if memory
+		yield row
+	# for
+# IterateStatsSummaryRows()
+
+
+def IterateEventMatrixRows(AllStats, EventStats):
+	"""Yields the time of each module for each event, as a list of values.
+	
+	The first row has the names of the columns: run, subRun, event, then the
+	name of each module and finally 'eventTime'. The following rows have the
+	numbers and the times (None where missing) of each known event, in order.
+	"""
+	yield [ 'run', 'subRun', 'event' ] + [ str(stats.key) for stats in AllStats ] \
+	  + [ 'eventTime' ]
+	for eventKey in EventStats.getEvents():
+		yield [ eventKey.run(), eventKey.subRun(), eventKey.event() ] \
+		  + [ stats.timeOf(eventKey) for stats in AllStats ] \
+		  + [ EventStats.timeOf(eventKey) ]
+	# for
+# IterateEventMatrixRows()
+
+
+def IterateTimeSeriesRows(AllStats, EventStats, nWarmup = 1, window = 100):
+	"""Yields the time series analysis of each statistics as a list of values.
+	
+	The first row has the names of the columns: module, then the results of
+	AnalyseTimeSeries(). The per-event statistics come last.
+	"""
+	Columns = [ 'n', 'warmup', 'steady', 'rms', 'excess', 'slope', 'drift',
+	  'windowMin', 'windowMax' ]
+	yield [ 'module' ] + Columns
+	for stats, results in IterateTimeSeriesAnalysis \
+	  (AllStats, EventStats, nWarmup=nWarmup, window=window):
+		yield [ str(stats.key), int(results['n']) ] + [
+		  None if math.isnan(results[key]) else float(results[key])
+		  for key in Columns[1:]
+		  ]
+	# for
+# IterateTimeSeriesRows()
+
+
+def IterateEventSharesRows(AllStats, EventStats):
+	"""Yields the attribution of the event time to each module as a list.
+	
+	The first row has the names of the columns: module, then some results of
+	AnalyseEventShares(). The time not accounted for by the modules comes last,
+	as a module named '(unaccounted)'.
+	"""
+	results = AnalyseEventShares(AllStats, EventStats, nTop=0)
+	Columns = [ 'n', 'total', 'share', 'meanShare', 'dominant' ]
+	yield [ 'module' ] + Columns
+	for iModule, stats in enumerate(AllStats):
+		yield [ str(stats.key), int(results['n'][iModule]),
+		  float(results['total'][iModule]), float(results['share'][iModule]),
+		  float(results['meanShare'][iModule]),
+		  int(results['dominant'][iModule]),
+		  ]
+	# for
+	yield [ '(unaccounted)', None, float(results['unaccountedTotal']),
+	  float(results['unaccountedShare']), None, None ]
+# IterateEventSharesRows()
+
+
+def IterateComparisonRows(Comparisons):
+	"""Yields the comparisons (StatsComparisonClass) as lists of values.
+	
+	The first row has the names of the columns: module, number of events,
+	average and quantiles of the baseline and of the new job, p-value of the
+	difference of the averages, and whether it is a regression or an
+	improvement.
+	"""
+	Names = [ 'average' ] + [ 'p%g' % (q * 100.)
+	  for q in StatsComparisonClass.Quantiles ]
+	yield [ 'module', 'baseline_n', 'n' ] \
+	  + [ 'baseline_' + name for name in Names ] + Names \
+	  + [ 'pvalue', 'regression', 'improvement' ]
+	for comparison in Comparisons:
+		yield [ str(comparison.key),
+		  comparison.baseline.n() if comparison.baseline else 0,
+		  comparison.stats.n() if comparison.stats else 0,
+		  ] + comparison.values(comparison.baseline) \
+		  + comparison.values(comparison.stats) \
+		  + [ comparison.pvalue, comparison.bRegression, comparison.bImprovement ]
+	# for
+# IterateComparisonRows()
+
+
+def WriteOutputData(AllStats, EventStats, options):
+	"""Writes the statistics in the format options.OutputFormat.
+	
+	The summary of the statistics is written in ModTable presentation mode,
+	the time of each module in each event in EventTable mode, the time
+	series analysis in TimeSeries mode and the share of the event time of each
+	module in EventShares mode (see WriteOutputRows()).
+	"""
+	if options.PresentMode == "EventTable":
+		Rows = IterateEventMatrixRows(AllStats, EventStats)
+	elif options.PresentMode == "TimeSeries":
+		Rows = IterateTimeSeriesRows(AllStats, EventStats,
+		  nWarmup=options.WarmupEvents, window=options.WindowEvents)
+	elif options.PresentMode == "EventShares":
+		Rows = IterateEventSharesRows(AllStats, EventStats)
+	else:
+		Rows = IterateStatsSummaryRows(AllStats, EventStats, options.Percentiles)
+	WriteOutputRows(Rows, options)
+# WriteOutputData()
+
+
+def WriteOutputRows(Rows, options):
+	"""Writes the rows in the format options.OutputFormat.
+	
+	The first row has the names of the columns. The rows are written one by one
+	to options.OutputFile ('-' for the standard output, only for text formats).
+	"""
+	WriterClass, Target = OutputTableWriters[options.OutputFormat]
+	if Target == 'path':
+		Writer = WriterClass(options.OutputFile, next(Rows))
+		OutputFile = None
+	else:
+		if options.OutputFile == '-': OutputFile = sys.stdout
+		else:                         OutputFile = open(options.OutputFile, 'w')
+		Writer = WriterClass(OutputFile, next(Rows))
+	# if ... else
+	for Row in Rows: Writer.writeRow(Row)
+	Writer.close()
+	if OutputFile not in ( None, sys.stdout ): OutputFile.close()
+# WriteOutputRows()
+
+
+#
+# parsing interface
+#
+# Example of use from python code:
+#   
+#   import SortModuleTimes
+#   options = SortModuleTimes.ParsingOptions(Jobs=4)
+#   for LogPath, AllStats, EventStats, nErrors \
+#     in SortModuleTimes.IterateParsedLogs(LogPaths, options):
+#     for row in SortModuleTimes.IterateStatsSummaryRows(AllStats, EventStats):
+#       print(row)
+#   
+ParsingDefaults = {
+	'Permissive':           False,
+	'MaxEvents':            -1,
+	'CheckDuplicates':      True,
+	'TrackEntries':         False,
+	'Columnar':             False,
+	'Percentiles':          [],
+	'SketchAccuracy':       0.01,
+	'CacheDir':             None,
+	'ExternalDecompressor': False,
+	'Memory':               False,
+	'SelectedModules':      None,
+	'ModuleRegex':          None,
+	'Runs':                 None,
+	'SubRuns':              None,
+	'EventRange':           None,
+	'SkipEvents':           0,
+	'Jobs':                 1,
+	}
+
+def ParsingOptions(**kargs):
+	"""Returns options for the parsing functions.
+	
+	The options have the same names and defaults as the ones from the command
+	line (see ParsingDefaults and ParseInputFile()), and they can be overridden
+	by keyword arguments, e.g. ParsingOptions(Permissive=True, Jobs=4).
+	"""
+	import argparse
+	options = argparse.Namespace(**ParsingDefaults)
+	for name, value in kargs.items(): setattr(options, name, value)
+	if options.Columnar: options.CheckDuplicates = options.TrackEntries = True
+	return options
+# ParsingOptions()
+
+
+def IterateTimingEntries(InputFilePath, options = None):
+	"""Yields the timing entries from a log file, without any statistics.
+	
+	This is a generator yielding tuples (iLine, TimeData) as ParseTimingLines()
+	does; also a SQLite database from the TimeTracker service is supported, in
+	which case the row number takes the place of the line number.
+	Only the options ExternalDecompressor, Memory and the selection ones are
+	used (see ParsingOptions()).
+	"""
+	if options is None: options = ParsingOptions()
+	Selector = CreateTimingSelector(options)
+	if IsTimeTrackerDatabase(InputFilePath):
+		Connection = OpenTimeTrackerDatabase(InputFilePath)
+		try:
+			for iRow, TimeData in IterateTimeTrackerEntries(Connection):
+				if (Selector is None) or Selector.select(TimeData):
+					yield iRow, TimeData
+			# for
+		finally:
+			Connection.close()
+		return
+	# if database
+	for iLine, TimeData in ParseSelectedLines(ReadTimingLines(InputFilePath,
+	  bExternal=options.ExternalDecompressor, bMemory=options.Memory),
+	  TimingLineParserClass(selector=Selector)):
+		yield iLine, TimeData
+	# for
+# IterateTimingEntries()
+
+
+def ParseLogs(InputFilePaths, options = None):
+	"""Parses all the log files into a single set of statistics.
+	
+	Returns a tuple with the per-module statistics (JobStatsClass), the per-event
+	statistics and the number of errors. See ParsingOptions() for the options.
+	"""
+	if options is None: options = ParsingOptions()
+	AllStats = JobStatsClass(bMemory=options.Memory)
+	EventStats = CreateEventStats(options)
+	try: nErrors = ParseInputFiles(InputFilePaths, AllStats, EventStats, options)
+	except NoMoreInput as e: nErrors = e.nErrors
+	return AllStats, EventStats, nErrors
+# ParseLogs()
+
+
+def IterateParsedLogs(InputFilePaths, options = None):
+	"""Parses each of the log files into its own statistics.
+	
+	This is a generator yielding for each log file, in order, a tuple with its
+	path and the result of ParseLogs() on it. With options.Jobs larger than 1,
+	the files are parsed in parallel, a few at a time.
+	"""
+	if options is None: options = ParsingOptions()
+	if (options.Jobs <= 1) or (len(InputFilePaths) <= 1):
+		for InputFilePath in InputFilePaths:
+			yield ( InputFilePath, ) + ParseLogs([ InputFilePath ], options)
+		return
+	# if serial
+	
+	Pool = multiprocessing.Pool(options.Jobs)
+	try:
+		for InputFilePath, Result in zip(InputFilePaths, Pool.imap(
+		  ParseLogsWorker,
+		  [ ( InputFilePath, options ) for InputFilePath in InputFilePaths ]
+		  )):
+			yield ( InputFilePath, ) + Result
+		# for
+		Pool.close()
+	except:
+		Pool.terminate()
+		raise
+	finally:
+		Pool.join()
+# IterateParsedLogs()
+
+
+def ParseLogsWorker(args):
+	"""Runs ParseLogs() on a single file; args is (InputFilePath, options)."""
+	InputFilePath, options = args
+	options = ParsingOptions(**vars(options))
+	options.Jobs = 1
+	return ParseLogs([ InputFilePath ], options)
+# ParseLogsWorker()
+
+
 ################################################################################
 ### main program
 ###
@@ -864,82 +4479,262 @@ if __name__ == "__main__":
 	
 	# positional arguments
 	Parser.add_argument("LogFiles", metavar="LogFile", nargs="+",
-	  help="log file to be parsed")
+	  help="log file to be parsed (or SQLite database from TimeTracker)")
 	
 	# options
 	Parser.add_argument("--eventtable", dest="PresentMode", action="store_const",
 	  const="EventTable", help="do not group the pages by node")
+	Parser.add_argument("--eventlayout", dest="EventLayout",
+	  choices=[ 'columns', 'transposed', 'paged' ], default='columns',
+	  help="layout of the event table: one column per event ('columns'),"
+	  " one row per event ('transposed'), or one column per event in pages of"
+	  " --pagesize events ('paged'); the last two imply --eventtable and are"
+	  " written while parsing [%(default)s]")
+	Parser.add_argument("--pagesize", dest="PageSize", type=int, default=50,
+	  help="number of events in each page of the transposed and paged event"
+	  " tables [%(default)s]")
+	Parser.add_argument("--timeseries", dest="PresentMode", action="store_const",
+	  const="TimeSeries",
+	  help="print for each module the time of the first (warm-up) events, the"
+	  " steady state time, its drift along the job and the range of its"
+	  " average in a moving window of events (requires numpy)")
+	Parser.add_argument("--warmup", dest="WarmupEvents", type=int, default=1,
+	  help="number of warm-up events in the time series analysis"
+	  " [%(default)s]")
+	Parser.add_argument("--window", dest="WindowEvents", type=int, default=100,
+	  help="number of events in the moving window of the time series analysis"
+	  " [%(default)s]")
+	Parser.add_argument("--shares", dest="PresentMode", action="store_const",
+	  const="EventShares",
+	  help="print the share of the event time spent in each module and in the"
+	  " framework, and the slowest modules of the slowest events (requires"
+	  " numpy)")
+	Parser.add_argument("--topevents", dest="TopEvents", type=int, default=5,
+	  help="number of slowest events to be detailed by --shares [%(default)s]")
+	Parser.add_argument("--topmodules", dest="TopModules", type=int, default=5,
+	  help="number of modules listed for each of the slowest events by --shares"
+	  " [%(default)s]")
+	Parser.add_argument("--compare", dest="BaselineLogs", metavar="BASELINE",
+	  nargs="+", default=[],
+	  help="compare the timing of each module with the one from these log files"
+	  " (to be specified after the other log files), and exit with non-zero"
+	  " code if any of them is a regression")
+	Parser.add_argument("--threshold", dest="Threshold", type=float,
+	  default=5.,
+	  help="relative increase of the average time (in percent) above which"
+	  " a module is considered a regression by --compare [%(default)s]")
+	Parser.add_argument("--significance", dest="Significance", type=float,
+	  default=0.01,
+	  help="largest p-value (from Welch t test) of the difference of the"
+	  " average times for a regression by --compare [%(default)s]")
 	Parser.add_argument("--allowduplicates", '-D', dest="CheckDuplicates",
 	  action="store_false", help="do not check for duplicate entries")
+	Parser.add_argument("--columnar", dest="Columnar", action="store_true",
+	  help="store the single event timings in numpy arrays (implies checking"
+	  " for duplicates) [%(default)s]")
+	Parser.add_argument("--percentiles", dest="Percentiles",
+	  type=lambda s: list(map(float, s.split(','))), default=[],
+	  help="comma-separated list of percentiles of the timings to be printed"
+	  " in the module table (e.g. '50,95,99')")
+	Parser.add_argument("--sketchaccuracy", dest="SketchAccuracy", type=float,
+	  default=0.01,
+	  help="relative accuracy of the estimated percentiles [%(default)s]")
+	Parser.add_argument("--follow", "-f", dest="Follow", action="store_true",
+	  help="keep reading the (single, uncompressed) log file as it is written,"
+	  " periodically printing the statistics, until interrupted [%(default)s]")
+	Parser.add_argument("--refresh", dest="RefreshInterval", type=float,
+	  default=5.,
+	  help="seconds between table updates in follow mode [%(default)s]")
+	Parser.add_argument("--cache", dest="CacheDir", action="store_const",
+	  const=os.path.join(os.path.expanduser("~"), ".cache", "SortModuleTimes"),
+	  help="reuse the information parsed from the log files, caching it in"
+	  " '%(const)s'")
+	Parser.add_argument("--cachedir", dest="CacheDir",
+	  help="reuse the information parsed from the log files, caching it in"
+	  " the specified directory")
+	Parser.add_argument("--externaldecompressor", dest="ExternalDecompressor",
+	  action="store_true",
+	  help="decompress the input files with external programs (e.g. pigz,"
+	  " pbzip2, zstd), in parallel with the parsing [%(default)s]")
+	Parser.add_argument("--outputformat", "--output-format", dest="OutputFormat",
+	  choices=sorted(OutputTableWriters.keys()),
+	  help="write the statistics in this machine-readable format instead of"
+	  " a text table")
+	Parser.add_argument("--output", "-o", dest="OutputFile", default='-',
+	  help="output file for --outputformat ('-' for standard output)"
+	  " [%(default)s]")
 	Parser.add_argument("--maxevents", dest="MaxEvents", type=int, default=-1,
 	  help="limit the number of parsed events to this (negative: no limit)")
+	Parser.add_argument("--memory", dest="Memory", action="store_true",
+	  help="also collect the memory usage reported by the MemoryCheck lines in"
+	  " the same pass, and print it next to the module timing (the parsing"
+	  " cache is not used); the lines of art's MemoryTracker are not read,"
+	  " since its log has only an end-of-job summary, while MemoryCheck lines"
+	  " report the same VSIZE and RSS increase for each module and event"
+	  " [%(default)s]")
 	Parser.add_argument("--permissive", dest="Permissive", action="store_true",
 	  help="treats input errors as non-fatal [%(default)s]")
+	Parser.add_argument("--module", dest="SelectedModules", action="append",
+	  metavar="MODULE",
+	  help="include only this module, by label or name (e.g. 'SimWire[daq]');"
+	  " can be repeated")
+	Parser.add_argument("--moduleregex", "--module-regex", dest="ModuleRegex",
+	  metavar="REGEX",
+	  help="include also the modules whose name (e.g. 'SimWire[daq]') matches"
+	  " this regular expression")
+	Parser.add_argument("--run", dest="Runs", type=ParseNumberRanges,
+	  metavar="RANGES",
+	  help="include only the events from these runs (e.g. '1,4-6,10-')")
+	Parser.add_argument("--subrun", dest="SubRuns", type=ParseNumberRanges,
+	  metavar="RANGES",
+	  help="include only the events from these subruns (e.g. '1,4-6,10-')")
+	Parser.add_argument("--eventrange", "--event-range", dest="EventRange",
+	  type=ParseNumberRanges, metavar="RANGES",
+	  help="include only the events with these numbers (e.g. '1,4-6,10-')")
+	Parser.add_argument("--skipevents", "--skip-events", dest="SkipEvents",
+	  type=int, default=0,
+	  help="skip the first events of each log [%(default)s]")
+	Parser.add_argument("--jobs", "-j", dest="Jobs", type=int, default=1,
+	  help="number of log files to parse in parallel; a single uncompressed"
+	  " log file is split in parts parsed in parallel; ignored when limiting"
+	  " the number of events, and a log is not split when skipping events"
+	  " [%(default)s]")
 	Parser.add_argument('--version', action='version', version=Version)
 	
 	options = Parser.parse_args()
 	
-	if options.PresentMode in ( 'EventTable', ):
+	if options.Columnar and numpy is None:
+		Parser.error("columnar storage (--columnar) requires numpy")
+	if (options.PresentMode == 'TimeSeries') and (numpy is None):
+		Parser.error("time series analysis (--timeseries) requires numpy")
+	if (options.PresentMode == 'EventShares') and (numpy is None):
+		Parser.error("event time attribution (--shares) requires numpy")
+	if (options.OutputFormat in ( 'parquet', 'npz' )) \
+	  and (options.OutputFile == '-'):
+		Parser.error("%s format requires an output file (--output)"
+		  % options.OutputFormat)
+	if (options.OutputFormat == 'parquet') and (pyarrow is None):
+		Parser.error("parquet format requires pyarrow")
+	if (options.OutputFormat == 'npz') and (numpy is None):
+		Parser.error("npz format requires numpy")
+	if options.ModuleRegex is not None:
+		try: re.compile(options.ModuleRegex)
+		except re.error as e:
+			Parser.error("invalid module regular expression '%s': %s"
+			  % (options.ModuleRegex, e))
+	# if
+	if options.Follow and ((len(options.LogFiles) != 1)
+	  or IsCompressedFile(options.LogFiles[0])
+	  or IsTimeTrackerDatabase(options.LogFiles[0])):
+		Parser.error("follow mode requires a single uncompressed log file")
+	if options.EventLayout != 'columns':
+		if options.Follow or options.OutputFormat:
+			Parser.error("%s event table layout is not supported with --follow"
+			  " or --outputformat" % options.EventLayout)
+		if options.PageSize < 1:
+			Parser.error("page size must be positive (got %d)" % options.PageSize)
+		options.PresentMode = 'EventTable'
+	if options.BaselineLogs:
+		if options.Follow or (options.PresentMode != 'ModTable'):
+			Parser.error("comparison (--compare) can only be used with the default"
+			  " presentation mode, and not in follow mode")
+		# the comparison includes the median and the 95th percentile
+		if not options.Percentiles: options.Percentiles = [ 50., 95. ]
+	# if
+	if (options.EventLayout == 'columns') and (options.Columnar
+	  or options.PresentMode in ( 'EventTable', 'TimeSeries', 'EventShares', )):
 		options.CheckDuplicates = True
+		options.TrackEntries = True
+	else:
+		# duplicates across files parsed in parallel are removed when merging,
+		# from the single entries tracked by each parsing process
+		options.TrackEntries = False
+	# if ... else
 	
 	###
 	### parse all inputs, collect the information
 	###
 	
 	# per-module statistics
-	AllStats = JobStatsClass( )
+	AllStats = JobStatsClass(bMemory=options.Memory)
 	# per-event statistics
-	EventStats = TimeModuleStatsClass \
-	  ("=== events ===", bTrackEntries=options.CheckDuplicates)
-	
-	class NoMoreInput: pass
+	EventStats = CreateEventStats(options)
+	# event table written while parsing
+	if options.EventLayout != 'columns':
+		EventTablePager = EventTablePagerClass(AllStats, EventStats,
+		  layout=options.EventLayout, pageSize=options.PageSize)
+	else: EventTablePager = None
 	
 	nErrors = 0
 	try:
 		if options.MaxEvents == 0: raise NoMoreInput # wow, that was quick!
-		for LogFilePath in options.LogFiles:
-			nErrors += ParseInputFile(LogFilePath, AllStats, EventStats, options)
+		if options.Follow:
+			def RefreshTable():
+				if sys.stdout.isatty(): sys.stdout.write("\033[H\033[2J")
+				print("%s -- %s" % (time.strftime("%H:%M:%S"), options.LogFiles[0]))
+				if EventStats.n() + len(AllStats) > 0:
+					FillOutputTable(AllStats, EventStats, options).Print()
+				sys.stdout.flush()
+			# RefreshTable()
+			nErrors += FollowInputFile \
+			  (options.LogFiles[0], AllStats, EventStats, options, RefreshTable)
+		else:
+			nErrors += ParseInputFiles(options.LogFiles, AllStats, EventStats,
+			  options, EventSink=EventTablePager)
+		# if ... else
 		
-	except NoMoreInput: pass
+	except NoMoreInput as e: nErrors += e.nErrors
+	
+	if options.BaselineLogs:
+		BaselineAllStats = JobStatsClass(bMemory=options.Memory)
+		BaselineEventStats = CreateEventStats(options)
+		try:
+			if options.MaxEvents == 0: raise NoMoreInput
+			nErrors += ParseInputFiles(options.BaselineLogs,
+			  BaselineAllStats, BaselineEventStats, options)
+		except NoMoreInput as e: nErrors += e.nErrors
+	# if
 	
 	# give a bit of separation between error messages and actual output
-	if nErrors > 0: print >>sys.stderr
+	if nErrors > 0: print(file=sys.stderr)
 	
 	###
 	### print the results
 	###
-	if (AllStats.MaxEvents() == 0) and (EventStats.nEntries() == 0):
-		print "No time statistics found."
+	if EventTablePager is not None:
+		EventTablePager.finish()
+		bNoStats = EventTablePager.nEvents == 0
+	else:
+		bNoStats = (AllStats.MaxEvents() == 0) and ((EventStats.nEntries()
+		  if EventStats.isTracking() else EventStats.nEvents()) == 0)
+	if bNoStats:
+		print("No time statistics found.")
 		sys.exit(1)
 	# if
 	
-	OutputTable = TabularAlignmentClass()
-	
-	# present results
-	if options.PresentMode == "ModTable":
-		# fill the module stat data into the table
-		OutputTable.AddData([ stats.FormatStatsAsList() for stats in AllStats ])
-		# then the event data
-		OutputTable.AddRow(*EventStats.FormatStatsAsList())
-	elif options.PresentMode == "EventTable":
-		# set some table formatting options
-		OutputTable.SetRowFormats \
-		  (OutputTable.LineNo(0), [ None, { 'align': 'center' }])
-		# header row
-		OutputTable.AddRow("Module", *range(AllStats.MaxEvents()))
-		# fill the module stat data into the table
-		OutputTable.AddData([ stats.FormatTimesAsList() for stats in AllStats ])
-		# then the event data
-		OutputTable.AddRow(*EventStats.FormatTimesAsList())
+	nRegressions = 0
+	if EventTablePager is not None: pass # already written
+	elif options.BaselineLogs:
+		Comparisons = CompareJobStats(
+		  BaselineAllStats, BaselineEventStats, AllStats, EventStats,
+		  threshold=options.Threshold / 100., significance=options.Significance
+		  )
+		nRegressions = sum(1 for c in Comparisons if c.bRegression)
+		if options.OutputFormat:
+			WriteOutputRows(IterateComparisonRows(Comparisons), options)
+		else:
+			FillComparisonTable(Comparisons).Print()
+	elif options.OutputFormat:
+		WriteOutputData(AllStats, EventStats, options)
 	else:
-		raise RuntimeError("Presentation mode %r not known" % options.PresentMode)
-	
-	OutputTable.Print()
+		FillOutputTable(AllStats, EventStats, options).Print()
 	
 	###
 	### say goodbye
 	###
 	if nErrors > 0:
-		print >>sys.stderr, "%d errors were found in the input files." % nErrors
-	sys.exit(nErrors)
+		print("%d errors were found in the input files." % nErrors, file=sys.stderr)
+	if nRegressions > 0:
+		print("%d timing regressions were found." % nRegressions, file=sys.stderr)
+	sys.exit(nErrors + nRegressions)
 # main
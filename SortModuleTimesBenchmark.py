@@ -0,0 +1,574 @@
+#!/usr/bin/env python
+#
+# Brief:  measures the parsing speed of SortModuleTimes.py
+# Date:   20261016
+#
+# Run with '--help' argument for usage instructions.
+#
+# Version:
+# 1.0
+#   first version: micro-benchmark of the timing line parsers
+# 1.1
+#   python3 support
+# 1.2
+#   synthetic log generator (--generate); benchmark of the parsing and of the
+#   presentation modes on synthetic logs, with results saved in JSON format
+#   (--suite, --save, --baseline)
+# 1.3
+#   scaling of the parsing time with the number of events (--suite scaling)
+# 1.4
+#   benchmark of the parsing of a single module
+# 1.5
+#   consistency checks of the parsing strategies (--suite checks)
+# 1.6
+#   consistency checks moved into SortModuleTimesChecks.py
+#
+
+from __future__ import print_function
+
+import sys, os
+import time
+import random
+import json
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+import gzip
+try: import bz2
+except ImportError: bz2 = None
+try: import lzma
+except ImportError: lzma = None
+try: import resource
+except ImportError: resource = None
+try: import tracemalloc
+except ImportError: tracemalloc = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import SortModuleTimes
+
+if sys.version_info[0] >= 3: xrange = range
+
+
+Version = "%(prog)s 1.6"
+__doc__ = "Measures the parsing speed of the SortModuleTimes.py parsers."
+
+
+def GenerateTimingLines(nEvents, nModules, seed = 0):
+	"""Returns a list of synthetic timing lines (stripped) from nEvents events."""
+	rand = random.Random(seed)
+	Modules = [ ( "module%03d" % i, "ModuleType%03d" % (i % 17) )
+	  for i in xrange(nModules) ]
+	Lines = []
+	for iEvent in xrange(1, nEvents + 1):
+		EventTime = 0.
+		for label, type_ in Modules:
+			t = rand.expovariate(10.)
+			EventTime += t
+			Lines.append("TimeModule> run: 1 subRun: 0 event: %d %s %s %g"
+			  % (iEvent, label, type_, t))
+		# for modules
+		Lines.append("TimeEvent> run: 1 subRun: 0 event: %d %g"
+		  % (iEvent, EventTime))
+	# for events
+	return Lines
+# GenerateTimingLines()
+
+
+def MeasureRate(func, Lines, nRepeat):
+	"""Returns the best rate (lines/second) of func over the lines."""
+	BestTime = None
+	for iRepeat in xrange(nRepeat):
+		start = time.time()
+		func(Lines)
+		elapsed = time.time() - start
+		if (BestTime is None) or (elapsed < BestTime): BestTime = elapsed
+	# for
+	return len(Lines) / BestTime if BestTime > 0. else float('inf')
+# MeasureRate()
+
+
+def LegacyParsers(Lines):
+	for line in Lines:
+		if line.startswith("TimeModule> "):
+			SortModuleTimes.ParseTimeModuleLine(line)
+		else:
+			SortModuleTimes.ParseTimeEventLine(line)
+	# for
+# LegacyParsers()
+
+
+def FastEntryParsers(Lines):
+	Parser = SortModuleTimes.TimingLineParserClass()
+	for line in Lines:
+		if line.startswith("TimeModule> "): Parser.parseModuleLine(line)
+		else:                               Parser.parseEventLine(line)
+	# for
+# FastEntryParsers()
+
+
+def FastValueParsers(Lines):
+	Parser = SortModuleTimes.TimingLineParserClass()
+	for line in Lines:
+		if line.startswith("TimeModule> "): Parser.parseModuleTime(line)
+		else:                               Parser.parseEventTime(line)
+	# for
+# FastValueParsers()
+
+
+Benchmarks = [
+	( "ParseTime*Line()",                  LegacyParsers    ),
+	( "TimingLineParserClass (entries)",   FastEntryParsers ),
+	( "TimingLineParserClass (values)",    FastValueParsers ),
+	]
+
+
+def RunParserBenchmarks(options):
+	Lines = GenerateTimingLines(options.nEvents, options.nModules)
+	print("Parsing %d timing lines (%d events, %d modules):"
+	  % (len(Lines), options.nEvents, options.nModules))
+	
+	ReferenceRate = None
+	for Name, func in Benchmarks:
+		Rate = MeasureRate(func, Lines, options.nRepeat)
+		if ReferenceRate is None: ReferenceRate = Rate
+		print("  %-34s %12.0f lines/s  (x%.2f)"
+		  % (Name, Rate, Rate / ReferenceRate))
+	# for
+# RunParserBenchmarks()
+
+
+#
+# synthetic logs
+#
+NoiseTemplates = [
+	"Begin processing the %(n)dth record. run: %(run)d subRun: %(subRun)d"
+	  " event: %(event)d at 16-Oct-2026 12:00:00 CDT",
+	"%%MSG-i %(label)s:  %(type)s:%(label)s  16-Oct-2026 12:00:00 CDT"
+	  "  run: %(run)d subRun: %(subRun)d event: %(event)d",
+	"%%MSG",
+	"%(type)s: found %(n)d hits on %(event)d channels",
+	"   processing %(label)s (%(n)d candidates, TimeModule> not reported)",
+	]
+
+# compression formats of the synthetic logs:
+# ( file suffix, python compressor class, external compression command )
+LogCompressions = {
+	'none':  ( "",     None,                            None ),
+	'gzip':  ( ".gz",  gzip.GzipFile,                   None ),
+	'bzip2': ( ".bz2", bz2.BZ2File if bz2 else None,    [ 'bzip2', '-kc' ] ),
+	'xz':    ( ".xz",  lzma.LZMAFile if lzma else None, [ 'xz', '-kc' ] ),
+	'zstd':  ( ".zst", None,                            [ 'zstd', '-qc' ] ),
+	'lz4':   ( ".lz4", None,                            [ 'lz4', '-qc' ] ),
+	}
+
+
+def GenerateLogLines(nEvents, nModules, nNoiseLines = 20,
+  truncatedFraction = 0., eventsPerSubRun = 1000, seed = 0):
+	"""Yields the lines (without line terminator) of a synthetic art log.
+	
+	The log has nEvents events, each with the timing lines of nModules modules
+	and of the event, mixed with nNoiseLines lines of other output per event.
+	A fraction truncatedFraction of the module timing lines is truncated, as
+	when the output is interrupted by another one.
+	"""
+	rand = random.Random(seed)
+	Modules = [ ( "module%03d" % i, "ModuleType%03d" % (i % 17),
+	  rand.uniform(0.001, 0.1) ) for i in xrange(nModules) ]
+	for iEvent in xrange(nEvents):
+		run, subRun, event \
+		  = 1, iEvent // eventsPerSubRun, iEvent % eventsPerSubRun + 1
+		Noise = sorted((rand.randrange(nModules + 1)
+		  for i in xrange(nNoiseLines)), reverse=True)
+		EventTime = 0.
+		for iModule, ( label, type_, scale ) in enumerate(Modules):
+			while Noise and (Noise[-1] == iModule):
+				Noise.pop()
+				yield rand.choice(NoiseTemplates) % { 'run': run, 'subRun': subRun,
+				  'event': event, 'label': label, 'type': type_,
+				  'n': rand.randrange(1000), }
+			# while
+			t = rand.expovariate(1. / scale)
+			EventTime += t
+			line = "TimeModule> run: %d subRun: %d event: %d %s %s %g" \
+			  % (run, subRun, event, label, type_, t)
+			if rand.random() < truncatedFraction:
+				line = line[:rand.randrange(len("TimeModule> "), len(line) - 1)]
+			yield line
+		# for modules
+		for i in Noise: yield "%MSG"
+		yield "TimeEvent> run: %d subRun: %d event: %d %g" \
+		  % (run, subRun, event, EventTime + rand.expovariate(1000.))
+	# for events
+# GenerateLogLines()
+
+
+def GenerateLog(Path, nEvents, nModules, nNoiseLines = 20,
+  truncatedFraction = 0., compression = 'none', seed = 0):
+	"""Writes a synthetic art log (see GenerateLogLines()).
+	
+	The suffix of the compression format is appended to Path.
+	Returns a dictionary with the path of the log, its size on disk, and the
+	number of its lines and its size when uncompressed.
+	"""
+	Suffix, Compressor, Command = LogCompressions[compression]
+	nLines = 0
+	nBytes = 0
+	with open(Path, 'wb') as LogFile:
+		for line in GenerateLogLines(nEvents, nModules, nNoiseLines=nNoiseLines,
+		  truncatedFraction=truncatedFraction, seed=seed):
+			data = (line + "\n").encode()
+			LogFile.write(data)
+			nLines += 1
+			nBytes += len(data)
+		# for
+	# with
+	if Suffix:
+		if Compressor is not None:
+			with open(Path, 'rb') as LogFile:
+				CompressedFile = Compressor(Path + Suffix, 'wb')
+				try: shutil.copyfileobj(LogFile, CompressedFile)
+				finally: CompressedFile.close()
+			# with
+			os.remove(Path)
+		elif Command and SortModuleTimes.find_executable(Command[0]):
+			with open(Path + Suffix, 'wb') as CompressedFile:
+				subprocess.check_call(Command + [ Path ], stdout=CompressedFile)
+			os.remove(Path)
+		else:
+			os.remove(Path)
+			raise RuntimeError("No support for %s compression" % compression)
+		Path += Suffix
+	# if compression
+	return { 'path': Path, 'size': os.path.getsize(Path), 'lines': nLines,
+	  'bytes': nBytes, }
+# GenerateLog()
+
+
+#
+# benchmarks on logs
+#
+def ParseLog(LogPath, bTrackEntries = False, SelectedModules = None):
+	options = SortModuleTimes.ParsingOptions(Permissive=True,
+	  TrackEntries=bTrackEntries, SelectedModules=SelectedModules)
+	AllStats = SortModuleTimes.JobStatsClass()
+	EventStats = SortModuleTimes.CreateEventStats(options)
+	SortModuleTimes.ParseInputFile(LogPath, AllStats, EventStats, options)
+# ParseLog()
+
+
+def ParseLogTracking(LogPath): ParseLog(LogPath, bTrackEntries=True)
+def ParseLogOneModule(LogPath): ParseLog(LogPath, SelectedModules=[ 'module000' ])
+
+
+def PresentLog(LogPath, PresentMode):
+	options = SortModuleTimes.ParsingOptions(Permissive=True)
+	options.PresentMode = PresentMode
+	options.TrackEntries = (PresentMode == "EventTable")
+	AllStats, EventStats, nErrors = SortModuleTimes.ParseLogs([ LogPath ], options)
+	with open(os.devnull, 'w') as NullFile:
+		SortModuleTimes.FillOutputTable(AllStats, EventStats, options) \
+		  .Write(NullFile)
+	# with
+# PresentLog()
+
+
+def ModTableLog(LogPath): PresentLog(LogPath, "ModTable")
+def EventTableLog(LogPath): PresentLog(LogPath, "EventTable")
+
+
+LogBenchmarks = [
+	( "ParseInputFile()",     ParseLog         ),
+	( "ParseInputFile() (entries)", ParseLogTracking ),
+	( "ParseInputFile() (module)", ParseLogOneModule ),
+	( "ModTable",             ModTableLog      ),
+	( "EventTable",           EventTableLog    ),
+	]
+
+
+def PeakRSS():
+	"""Returns the peak resident memory of this process in bytes (None if n/a)."""
+	if resource is None: return None
+	MaxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return MaxRSS if sys.platform == 'darwin' else MaxRSS * 1024
+# PeakRSS()
+
+
+def RunLogBenchmark(args):
+	"""Runs a log benchmark; meant to be executed in a new process.
+	
+	The argument is a tuple (benchmark index, log path, bAllocations).
+	Returns a dictionary with the time and the peak memory of the process;
+	if bAllocations is set, the peak of the memory allocated by python is also
+	measured (with tracemalloc, which slows down the execution).
+	"""
+	iBenchmark, LogPath, bAllocations = args
+	sys.stderr = open(os.devnull, 'w') # format errors are not interesting here
+	if bAllocations: tracemalloc.start()
+	start = time.time()
+	LogBenchmarks[iBenchmark][1](LogPath)
+	Result = { 'seconds': time.time() - start, 'peakRSS': PeakRSS(), }
+	if bAllocations:
+		Result['allocPeak'] = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+	# if
+	return Result
+# RunLogBenchmark()
+
+
+def RunInNewProcess(func, args):
+	"""Returns func(args), executed in a new process."""
+	Pool = multiprocessing.Pool(1)
+	try: return Pool.apply(func, ( args, ))
+	finally:
+		Pool.close()
+		Pool.join()
+# RunInNewProcess()
+
+
+def MeasureLog(iBenchmark, Log, nRepeat, bAllocations = False):
+	"""Returns the results of a log benchmark (the best time of nRepeat runs)."""
+	Result = None
+	for iRepeat in xrange(nRepeat):
+		RunResult = RunInNewProcess \
+		  (RunLogBenchmark, ( iBenchmark, Log['path'], False ))
+		if (Result is None) or (RunResult['seconds'] < Result['seconds']):
+			Result = RunResult
+	# for
+	if bAllocations:
+		Result['allocPeak'] = RunInNewProcess \
+		  (RunLogBenchmark, ( iBenchmark, Log['path'], True ))['allocPeak']
+	# if
+	Result['linesPerSecond'] = Log['lines'] / Result['seconds']
+	Result['MBPerSecond'] = Log['bytes'] / 1048576. / Result['seconds']
+	return Result
+# MeasureLog()
+
+
+def FormatMemory(value):
+	return "n/a" if value is None else "%.1f MB" % (value / 1048576.)
+
+
+def PrintLogResult(Result, Reference = None):
+	line = "  %-26s %-26s %10.0f lines/s %7.1f MB/s  RSS %9s" % (
+	  Result['log'], Result['benchmark'], Result['linesPerSecond'],
+	  Result['MBPerSecond'], FormatMemory(Result['peakRSS'])
+	  )
+	if 'allocPeak' in Result:
+		line += "  alloc %9s" % FormatMemory(Result['allocPeak'])
+	if Reference is not None:
+		line += "  (speed x%.2f" \
+		  % (Result['linesPerSecond'] / Reference['linesPerSecond'])
+		if Result['peakRSS'] and Reference.get('peakRSS'):
+			line += ", RSS x%.2f" % (float(Result['peakRSS']) / Reference['peakRSS'])
+		line += ")"
+	# if reference
+	print(line)
+# PrintLogResult()
+
+
+def ResultKey(Result): return ( Result['log'], Result['benchmark'] )
+
+
+def RunLogBenchmarks(options):
+	"""Generates the synthetic logs and runs all the log benchmarks on them.
+	
+	If there are results from a previous run (options.Baseline), they are
+	compared with the new ones. Returns the list of results (dictionaries).
+	"""
+	Reference = {}
+	if options.Baseline:
+		with open(options.Baseline) as BaselineFile:
+			Reference = dict(( ResultKey(Result), Result )
+			  for Result in json.load(BaselineFile)['results'])
+	# if
+	
+	WorkDir = options.WorkDir \
+	  or tempfile.mkdtemp(prefix="SortModuleTimesBenchmark")
+	try:
+		Logs = []
+		for compression in options.Compressions:
+			Log = GenerateLog(os.path.join(WorkDir, "synthetic_%s.log" % compression),
+			  options.nLogEvents, options.nModules, nNoiseLines=options.nNoiseLines,
+			  truncatedFraction=options.TruncatedFraction, compression=compression
+			  )
+			Log['name'] = os.path.basename(Log['path'])
+			Logs.append(Log)
+		# for
+		
+		print("Parsing synthetic logs (%d events, %d modules, %d other lines per"
+		  " event):" % (options.nLogEvents, options.nModules, options.nNoiseLines))
+		Results = []
+		for Log in Logs:
+			for iBenchmark, ( Name, func ) in enumerate(LogBenchmarks):
+				Result = MeasureLog(iBenchmark, Log, options.nRepeat,
+				  bAllocations=options.Allocations)
+				Result.update(log=Log['name'], benchmark=Name, lines=Log['lines'],
+				  bytes=Log['bytes'], size=Log['size'])
+				PrintLogResult(Result, Reference.get(ResultKey(Result)))
+				Results.append(Result)
+			# for benchmarks
+		# for logs
+	finally:
+		if not options.WorkDir: shutil.rmtree(WorkDir)
+	return Results
+# RunLogBenchmarks()
+
+
+def RunScalingBenchmarks(options):
+	"""Measures how the parsing time grows with the number of events.
+	
+	Logs with 1/4, 1/2 and all of options.nScalingEvents events are parsed
+	keeping track of all the entries; the time per event should not depend on
+	the size of the log. Returns the list of results (dictionaries).
+	"""
+	iBenchmark = [ Name for Name, func in LogBenchmarks ] \
+	  .index("ParseInputFile() (entries)")
+	WorkDir = options.WorkDir \
+	  or tempfile.mkdtemp(prefix="SortModuleTimesBenchmark")
+	try:
+		print("Parsing time per event (%d modules, %d other lines per event):"
+		  % (options.nModules, options.nNoiseLines))
+		Results = []
+		for nEvents in ( options.nScalingEvents // 4,
+		  options.nScalingEvents // 2, options.nScalingEvents ):
+			Log = GenerateLog \
+			  (os.path.join(WorkDir, "synthetic_%devents.log" % nEvents),
+			  nEvents, options.nModules, nNoiseLines=options.nNoiseLines,
+			  truncatedFraction=options.TruncatedFraction
+			  )
+			Result = MeasureLog(iBenchmark, Log, options.nRepeat)
+			Result.update(log=os.path.basename(Log['path']),
+			  benchmark=LogBenchmarks[iBenchmark][0], events=nEvents,
+			  lines=Log['lines'], bytes=Log['bytes'], size=Log['size'],
+			  microsecondsPerEvent=Result['seconds'] / nEvents * 1e6)
+			line = "  %8d events %8.2f s %8.1f us/event  RSS %9s" % (nEvents,
+			  Result['seconds'], Result['microsecondsPerEvent'],
+			  FormatMemory(Result['peakRSS']))
+			if Results:
+				line += "  (x%.2f per event)" % (Result['microsecondsPerEvent']
+				  / Results[0]['microsecondsPerEvent'])
+			# if
+			print(line)
+			Results.append(Result)
+			os.remove(Log['path'])
+		# for
+	finally:
+		if not options.WorkDir: shutil.rmtree(WorkDir)
+	return Results
+# RunScalingBenchmarks()
+
+
+def CurrentCommit():
+	"""Returns the git commit of this script, None if not available."""
+	try:
+		with open(os.devnull, 'w') as NullFile:
+			Commit = subprocess.check_output([ 'git', 'rev-parse', 'HEAD' ],
+			  cwd=os.path.dirname(os.path.abspath(__file__)), stderr=NullFile)
+	except (OSError, subprocess.CalledProcessError): return None
+	return Commit.decode().strip()
+# CurrentCommit()
+
+
+def SaveResults(Path, Results, options):
+	"""Writes the results, with the benchmark parameters, in a JSON file."""
+	with open(Path, 'w') as OutputFile:
+		json.dump({
+		  'commit': CurrentCommit(),
+		  'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+		  'python': sys.version.split()[0],
+		  'parameters': {
+		    'events': options.nLogEvents, 'modules': options.nModules,
+		    'noise': options.nNoiseLines, 'truncated': options.TruncatedFraction,
+		    'repeat': options.nRepeat,
+		    },
+		  'results': Results,
+		  }, OutputFile, indent=2, sort_keys=True)
+	# with
+# SaveResults()
+
+
+################################################################################
+### main program
+###
+if __name__ == "__main__":
+	import argparse
+	
+	Parser = argparse.ArgumentParser(description=__doc__)
+	Parser.add_argument("--suite", dest="Suite",
+	  choices=[ 'parsers', 'logs', 'scaling', 'all' ], default='all',
+	  help="benchmarks to be run: the timing line parsers, the parsing of"
+	  " synthetic logs, both of them ('all'), or the scaling of the parsing"
+	  " time with the number of events (the consistency checks of the parsing"
+	  " are in SortModuleTimesChecks.py) [%(default)s]")
+	Parser.add_argument("--events", dest="nEvents", type=int, default=2000,
+	  help="number of synthetic events for the parsers [%(default)s]")
+	Parser.add_argument("--logevents", dest="nLogEvents", type=int,
+	  default=5000, help="number of events in the synthetic logs [%(default)s]")
+	Parser.add_argument("--scalingevents", dest="nScalingEvents", type=int,
+	  default=100000,
+	  help="number of events in the largest log of the scaling benchmark"
+	  " [%(default)s]")
+	Parser.add_argument("--modules", dest="nModules", type=int, default=50,
+	  help="number of synthetic modules per event [%(default)s]")
+	Parser.add_argument("--noise", dest="nNoiseLines", type=int, default=20,
+	  help="number of other lines per event in the synthetic logs [%(default)s]")
+	Parser.add_argument("--truncated", dest="TruncatedFraction", type=float,
+	  default=0.001,
+	  help="fraction of truncated module timing lines in the synthetic logs"
+	  " [%(default)s]")
+	Parser.add_argument("--compression", dest="Compressions",
+	  type=lambda s: s.split(','), default=[ 'none', 'gzip' ],
+	  help="comma-separated list of compression formats of the synthetic logs"
+	  " (%s) [%%(default)s]" % ", ".join(sorted(LogCompressions)))
+	Parser.add_argument("--allocations", dest="Allocations",
+	  action="store_true",
+	  help="also measure the peak of the memory allocated by python (requires"
+	  " tracemalloc, from python 3; each benchmark is run once more)")
+	Parser.add_argument("--repeat", dest="nRepeat", type=int, default=3,
+	  help="number of repetitions of each measurement [%(default)s]")
+	Parser.add_argument("--workdir", dest="WorkDir",
+	  help="directory where to write (and leave) the synthetic logs"
+	  " [a temporary one]")
+	Parser.add_argument("--save", dest="OutputPath",
+	  help="write the results of the log benchmarks into this JSON file")
+	Parser.add_argument("--baseline", dest="Baseline",
+	  help="compare with the results from a previous run (see --save)")
+	Parser.add_argument("--generate", dest="GeneratePath",
+	  help="just write a synthetic log into this file (with the suffix of"
+	  " the first compression format added) and exit")
+	Parser.add_argument('--version', action='version', version=Version)
+	
+	options = Parser.parse_args()
+	
+	for compression in options.Compressions:
+		if compression not in LogCompressions:
+			Parser.error("compression format '%s' not supported" % compression)
+	# for
+	if options.Allocations and tracemalloc is None:
+		Parser.error("measuring allocations requires tracemalloc (python 3)")
+	
+	if options.GeneratePath:
+		Log = GenerateLog(options.GeneratePath, options.nLogEvents,
+		  options.nModules, nNoiseLines=options.nNoiseLines,
+		  truncatedFraction=options.TruncatedFraction,
+		  compression=options.Compressions[0])
+		print("%(path)s: %(lines)d lines, %(bytes)d bytes (%(size)d on disk)"
+		  % Log)
+		sys.exit(0)
+	# if generate
+	
+	if options.Suite in ( 'parsers', 'all' ): RunParserBenchmarks(options)
+	
+	if options.Suite in ( 'logs', 'all' ):
+		Results = RunLogBenchmarks(options)
+		if options.OutputPath: SaveResults(options.OutputPath, Results, options)
+	# if
+	
+	if options.Suite == 'scaling':
+		Results = RunScalingBenchmarks(options)
+		if options.OutputPath: SaveResults(options.OutputPath, Results, options)
+	# if
+	
+	sys.exit(0)
+# main
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+#
+# Brief:  checks that the parsing strategies of SortModuleTimes.py agree
+# Date:   20261017
+#
+# Run with '--help' argument for usage instructions.
+#
+# Each check writes small logs, parses them in different ways (serial and
+# parallel, plain and compressed, ...) and compares the results; the exit code
+# is non-zero if any check fails. All the checks are run by default.
+#
+# Version:
+# 1.0
+#   first version, with the checks from SortModuleTimesBenchmark.py 1.5
+#
+
+from __future__ import print_function
+
+import sys, os
+import random
+import shutil
+import tempfile
+import gzip
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import SortModuleTimes
+
+if sys.version_info[0] >= 3: xrange = range
+
+
+Version = "%(prog)s 1.0"
+__doc__ = "Checks that the parsing strategies of SortModuleTimes.py agree."
+
+
+def WriteCheckLog(Path, Events):
+	"""Writes a log with the timing lines of the events.
+	
+	Events is a list of (event number, list of (module label, time), event time)
+	and all the events are in run 1, subrun 0.
+	Returns Path.
+	"""
+	with open(Path, 'w') as LogFile:
+		for event, ModuleTimes, EventTime in Events:
+			for label, t in ModuleTimes:
+				LogFile.write("TimeModule> run: 1 subRun: 0 event: %d %s Type%s %g\n"
+				  % (event, label, label, t))
+			# for
+			LogFile.write("TimeEvent> run: 1 subRun: 0 event: %d %g\n"
+			  % (event, EventTime))
+		# for
+	# with
+	return Path
+# WriteCheckLog()
+
+
+def EventTableContent(LogPaths, **kargs):
+	"""Returns the rows of the event table from the parsing of the logs.
+	
+	The parsing options are the default ones, tracking the entries, overridden
+	by the keyword arguments.
+	"""
+	options = SortModuleTimes.ParsingOptions(Permissive=True, TrackEntries=True)
+	for name, value in kargs.items(): setattr(options, name, value)
+	if options.Columnar: options.CheckDuplicates = True
+	AllStats, EventStats, nErrors = SortModuleTimes.ParseLogs(LogPaths, options)
+	return [ stats.FormatTimesAsList() for stats in AllStats ] \
+	  + [ EventStats.FormatTimesAsList() ]
+# EventTableContent()
+
+
+def CheckLateModuleMerge(WorkDir):
+	"""Parsing logs in parallel keeps a module appearing late in order."""
+	rand = random.Random(0)
+	LogPaths = []
+	for iLog in xrange(4):
+		Events = []
+		for event in xrange(10 * iLog + 1, 10 * iLog + 11):
+			Modules = [ "mod1", "mod2" ] + ([ "mod3" ] if event >= 25 else [])
+			Events.append(( event,
+			  [ ( label, rand.uniform(0.001, 0.1) ) for label in Modules ],
+			  rand.uniform(0.1, 1.) ))
+		# for
+		LogPaths.append(WriteCheckLog
+		  (os.path.join(WorkDir, "late_module_%d.log" % iLog), Events))
+	# for
+	Layouts = [ False, True ] if SortModuleTimes.numpy is not None else [ False ]
+	return all(EventTableContent(LogPaths, Columnar=bColumnar)
+	  == EventTableContent(LogPaths, Columnar=bColumnar, Jobs=2)
+	  for bColumnar in Layouts)
+# CheckLateModuleMerge()
+
+
+def CheckBareMarkers(WorkDir):
+	"""Bare timing markers are skipped both in plain and compressed logs."""
+	Path = os.path.join(WorkDir, "bare_markers.log")
+	WriteCheckLog(Path, [ ( 1, [ ( "mod1", 0.5 ) ], 1. ) ])
+	with open(Path, 'a') as LogFile: LogFile.write("TimeModule> \nTimeEvent> \n")
+	with open(Path, 'rb') as LogFile:
+		CompressedFile = gzip.GzipFile(Path + ".gz", 'wb')
+		try: shutil.copyfileobj(LogFile, CompressedFile)
+		finally: CompressedFile.close()
+	# with
+	options = SortModuleTimes.ParsingOptions() # not permissive
+	try:
+		return SortModuleTimes.ParseLogs([ Path ], options)[2] \
+		  == SortModuleTimes.ParseLogs([ Path + ".gz" ], options)[2] == 0
+	except SortModuleTimes.FormatError: return False
+# CheckBareMarkers()
+
+
+def CheckPagerDuplicates(WorkDir):
+	"""The event table pager writes each event once, as many as the parsed."""
+	rand = random.Random(0)
+	def RandomEvents(Events):
+		return [ ( event,
+		  [ ( label, rand.uniform(0.001, 0.1) ) for label in ( "mod1", "mod2" ) ],
+		  rand.uniform(0.1, 1.) ) for event in Events ]
+	# RandomEvents()
+	LogPaths = [
+	  WriteCheckLog(os.path.join(WorkDir, "pager_first.log"),
+	    RandomEvents(xrange(1, 21))),
+	  # events repeated from the first log, and one coming back out of order
+	  WriteCheckLog(os.path.join(WorkDir, "pager_repeated.log"),
+	    RandomEvents(list(xrange(5, 15)) + [ 21, 22, 9, 23 ])),
+	  ]
+	options = SortModuleTimes.ParsingOptions(Permissive=True)
+	AllStats = SortModuleTimes.JobStatsClass()
+	EventStats = SortModuleTimes.CreateEventStats(options)
+	TablePath = os.path.join(WorkDir, "pager_table.txt")
+	with open(TablePath, 'w') as TableFile:
+		Pager = SortModuleTimes.EventTablePagerClass(AllStats, EventStats,
+		  layout='transposed', pageSize=7, stream=TableFile)
+		SortModuleTimes.ParseInputFiles(LogPaths, AllStats, EventStats, options,
+		  EventSink=Pager)
+		Pager.finish()
+	# with
+	with open(TablePath, 'r') as TableFile:
+		nRows = sum(1 for line in TableFile if line[:1].isdigit())
+	return nRows == EventStats.n() == 23
+# CheckPagerDuplicates()
+
+
+def CheckSingleLineChunks(WorkDir):
+	"""Splitting a log in one-line ranges still suppresses repeated lines."""
+	Path = WriteCheckLog(os.path.join(WorkDir, "repeated_lines.log"),
+	  [ ( 1, [ ( "mod1", 0.5 ) ] * 3, 1. ), ( 2, [ ( "mod1", 0.25 ) ], 1. ) ])
+	def Summary(nJobs):
+		AllStats, EventStats, nErrors = SortModuleTimes.ParseLogs([ Path ],
+		  SortModuleTimes.ParsingOptions(CheckDuplicates=False, Jobs=nJobs))
+		return [ ( stats.n(), stats.sum() ) for stats in AllStats ] \
+		  + [ ( EventStats.n(), EventStats.sum() ), nErrors ]
+	# Summary()
+	return Summary(1) == Summary(6) # 6 lines, 6 ranges
+# CheckSingleLineChunks()
+
+
+def CheckMemoryChunks(WorkDir):
+	"""Memory usage follows the event selection, serially and in chunks.
+	
+	Every other event starts with a module line with an extra space, which only
+	the complete parser accepts. The memory increase is the event number.
+	"""
+	LogPath = os.path.join(WorkDir, "memory.log")
+	with open(LogPath, 'w') as LogFile:
+		for event in xrange(1, 61):
+			for label in ( "mod1", "mod2" ):
+				Spaces = "  " if (label == "mod1") and (event % 2 == 1) else " "
+				LogFile.write(
+				  "TimeModule> run: 1 subRun: 0 event: %d%s%s Type%s 0.01\n"
+				  % (event, Spaces, label, label))
+				LogFile.write("MemoryCheck: module Type%s:%s VSIZE 100 %d RSS 50 %d\n"
+				  % (label, label, event, event))
+			# for
+			LogFile.write("TimeEvent> run: 1 subRun: 0 event: %d 0.1\n" % event)
+			LogFile.write("MemoryCheck: event : VSIZE 100 %d RSS 50 %d\n"
+			  % (event, event))
+		# for
+	# with
+	def MemorySummary(**kargs):
+		options = SortModuleTimes.ParsingOptions(Memory=True, EventRange=[ ( 11, 40 ) ])
+		for name, value in kargs.items(): setattr(options, name, value)
+		AllStats, EventStats, nErrors = SortModuleTimes.ParseLogs([ LogPath ], options)
+		return [ ( stats.n(), stats.rssDelta.sum() ) for stats
+		  in list(AllStats.memory.modules.values()) + [ AllStats.memory.event ] ]
+	# MemorySummary()
+	Expected = [ ( 30, float(sum(xrange(11, 41))) ) ] * 3
+	return all(MemorySummary(Jobs=nJobs, CheckDuplicates=bCheckDuplicates)
+	  == Expected
+	  for nJobs in ( 1, 3, 5, 8 ) for bCheckDuplicates in ( False, True ))
+# CheckMemoryChunks()
+
+
+def CheckParallelDuplicates(WorkDir):
+	"""Events repeated across logs parsed in parallel are counted once.
+	
+	The default options check for duplicates without tracking the entries, and
+	ParseInputFiles() is called directly, with no help from ParseLogs().
+	"""
+	rand = random.Random(0)
+	def RandomEvents(Events):
+		return [ ( event,
+		  [ ( label, rand.uniform(0.001, 0.1) ) for label in ( "mod1", "mod2" ) ],
+		  rand.uniform(0.1, 1.) ) for event in Events ]
+	# RandomEvents()
+	LogPaths = [
+	  WriteCheckLog(os.path.join(WorkDir, "repeated_first.log"),
+	    RandomEvents(xrange(1, 21))),
+	  WriteCheckLog(os.path.join(WorkDir, "repeated_second.log"),
+	    RandomEvents(xrange(11, 31))),
+	  ]
+	LogPaths.append(LogPaths[0])
+	def Summary(**kargs):
+		options = SortModuleTimes.ParsingOptions(**kargs)
+		AllStats = SortModuleTimes.JobStatsClass()
+		EventStats = SortModuleTimes.CreateEventStats(options)
+		SortModuleTimes.ParseInputFiles(LogPaths, AllStats, EventStats, options)
+		return [ ( stats.n(), round(stats.sum(), 9) )
+		  for stats in list(AllStats) + [ EventStats ] ]
+	# Summary()
+	Expected = Summary(Jobs=1)
+	return (Expected[-1][0] == 30) and (Summary(Jobs=3) == Expected)
+# CheckParallelDuplicates()
+
+
+def CheckParquetMissingColumn(WorkDir):
+	"""A Parquet batch where a module has no time keeps the column types.
+	
+	Returns None (skipped) if pyarrow is not available.
+	"""
+	if SortModuleTimes.pyarrow is None: return None
+	rand = random.Random(0)
+	Events = [ ( event, [ ( label, rand.uniform(0.001, 0.1) )
+	  for label in ([ "mod1" ] + ([ "mod2" ] if event > 4 else [])) ],
+	  rand.uniform(0.1, 1.) ) for event in xrange(1, 11) ]
+	LogPath = WriteCheckLog(os.path.join(WorkDir, "parquet.log"), Events)
+	options = SortModuleTimes.ParsingOptions(Permissive=True, TrackEntries=True)
+	AllStats, EventStats, nErrors = SortModuleTimes.ParseLogs([ LogPath ], options)
+	Rows = list(SortModuleTimes.IterateEventMatrixRows(AllStats, EventStats))
+	TablePath = os.path.join(WorkDir, "parquet_table.parquet")
+	Writer = SortModuleTimes.ParquetTableWriterClass(TablePath, Rows[0])
+	Writer.BatchSize = 3 # the first batch has no time for mod2
+	for Row in Rows[1:]: Writer.writeRow(Row)
+	Writer.close()
+	Table = SortModuleTimes.pyarrow.parquet.read_table(TablePath)
+	return Table.schema.equals(Writer.schema) \
+	  and [ list(Row) for Row in zip(*Table.to_pydict().values()) ] == Rows[1:]
+# CheckParquetMissingColumn()
+
+
+ConsistencyChecks = [
+	( "late module, serial vs. parallel", CheckLateModuleMerge ),
+	( "bare timing markers, plain vs. compressed", CheckBareMarkers ),
+	( "event table pager, repeated events", CheckPagerDuplicates ),
+	( "one line chunks, serial vs. parallel", CheckSingleLineChunks ),
+	( "memory usage selection, serial vs. parallel", CheckMemoryChunks ),
+	( "events repeated across logs, serial vs. parallel",
+	  CheckParallelDuplicates ),
+	( "Parquet batch with a missing module", CheckParquetMissingColumn ),
+	]
+
+
+def RunConsistencyChecks(Checks, WorkDir = None):
+	"""Runs the (name, check) pairs in Checks; returns the number of failures.
+	
+	A check returns whether it passed, or None if it could not be run.
+	
+	The logs are written in WorkDir, which is left in place, or in a temporary
+	directory which is removed at the end.
+	"""
+	TempDir = None if WorkDir \
+	  else tempfile.mkdtemp(prefix="SortModuleTimesChecks")
+	try:
+		print("Consistency checks:")
+		nFailures = 0
+		for Name, Check in Checks:
+			bPassed = Check(WorkDir or TempDir)
+			if bPassed is None: Result = "skipped"
+			elif bPassed:       Result = "passed"
+			else:               Result = "FAILED"
+			print("  %-50s %s" % (Name, Result))
+			if bPassed is False: nFailures += 1
+		# for
+	finally:
+		if TempDir: shutil.rmtree(TempDir)
+	return nFailures
+# RunConsistencyChecks()
+
+
+################################################################################
+### main program
+###
+if __name__ == "__main__":
+	import argparse
+	
+	Parser = argparse.ArgumentParser(description=__doc__)
+	Parser.add_argument("--check", dest="Checks", action="append",
+	  choices=[ Check.__name__ for Name, Check in ConsistencyChecks ],
+	  help="run only this check (can be repeated) [all of them]")
+	Parser.add_argument("--workdir", dest="WorkDir",
+	  help="directory where to write (and leave) the logs [a temporary one]")
+	Parser.add_argument('--version', action='version', version=Version)
+	
+	options = Parser.parse_args()
+	
+	Checks = [ ( Name, Check ) for Name, Check in ConsistencyChecks
+	  if not options.Checks or Check.__name__ in options.Checks ]
+	sys.exit(1 if RunConsistencyChecks(Checks, WorkDir=options.WorkDir) else 0)
+# main